@@ -1,12 +1,13 @@
 #!/usr/bin/env -S PYTHONDONTWRITEBYTECODE=1 PYTHONPATH=..:. pypy3
 
 from analysis.util import (
+    Checkpointer,
     Glicko2Analytics,
-    InMemoryStorage,
     GameData,
     TallyGameAnalytics,
     cli,
     config,
+    make_storage,
     get_handicap_adjustment,
     rating_to_rank,
     rank_to_rating,
@@ -103,12 +104,15 @@ class DailyWindows(RatingSystem):
 # Run
 config(cli.parse_args(), "glicko2-daily-windows")
 game_data = GameData()
-storage = InMemoryStorage(Glicko2Entry)
+storage = make_storage(Glicko2Entry)
 engine = DailyWindows(storage)
 tally = TallyGameAnalytics(storage)
+checkpoints = Checkpointer(game_data, storage, [tally])
 
 for game in game_data:
     analytics = engine.process_game(game)
     tally.add_glicko2_analytics(analytics)
+    checkpoints.processed(game)
+checkpoints.close()
 
 tally.print()
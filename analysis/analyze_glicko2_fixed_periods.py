@@ -0,0 +1,137 @@
+#!/usr/bin/env -S PYTHONDONTWRITEBYTECODE=1 PYTHONPATH=..:. pypy3
+
+from typing import Optional
+
+from analysis.util import (
+    Checkpointer,
+    Glicko2Analytics,
+    GameData,
+    RankSystem,
+    TallyGameAnalytics,
+    cli,
+    config,
+    make_storage,
+    get_rank_system,
+    should_skip_game,
+)
+from goratings.interfaces import GameRecord, RatingSystem, Storage
+from goratings.math.glicko2 import GLICKO2_SCALE, Glicko2Config, Glicko2Entry
+from goratings.math.glicko2_periods import Glicko2PeriodEntry, glicko2_period_update
+
+cli.add_argument(
+    "--period-days", dest="period_days", type=float, default=7,
+    help="Length of each player's rating periods, which start with the first game after the previous one ended",
+)
+
+
+class FixedPeriods(RatingSystem):
+    """
+    Per-player, fixed length rating periods computed incrementally, as
+    described in RatingsV6.md, so every game costs the same however many
+    games the players have in their current period.
+    """
+
+    _storage: Storage
+    _period: int
+    _glicko2_config: Optional[Glicko2Config]
+    _rank_system: RankSystem
+
+    def __init__(
+        self,
+        storage: Storage,
+        period_days: float,
+        glicko2_config: Optional[Glicko2Config] = None,
+        rank_system: Optional[RankSystem] = None,
+    ) -> None:
+        self._storage = storage
+        self._period = int(period_days * 24 * 60 * 60)
+        self._glicko2_config = glicko2_config
+        self._rank_system = get_rank_system() if rank_system is None else rank_system
+
+    def process_game(self, game: GameRecord) -> Glicko2Analytics:
+        rank_to_rating = self._rank_system.rank_to_rating
+        rating_to_rank = self._rank_system.rating_to_rank
+        get_handicap_adjustment = self._rank_system.get_handicap_adjustment
+
+        if game.black_manual_rank_update is not None:
+            self._storage.set(game.black_id, Glicko2PeriodEntry(rank_to_rating(game.black_manual_rank_update)))
+
+        if game.white_manual_rank_update is not None:
+            self._storage.set(game.white_id, Glicko2PeriodEntry(rank_to_rating(game.white_manual_rank_update)))
+
+        if should_skip_game(game, self._storage):
+            return Glicko2Analytics(skipped=True, game=game)
+
+        black = self._storage.get(game.black_id)
+        white = self._storage.get(game.white_id)
+
+        # The ratings the players see each other at, which the game is rated
+        # against.
+        black_mu, black_phi = black.observed(game.ended, self._period, self._glicko2_config)
+        white_mu, white_phi = white.observed(game.ended, self._period, self._glicko2_config)
+        black_rating = GLICKO2_SCALE * black_mu + 1500
+        white_rating = GLICKO2_SCALE * white_mu + 1500
+
+        black_adjustment = get_handicap_adjustment(
+            "black", black_rating, game.handicap, komi=game.komi, size=game.size, rules=game.rules,
+        )
+        white_adjustment = get_handicap_adjustment(
+            "white", white_rating, game.handicap, komi=game.komi, size=game.size, rules=game.rules,
+        )
+
+        updated_black = glicko2_period_update(
+            black,
+            white,
+            game.winner_id == game.black_id,
+            game.ended,
+            self._period,
+            rating_adjustment=white_adjustment,
+            config=self._glicko2_config,
+        )
+        updated_white = glicko2_period_update(
+            white,
+            black,
+            game.winner_id == game.white_id,
+            game.ended,
+            self._period,
+            rating_adjustment=black_adjustment,
+            config=self._glicko2_config,
+        )
+
+        self._storage.set(game.black_id, updated_black)
+        self._storage.set(game.white_id, updated_white)
+
+        return Glicko2Analytics(
+            skipped=False,
+            game=game,
+            expected_win_rate=Glicko2Entry(black_rating, GLICKO2_SCALE * black_phi).expected_win_probability(
+                Glicko2Entry(white_rating, GLICKO2_SCALE * white_phi), black_adjustment, ignore_g=True
+            ),
+            black_rating=black_rating,
+            white_rating=white_rating,
+            black_deviation=GLICKO2_SCALE * black_phi,
+            white_deviation=GLICKO2_SCALE * white_phi,
+            black_rank=rating_to_rank(black_rating),
+            white_rank=rating_to_rank(white_rating),
+            black_updated_rating=updated_black.rating,
+            white_updated_rating=updated_white.rating,
+        )
+
+
+# Run
+if __name__ == "__main__":
+    args = cli.parse_args()
+    config(args, "glicko2-fixed-periods")
+    game_data = GameData()
+    storage = make_storage(Glicko2PeriodEntry)
+    engine = FixedPeriods(storage, args.period_days)
+    tally = TallyGameAnalytics(storage)
+    checkpoints = Checkpointer(game_data, storage, [tally])
+
+    for game in game_data:
+        analytics = engine.process_game(game)
+        tally.add_glicko2_analytics(analytics)
+        checkpoints.processed(game)
+    checkpoints.close()
+
+    tally.print()
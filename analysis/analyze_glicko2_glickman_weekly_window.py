@@ -1,12 +1,13 @@
 #!/usr/bin/env -S PYTHONDONTWRITEBYTECODE=1 PYTHONPATH=..:. pypy3
 
 from analysis.util import (
+    Checkpointer,
     Glicko2Analytics,
-    InMemoryStorage,
     GameData,
     TallyGameAnalytics,
     cli,
     config,
+    make_storage,
     get_handicap_adjustment,
     rating_to_rank,
     should_skip_game,
@@ -111,12 +112,15 @@ class DailyWindows(RatingSystem):
 # Run
 config(cli.parse_args(), name="glicko2-glickman-1-week-window")
 ogs_game_data = GameData()
-storage = InMemoryStorage(Glicko2Entry)
+storage = make_storage(Glicko2Entry)
 engine = DailyWindows(storage)
 tally = TallyGameAnalytics(storage)
+checkpoints = Checkpointer(ogs_game_data, storage, [tally])
 
 for game in ogs_game_data:
     analytics = engine.process_game(game)
     tally.add_glicko2_analytics(analytics)
+    checkpoints.processed(game)
+checkpoints.close()
 
 tally.print()
@@ -1,27 +1,43 @@
 #!/usr/bin/env -S PYTHONDONTWRITEBYTECODE=1 PYTHONPATH=..:. pypy3
 
+from typing import Optional
+
 from analysis.util import (
+    Checkpointer,
     Glicko2Analytics,
-    InMemoryStorage,
     GameData,
+    RankSystem,
     TallyGameAnalytics,
     cli,
     config,
-    get_handicap_adjustment,
-    rating_to_rank,
-    rank_to_rating,
+    make_storage,
+    get_rank_system,
     should_skip_game,
 )
+from analysis.util.ParallelReplay import replay_datasets_in_parallel, replay_in_parallel
 from goratings.interfaces import GameRecord, RatingSystem, Storage
-from goratings.math.glicko2 import Glicko2Entry, glicko2_update
+from goratings.math.glicko2 import Glicko2Config, Glicko2Entry, glicko2_update
 
 class OneGameAtATime(RatingSystem):
     _storage: Storage
-
-    def __init__(self, storage: Storage) -> None:
+    _glicko2_config: Optional[Glicko2Config]
+    _rank_system: RankSystem
+
+    def __init__(
+        self,
+        storage: Storage,
+        glicko2_config: Optional[Glicko2Config] = None,
+        rank_system: Optional[RankSystem] = None,
+    ) -> None:
         self._storage = storage
+        self._glicko2_config = glicko2_config
+        self._rank_system = get_rank_system() if rank_system is None else rank_system
 
     def process_game(self, game: GameRecord) -> Glicko2Analytics:
+        rank_to_rating = self._rank_system.rank_to_rating
+        rating_to_rank = self._rank_system.rating_to_rank
+        get_handicap_adjustment = self._rank_system.get_handicap_adjustment
+
         if game.black_manual_rank_update is not None:
             self._storage.set(game.black_id, Glicko2Entry(rank_to_rating(game.black_manual_rank_update)))
 
@@ -46,6 +62,7 @@ class OneGameAtATime(RatingSystem):
                 )
             ],
             timestamp=game.ended,
+            config=self._glicko2_config,
         )
 
         updated_white = glicko2_update(
@@ -60,6 +77,7 @@ class OneGameAtATime(RatingSystem):
                 )
             ],
             timestamp=game.ended,
+            config=self._glicko2_config,
         )
 
         self._storage.set(game.black_id, updated_black)
@@ -89,29 +107,35 @@ class OneGameAtATime(RatingSystem):
 
 
 # Run
-config(cli.parse_args(), "glicko2-one-game-at-a-time")
-game_data = GameData()
-storage = InMemoryStorage(Glicko2Entry)
-engine = OneGameAtATime(storage)
-tally = TallyGameAnalytics(storage)
-
-for game in game_data:
-    analytics = engine.process_game(game)
-    tally.add_glicko2_analytics(analytics)
-
-tally.print()
-
-self_reported_ratings = tally.get_self_reported_rating()
-if self_reported_ratings:
-    aga_1d = (self_reported_ratings['aga'][30] if 'aga' in self_reported_ratings else [1950.123456])
-    avg_1d_aga = sum(aga_1d) / len(aga_1d)
-    egf_1d = (self_reported_ratings['egf'][30] if 'egf' in self_reported_ratings else [1950.123456])
-    avg_1d_egf = sum(egf_1d) / len(egf_1d)
-    ratings_1d = ((self_reported_ratings['egf'][30] if 'egf' in self_reported_ratings else [1950.123456]) +
-                  (self_reported_ratings['aga'][30] if 'aga' in self_reported_ratings else [1950.123456]))
-    avg_1d_rating = sum(ratings_1d) / len(ratings_1d)
-
-    print("Avg 1d rating egf: %6.1f    aga: %6.1f     egf+aga: %6.1f" % (avg_1d_egf, avg_1d_aga, avg_1d_rating))
-
-
-
+if __name__ == "__main__":
+    config(cli.parse_args(), "glicko2-one-game-at-a-time")
+    game_data = GameData()
+    storage = make_storage(Glicko2Entry)
+    engine = OneGameAtATime(storage)
+    tally = TallyGameAnalytics(storage)
+    checkpoints = Checkpointer(game_data, storage, [tally])
+
+    if config.args.concurrent_datasets:
+        replay_datasets_in_parallel(game_data, storage, tally, OneGameAtATime)
+    elif config.args.replay_processes > 1:
+        replay_in_parallel(game_data, storage, tally, OneGameAtATime)
+    else:
+        for game in game_data:
+            analytics = engine.process_game(game)
+            tally.add_glicko2_analytics(analytics)
+            checkpoints.processed(game)
+        checkpoints.close()
+
+    tally.print()
+
+    self_reported_ratings = tally.get_self_reported_rating()
+    if self_reported_ratings:
+        aga_1d = (self_reported_ratings['aga'][30] if 'aga' in self_reported_ratings else [1950.123456])
+        avg_1d_aga = sum(aga_1d) / len(aga_1d)
+        egf_1d = (self_reported_ratings['egf'][30] if 'egf' in self_reported_ratings else [1950.123456])
+        avg_1d_egf = sum(egf_1d) / len(egf_1d)
+        ratings_1d = ((self_reported_ratings['egf'][30] if 'egf' in self_reported_ratings else [1950.123456]) +
+                      (self_reported_ratings['aga'][30] if 'aga' in self_reported_ratings else [1950.123456]))
+        avg_1d_rating = sum(ratings_1d) / len(ratings_1d)
+
+        print("Avg 1d rating egf: %6.1f    aga: %6.1f     egf+aga: %6.1f" % (avg_1d_egf, avg_1d_aga, avg_1d_rating))
@@ -3,21 +3,27 @@
 # Computes one game at a time, for all 16 speed / size combinations
 
 import configparser
+from math import exp, pi, sqrt
+from typing import Dict
+
 from analysis.util import (
+    Checkpointer,
     Glicko2Analytics,
-    InMemoryStorage,
+    Glicko2GridStorage,
     GameData,
+    GRID_SIZES,
+    GRID_SPEEDS,
+    RankSystem,
     TallyGameAnalytics,
     cli,
     config,
-    get_handicap_adjustment,
-    rating_to_rank,
-    rank_to_rating,
+    get_handicap_rank_difference,
+    get_rank_system,
+    grid_category,
     should_skip_game,
 )
-from goratings.interfaces import GameRecord, RatingSystem, Storage
-from goratings.math.glicko2 import Glicko2Entry, glicko2_update
-from typing import Dict
+from goratings.interfaces import GameRecord, RatingSystem
+from goratings.math.glicko2 import GLICKO2_SCALE, glicko2_update_one
 
 cli.add_argument(
     "--always-use-overall-rating", dest="always_use_overall_rating", const=1, default=False, action="store_const", help="Always use our opponents overall rating when updating ratings on a per speed/size basis",
@@ -26,85 +32,110 @@ cli.add_argument(
 ALWAYS_USE_OVERALL = False
 
 class OneGameAtATimeRatingGrid(RatingSystem):
-    _storages: Dict[str, Storage]
+    """
+    Rates each game in the four categories it belongs to: its speed and size,
+    all speeds at its size, its speed at all sizes, and overall.  The terms
+    the categories share, the handicap rank difference, outcomes and manual
+    rank updates, are worked out once per game, and the categories are
+    updated from the players' grid rows without building entries.
+    """
+
+    _grid: Glicko2GridStorage
+    _rank_system: RankSystem
 
-    def __init__(self, storages: Dict[str, Storage]) -> None:
-        self._storages = storages
+    def __init__(self, grid: Glicko2GridStorage) -> None:
+        self._grid = grid
+        self._rank_system = get_rank_system()
 
     def process_game(self, game: GameRecord) -> Dict[str, Glicko2Analytics]:
         global ALWAYS_USE_OVERALL
         ret = {}
-        overall_storage = self._storages['999-999']
+        grid = self._grid
+        values = grid.values
+        has_entry = grid.has_entry
+        rank_to_rating = self._rank_system.rank_to_rating
+        rating_to_rank = self._rank_system.rating_to_rank
+
+        rank_difference = get_handicap_rank_difference(game.handicap, game.size, game.komi, game.rules)
+        black_won = game.winner_id == game.black_id
+        white_won = game.winner_id == game.white_id
+        black_row = grid.row(game.black_id)
+        white_row = grid.row(game.white_id)
+        black_manual_rating = (
+            None if game.black_manual_rank_update is None else rank_to_rating(game.black_manual_rank_update)
+        )
+        white_manual_rating = (
+            None if game.white_manual_rank_update is None else rank_to_rating(game.white_manual_rank_update)
+        )
+        overall = grid_category(999, 999)
 
         for speed in [game.speed, 999]:
             for size in [game.size, 999]:
                 k = '%d-%d' % (speed, size)
-                storage = self._storages[k]
-                if game.black_manual_rank_update is not None:
-                    storage.set(game.black_id, Glicko2Entry(rank_to_rating(game.black_manual_rank_update)))
+                category = grid_category(speed, size)
+                if black_manual_rating is not None:
+                    grid.set_values(black_row, category, black_manual_rating, 350.0, 0.06)
 
-                if game.white_manual_rank_update is not None:
-                    storage.set(game.white_id, Glicko2Entry(rank_to_rating(game.white_manual_rank_update)))
+                if white_manual_rating is not None:
+                    grid.set_values(white_row, category, white_manual_rating, 350.0, 0.06)
 
-                if should_skip_game(game, storage):
+                if should_skip_game(game, grid.category(speed, size)):
                     ret[k] = Glicko2Analytics(skipped=True, game=game)
                     continue
 
-                black = storage.get(game.black_id)
-                white = storage.get(game.white_id)
+                has_entry[black_row] |= 1 << category
+                has_entry[white_row] |= 1 << category
+                b = grid.offset(black_row, category)
+                w = grid.offset(white_row, category)
+                black_rating, black_deviation, black_volatility = values[b], values[b + 1], values[b + 2]
+                white_rating, white_deviation, white_volatility = values[w], values[w + 1], values[w + 2]
+                black_rank = rating_to_rank(black_rating)
+                white_rank = rating_to_rank(white_rating)
+                black_adjustment = rank_to_rating(black_rank + rank_difference) - black_rating
+
                 if ALWAYS_USE_OVERALL:
-                    src_black = overall_storage.get(game.black_id)
-                    src_white = overall_storage.get(game.white_id)
+                    b = grid.offset(black_row, overall)
+                    w = grid.offset(white_row, overall)
+                    src_black_rating, src_black_deviation = values[b], values[b + 1]
+                    src_white_rating, src_white_deviation = values[w], values[w + 1]
+                    src_black_adjustment = (
+                        rank_to_rating(rating_to_rank(src_black_rating) + rank_difference) - src_black_rating
+                    )
+                    src_white_adjustment = (
+                        rank_to_rating(rating_to_rank(src_white_rating) - rank_difference) - src_white_rating
+                    )
                 else:
-                    src_black = black
-                    src_white = white
-
-                updated_black = glicko2_update(
-                    black,
-                    [
-                        (
-                            src_white.copy(get_handicap_adjustment("white", src_white.rating, game.handicap,
-                                    komi=game.komi, size=game.size, rules=game.rules,
-                                    )),
-                            game.winner_id == game.black_id,
-                        )
-                    ],
+                    src_black_rating, src_black_deviation = black_rating, black_deviation
+                    src_white_rating, src_white_deviation = white_rating, white_deviation
+                    src_black_adjustment = black_adjustment
+                    src_white_adjustment = rank_to_rating(white_rank - rank_difference) - white_rating
+
+                updated_black = glicko2_update_one(
+                    black_rating, black_deviation, black_volatility,
+                    src_white_rating + src_white_adjustment, src_white_deviation, black_won,
                 )
-
-                updated_white = glicko2_update(
-                    white,
-                    [
-                        (
-                            src_black.copy(get_handicap_adjustment("black", src_black.rating, game.handicap,
-                                    komi=game.komi, size=game.size, rules=game.rules,
-                                    )),
-                            game.winner_id == game.white_id,
-                        )
-                    ],
+                updated_white = glicko2_update_one(
+                    white_rating, white_deviation, white_volatility,
+                    src_black_rating + src_black_adjustment, src_black_deviation, white_won,
                 )
 
-                storage.set(game.black_id, updated_black)
-                storage.set(game.white_id, updated_white)
-                #storage.add_rating_history(game.black_id, game.ended, updated_black)
-                #storage.add_rating_history(game.white_id, game.ended, updated_white)
-
+                grid.set_values(black_row, category, *updated_black)
+                grid.set_values(white_row, category, *updated_white)
 
+                # As Glicko2Entry.expected_win_probability(..., ignore_g=True)
+                g = 1 / sqrt(1 + (3 * (white_deviation / GLICKO2_SCALE) ** 2) / (pi ** 2))
                 ret[k] = Glicko2Analytics(
                     skipped=False,
                     game=game,
-                    expected_win_rate=black.expected_win_probability(
-                        white, get_handicap_adjustment("black", black.rating, game.handicap,
-                            komi=game.komi, size=game.size, rules=game.rules,
-                            ), ignore_g=True
-                    ),
-                    black_rating=black.rating,
-                    white_rating=white.rating,
-                    black_deviation=black.deviation,
-                    white_deviation=white.deviation,
-                    black_rank=rating_to_rank(black.rating),
-                    white_rank=rating_to_rank(white.rating),
-                    black_updated_rating=updated_black.rating,
-                    white_updated_rating=updated_white.rating,
+                    expected_win_rate=1 / (1 + exp(-g * (black_rating + black_adjustment - white_rating) / GLICKO2_SCALE)),
+                    black_rating=black_rating,
+                    white_rating=white_rating,
+                    black_deviation=black_deviation,
+                    white_deviation=white_deviation,
+                    black_rank=black_rank,
+                    white_rank=white_rank,
+                    black_updated_rating=updated_black[0],
+                    white_updated_rating=updated_white[0],
                 )
 
 
@@ -115,31 +146,15 @@ class OneGameAtATimeRatingGrid(RatingSystem):
 config(cli.parse_args(), "glicko2-one-game-at-a-time")
 ALWAYS_USE_OVERALL = config.args.always_use_overall_rating
 game_data = GameData()
+grid = Glicko2GridStorage()
 storages = {
-    '999-999': InMemoryStorage(Glicko2Entry),
-    '999-9': InMemoryStorage(Glicko2Entry),
-    '999-13': InMemoryStorage(Glicko2Entry),
-    '999-19': InMemoryStorage(Glicko2Entry),
-
-    '1-999': InMemoryStorage(Glicko2Entry),
-    '1-9': InMemoryStorage(Glicko2Entry),
-    '1-13': InMemoryStorage(Glicko2Entry),
-    '1-19': InMemoryStorage(Glicko2Entry),
-
-    '2-999': InMemoryStorage(Glicko2Entry),
-    '2-9': InMemoryStorage(Glicko2Entry),
-    '2-13': InMemoryStorage(Glicko2Entry),
-    '2-19': InMemoryStorage(Glicko2Entry),
-
-    '3-999': InMemoryStorage(Glicko2Entry),
-    '3-9': InMemoryStorage(Glicko2Entry),
-    '3-13': InMemoryStorage(Glicko2Entry),
-    '3-19': InMemoryStorage(Glicko2Entry),
+    '%d-%d' % (speed, size): grid.category(speed, size) for speed in GRID_SPEEDS for size in GRID_SIZES
 }
-engine = OneGameAtATimeRatingGrid(storages)
+engine = OneGameAtATimeRatingGrid(grid)
 tallies = {}
 for k in storages.keys():
     tallies[k] = TallyGameAnalytics(storages[k], k if not ALWAYS_USE_OVERALL else ('overall-' + k))
+checkpoints = Checkpointer(game_data, grid, list(tallies.values()))
 
 for game in game_data:
     analytics = engine.process_game(game)
@@ -147,6 +162,8 @@ for game in game_data:
         for size in [game.size, 999]:
             k = '%d-%d' % (speed, size)
             tallies[k].add_glicko2_analytics(analytics[k])
+    checkpoints.processed(game)
+checkpoints.close()
 
 for speed in [999, 1, 2, 3]:
     for size in [999, 9, 13, 19]:
@@ -1,18 +1,20 @@
 #!/usr/bin/env -S PYTHONDONTWRITEBYTECODE=1 PYTHONPATH=..:. pypy3
 
 from analysis.util import (
+    Checkpointer,
     GorAnalytics,
-    InMemoryStorage,
     GameData,
     TallyGameAnalytics,
     cli,
     config,
+    make_storage,
     defaults,
     get_handicap_adjustment,
     rating_to_rank,
     rank_to_rating,
     should_skip_game,
 )
+from analysis.util.ParallelReplay import replay_datasets_in_parallel, replay_in_parallel
 from goratings.interfaces import GameRecord, RatingSystem, Storage
 from goratings.math.gor import GorEntry, gor_update
 
@@ -86,13 +88,21 @@ class OneGameAtATime(RatingSystem):
 # Run
 config(cli.parse_args(), "gor")
 game_data = GameData()
-storage = InMemoryStorage(GorEntry)
+storage = make_storage(GorEntry)
 engine = OneGameAtATime(storage)
 tally = TallyGameAnalytics(storage)
-
-for game in game_data:
-    analytics = engine.process_game(game)
-    #analytics = engine.process_game(game)
-    tally.add_gor_analytics(analytics)
+checkpoints = Checkpointer(game_data, storage, [tally])
+
+if config.args.concurrent_datasets:
+    replay_datasets_in_parallel(game_data, storage, tally, OneGameAtATime)
+elif config.args.replay_processes > 1:
+    replay_in_parallel(game_data, storage, tally, OneGameAtATime)
+else:
+    for game in game_data:
+        analytics = engine.process_game(game)
+        #analytics = engine.process_game(game)
+        tally.add_gor_analytics(analytics)
+        checkpoints.processed(game)
+    checkpoints.close()
 
 tally.print()
@@ -0,0 +1,45 @@
+#!/usr/bin/env -S PYTHONDONTWRITEBYTECODE=1 PYTHONPATH=..:. pypy3
+
+#
+# Recomputes the tallies of a run from the analytics it recorded with
+# --record-analytics, without rating any games, e.g.
+#
+#   ./analyze_glicko2_one_game_at_a_time.py --record-analytics run.npz
+#   ./retally_analytics.py run.npz --mismatch-threshold-predictions 2 --provisional-deviation-cutoff 80
+#
+# Options that aren't given default to the ones the recorded run used. The
+# report and the visualizer data are replaced with the new tallies.
+#
+
+import argparse
+from time import time
+
+from analysis.util import (
+    TallyGameAnalytics,
+    cli,
+    config,
+    defaults,
+    load_analytics,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("analytics")
+    known, remaining = parser.parse_known_args()
+
+    started = time()
+    recorded = load_analytics(known.analytics)
+    defaults.update(recorded.defaults)
+    cli.set_defaults(**recorded.args)
+    cli.set_defaults(record_analytics="")
+    config(cli.parse_args(remaining), recorded.name)
+
+    tally = TallyGameAnalytics(recorded.restore_storage(), recorded.prefix)
+    tally.add_recorded_analytics(recorded)
+    print("Tallied %d recorded games in %.1fs" % (len(recorded), time() - started))
+    tally.print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env -S PYTHONDONTWRITEBYTECODE=1 PYTHONPATH=..:. pypy3
+
+#
+# Runs analyze_glicko2_one_game_at_a_time.py's engine once for every
+# combination of the --sweep parameter values, e.g.
+#
+#   ./sweep_glicko2.py --sweep tao=0.3,0.5,0.7 --sweep min_rd=10,30 --sweep aging_period=none,7
+#
+# The game stream is loaded once into a memory-mapped game cache that the
+# worker processes share, and the results of all the runs are written to the
+# visualizer data in one go at the end.
+#
+# With --prefix-until the games before a date are rated once, and every
+# configuration starts from a snapshot of the resulting ratings, e.g. to
+# compare tally thresholds without re-rating everything:
+#
+#   ./sweep_glicko2.py --prefix-until 2030-01-01 --sweep mismatch_threshold_predictions=0.5,1,2
+#
+
+import argparse
+import itertools
+import json
+import os
+import pickle
+import sys
+import tempfile
+from multiprocessing import Pool
+from time import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from analysis.util import (
+    GameData,
+    Glicko2Analytics,
+    InMemoryStorage,
+    TallyGameAnalytics,
+    cli,
+    config,
+    parse_timestamp,
+)
+from analysis.util.GameCache import GameCache
+from analyze_glicko2_one_game_at_a_time import OneGameAtATime
+from goratings.math.glicko2 import Glicko2Entry
+
+NAME = "glicko2-one-game-at-a-time"
+
+cli.add_argument(
+    "--sweep", dest="sweep", action="append", default=[], metavar="PARAMETER=V1,V2,...",
+    help="Values to try for a parameter, named by its option's destination (tao, min_rd, max_rd, aging_period, a, c, "
+    "...). Use 'none' for no value. Every combination of the swept parameters is run",
+)
+cli.add_argument(
+    "--processes", dest="processes", type=int, default=os.cpu_count() or 1,
+    help="Number of worker processes to run configurations in",
+)
+cli.add_argument(
+    "--prefix-until", dest="prefix_until", type=parse_timestamp, default=None, metavar="DATE",
+    help="Rate the games that ended before DATE once, with the unswept configuration, and start every configuration "
+    "from those ratings. Only meaningful when the swept parameters don't change how those games are rated, "
+    "e.g. tally thresholds. The games before DATE are still tallied by every configuration",
+)
+
+
+Overrides = Dict[str, Any]
+
+_base_args: argparse.Namespace
+_cache: GameCache
+# Pickled storage state after the games before --prefix-until, and the
+# analytics of those games.  Built once in the parent and inherited by the
+# forked workers; each configuration unpickles its own copy of the storage.
+_prefix: Optional[Tuple[bytes, List[Glicko2Analytics]]]
+
+
+def parse_grid(args: argparse.Namespace) -> List[Overrides]:
+    names: List[str] = []
+    values: List[List[Any]] = []
+    for spec in args.sweep:
+        if "=" not in spec:
+            raise Exception("Expected PARAMETER=V1,V2,... but got '%s'" % spec)
+        name, _, text = spec.partition("=")
+        name = name.strip().lstrip("-").replace("-", "_")
+        if not hasattr(args, name):
+            raise Exception("Unknown parameter '%s'" % name)
+        names.append(name)
+        values.append([_parse_value(getattr(args, name), v.strip()) for v in text.split(",")])
+
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def _parse_value(current: Any, text: str) -> Any:
+    if text.lower() == "none":
+        return None
+    if isinstance(current, str):
+        return text
+    if isinstance(current, bool):
+        return text.lower() in ("1", "true", "yes")
+    if isinstance(current, int) and text.lstrip("-").isdigit():
+        return int(text)
+    return float(text)
+
+
+def describe(overrides: Overrides) -> str:
+    return " ".join("%s=%s" % (name, value) for name, value in overrides.items()) or "defaults"
+
+
+def _init_worker(
+    base_args: argparse.Namespace, cache_path: str, prefix: Optional[Tuple[bytes, List[Glicko2Analytics]]]
+) -> None:
+    global _base_args
+    global _cache
+    global _prefix
+    _base_args = base_args
+    _cache = GameCache(cache_path)
+    _prefix = prefix
+
+
+def run_configuration(overrides: Overrides) -> Tuple[Overrides, Dict[str, float], Any, float]:
+    started = time()
+    args = argparse.Namespace(**vars(_base_args))
+    for name, value in overrides.items():
+        setattr(args, name, value)
+    config(args, NAME)
+
+    until = _base_args.prefix_until
+    storage = InMemoryStorage(Glicko2Entry)
+    prefix_analytics: List[Glicko2Analytics] = []
+    if _prefix is not None:
+        state, prefix_analytics = _prefix
+        storage.__setstate__(pickle.loads(state))
+    engine = OneGameAtATime(storage)
+    tally = TallyGameAnalytics(storage, "sweep " + describe(overrides))
+
+    for analytics in prefix_analytics:
+        tally.add_glicko2_analytics(analytics)
+
+    for game in _cache:
+        if until is not None and game.ended < until:
+            continue
+        analytics = engine.process_game(game)
+        tally.add_glicko2_analytics(analytics)
+    tally.save_recorded_analytics()
+
+    # Round trip through json so the nested defaultdicts (which can't be
+    # pickled) come back to the parent as plain dicts.
+    obj = json.loads(json.dumps(tally.get_visualizer_data()))
+    return overrides, tally.get_compact_stats(), obj, time() - started
+
+
+def rate_prefix(cache_path: str, until: float) -> Tuple[bytes, List[Glicko2Analytics]]:
+    started = time()
+    cache = GameCache(cache_path)
+    storage = InMemoryStorage(Glicko2Entry)
+    engine = OneGameAtATime(storage)
+    analytics = [engine.process_game(game) for game in cache if game.ended < until]
+    cache.close()
+    sys.stdout.write("Rated %d games before the prefix cutoff in %.1fs\n" % (len(analytics), time() - started))
+    return pickle.dumps(storage.__getstate__(), pickle.HIGHEST_PROTOCOL), analytics
+
+
+def main() -> None:
+    args = cli.parse_args()
+    config(args, NAME)
+    grid = parse_grid(args)
+
+    fd, cache_path = tempfile.mkstemp(suffix=".gamecache")
+    os.close(fd)
+    try:
+        GameCache.build(cache_path, None, GameData())
+        sys.stdout.write("\nRunning %d configurations in %d processes\n" % (len(grid), args.processes))
+        sys.stdout.flush()
+
+        prefix = None if args.prefix_until is None else rate_prefix(cache_path, args.prefix_until)
+
+        # The workers are forked, so they share the game cache and the prefix
+        # without it being pickled for them.
+        results = []
+        objs = []
+        with Pool(max(1, min(args.processes, len(grid))), _init_worker, (args, cache_path, prefix)) as pool:
+            for overrides, stats, obj, elapsed in pool.imap_unordered(run_configuration, grid):
+                results.append((overrides, stats))
+                objs.append(obj)
+                sys.stdout.write(
+                    "%4d / %4d  %s: %.5f   (%.1fs)\n" % (len(results), len(grid), describe(overrides), stats["all"], elapsed)
+                )
+                sys.stdout.flush()
+    finally:
+        os.remove(cache_path)
+
+    TallyGameAnalytics.write_visualizer_data(objs)
+
+    print("")
+    print("")
+    print("| Configuration | Rating quality | h0 | h1 | h2 |")
+    print("|:--------------|---------------:|---:|---:|---:|")
+    for overrides, stats in sorted(results, key=lambda r: r[1]["all"]):
+        print(
+            "| {name:>s} | {all:>13.5f} | {h0:>7.5f} | {h1:>7.5f} | {h2:>7.5f} |".format(
+                name=describe(overrides), **stats
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import json
+import os
+import re
+from array import array
+from math import isnan, nan
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+
+from goratings.math.glicko2 import Glicko2Entry
+from goratings.math.gor import GorEntry
+
+from .CLI import cli, defaults
+from .Config import config
+from .Glicko2Analytics import Glicko2Analytics
+from .GorAnalytics import GorAnalytics
+from .InMemoryStorage import InMemoryStorage
+from .RatingMath import get_handicap_rank_difference
+
+__all__ = ["AnalyticsRecorder", "RecordedAnalytics", "load_analytics"]
+
+
+cli.add_argument(
+    "--record-analytics", dest="record_analytics", type=str, default="", metavar="FILE",
+    help="Save the analytics of every rated game to FILE, so the tallies can be recomputed with different thresholds "
+    "by retally_analytics.py without rating the games again. Tallies with a name get their own FILE.<name>.npz",
+)
+
+
+# Columns recorded for each kind of analytics, with their array typecodes.
+# `handicap_rank_difference` is derived from the game, so the handicap,
+# komi and rules need not be kept.
+_GAME_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("game_id", "q"),
+    ("ended", "d"),
+    ("size", "h"),
+    ("speed", "h"),
+    ("handicap", "h"),
+    ("black_won", "b"),
+    ("handicap_rank_difference", "d"),
+    ("expected_win_rate", "d"),
+    ("black_rating", "d"),
+    ("white_rating", "d"),
+    ("black_rank", "d"),
+    ("white_rank", "d"),
+)
+COLUMNS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "glicko2": _GAME_COLUMNS
+    + (
+        ("black_deviation", "d"),
+        ("white_deviation", "d"),
+        ("black_updated_rating", "d"),
+        ("white_updated_rating", "d"),
+    ),
+    "gor": _GAME_COLUMNS + (("black_games_played", "q"), ("white_games_played", "q")),
+}
+
+# Final rating of every player, for the rank distribution and the other
+# reports that look at the storage.  Recordings made before the timestamps
+# were kept don't have `player_timestamp`.
+_PLAYER_COLUMNS: Tuple[str, ...] = (
+    "player_id",
+    "player_rating",
+    "player_deviation",
+    "player_volatility",
+    "player_timestamp",
+)
+
+Analytics = Union[Glicko2Analytics, GorAnalytics]
+
+
+class AnalyticsRecorder:
+    """
+    Records the analytics of the games a tally counts, one column per field,
+    and saves them with the final ratings to a .npz file with `save`.
+    Skipped games aren't recorded.
+    """
+
+    path: str
+    kind: str
+    prefix: str
+    columns: Dict[str, "array[Any]"]
+
+    def __init__(self, path: str, prefix: str = "") -> None:
+        self.path = path
+        self.kind = ""
+        self.prefix = prefix
+        self.columns = {}
+
+    @staticmethod
+    def for_tally(prefix: str) -> "AnalyticsRecorder":
+        """ Recorder writing to the --record-analytics file, or a file named after `prefix` if given. """
+        path = config.args.record_analytics
+        if prefix:
+            base, ext = os.path.splitext(path)
+            path = "%s.%s%s" % (base, re.sub(r"[^\w.=+-]+", "_", prefix), ext or ".npz")
+        return AnalyticsRecorder(path, prefix)
+
+    def _start(self, kind: str) -> None:
+        if self.kind != kind:
+            if self.kind:
+                raise Exception("Can't record %s analytics after %s analytics" % (kind, self.kind))
+            self.kind = kind
+            self.columns = {name: array(typecode) for name, typecode in COLUMNS[kind]}
+
+    def _add_game(self, result: Analytics) -> None:
+        game = result.game
+        columns = self.columns
+        columns["game_id"].append(game.game_id)
+        columns["ended"].append(game.ended)
+        columns["size"].append(game.size)
+        columns["speed"].append(game.speed)
+        columns["handicap"].append(game.handicap)
+        columns["black_won"].append(game.winner_id == game.black_id)
+        columns["handicap_rank_difference"].append(
+            get_handicap_rank_difference(handicap=game.handicap, size=game.size, komi=game.komi, rules=game.rules)
+        )
+        columns["expected_win_rate"].append(result.expected_win_rate)
+        columns["black_rating"].append(result.black_rating)
+        columns["white_rating"].append(result.white_rating)
+        columns["black_rank"].append(result.black_rank)
+        columns["white_rank"].append(result.white_rank)
+
+    def add_glicko2_analytics(self, result: Glicko2Analytics) -> None:
+        self._start("glicko2")
+        self._add_game(result)
+        columns = self.columns
+        columns["black_deviation"].append(result.black_deviation)
+        columns["white_deviation"].append(result.white_deviation)
+        columns["black_updated_rating"].append(result.black_updated_rating)
+        columns["white_updated_rating"].append(result.white_updated_rating)
+
+    def add_gor_analytics(self, result: GorAnalytics) -> None:
+        self._start("gor")
+        self._add_game(result)
+        self.columns["black_games_played"].append(result.black_games_played)
+        self.columns["white_games_played"].append(result.white_games_played)
+
+    def get_state(self) -> Dict[str, Any]:
+        """ The recorded columns, for checkpoints. """
+        return {"kind": self.kind, "columns": {name: column.tobytes() for name, column in self.columns.items()}}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.kind = ""
+        self.columns = {}
+        self.merge_state(state)
+
+    def merge_state(self, state: Dict[str, Any]) -> None:
+        """ Appends the games recorded in another recorder's `get_state()`. """
+        if state["kind"]:
+            self._start(state["kind"])
+            for name, data in state["columns"].items():
+                self.columns[name].frombytes(data)
+
+    def save(self, players: Any) -> None:
+        """ Writes the recorded games and the ratings in `players`, a storage's `all_players()`, to `path`. """
+        player_columns: List["array[Any]"] = [array("q"), array("d"), array("d"), array("d"), array("d")]
+        for player_id, entry in players.items():
+            timestamp = getattr(entry, "timestamp", None)
+            player_columns[0].append(player_id)
+            player_columns[1].append(entry.rating)
+            player_columns[2].append(getattr(entry, "deviation", nan))
+            player_columns[3].append(getattr(entry, "volatility", nan))
+            player_columns[4].append(nan if timestamp is None else timestamp)
+
+        meta = {
+            "kind": self.kind,
+            "name": config.name,
+            "prefix": self.prefix,
+            "args": vars(config.args),
+            "defaults": defaults,
+        }
+        arrays = {name: np.array(column) for name, column in self.columns.items()}
+        arrays.update((name, np.array(column)) for name, column in zip(_PLAYER_COLUMNS, player_columns))
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp_path, self.path)
+
+
+class RecordedAnalytics:
+    """ Analytics loaded from a --record-analytics file. """
+
+    kind: str
+    name: str
+    prefix: str
+    args: Dict[str, Any]
+    defaults: Dict[str, Any]
+    columns: Dict[str, np.ndarray]
+    players: Dict[str, np.ndarray]
+
+    def __init__(self, path: str) -> None:
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            self.kind = meta["kind"]
+            self.name = meta["name"]
+            self.prefix = meta["prefix"]
+            self.args = meta["args"]
+            self.defaults = meta["defaults"]
+            self.columns = {name: data[name] for name, _ in COLUMNS[self.kind]} if self.kind else {}
+            self.players = {name: data[name] for name in _PLAYER_COLUMNS if name in data}
+
+    def __len__(self) -> int:
+        return len(self.columns["game_id"]) if self.columns else 0
+
+    def restore_storage(self) -> InMemoryStorage:
+        """ A storage with the recorded final ratings of every player. """
+        players = self.players
+        if self.kind == "gor":
+            storage = InMemoryStorage(GorEntry)
+            for player_id, rating in zip(players["player_id"].tolist(), players["player_rating"].tolist()):
+                storage.set(player_id, GorEntry(rating))
+            return storage
+
+        timestamps = players.get("player_timestamp", np.full(len(players["player_id"]), nan))
+        storage = InMemoryStorage(Glicko2Entry)
+        for player_id, rating, deviation, volatility, timestamp in zip(
+            players["player_id"].tolist(),
+            players["player_rating"].tolist(),
+            players["player_deviation"].tolist(),
+            players["player_volatility"].tolist(),
+            timestamps.tolist(),
+        ):
+            storage.set(player_id, Glicko2Entry(rating, deviation, volatility, None if isnan(timestamp) else timestamp))
+        return storage
+
+
+def load_analytics(path: str) -> RecordedAnalytics:
+    return RecordedAnalytics(path)
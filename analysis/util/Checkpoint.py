@@ -0,0 +1,152 @@
+import os
+import pickle
+import struct
+import sys
+import zlib
+from typing import Any, Dict, List, Optional
+
+from goratings.interfaces import GameRecord
+
+from .CLI import cli
+from .Config import config
+from .GameData import GameData
+from .ResumeToken import GameKey
+from .SqliteStorage import SqliteStorage
+from .TallyGameAnalytics import TallyGameAnalytics
+
+__all__ = ["Checkpointer", "load_checkpoint", "save_checkpoint"]
+
+cli.add_argument(
+    "--checkpoint", dest="checkpoint", type=str, default="", metavar="FILE",
+    help="Save the ratings, tallies and position in the game stream to FILE every --checkpoint-every games and at "
+    "the end of the run",
+)
+cli.add_argument(
+    "--checkpoint-every", dest="checkpoint_every", type=int, default=1000000,
+    help="Number of games between checkpoints",
+)
+cli.add_argument(
+    "--restore", dest="restore", type=str, default="", metavar="FILE",
+    help="Continue from the checkpoint in FILE. Options may differ from the run that saved it, to branch off with a "
+    "new configuration",
+)
+
+
+# File layout: magic, format version, then the zlib compressed pickle of a
+# dict with the run name and arguments, the number of games processed, the
+# key of the last game processed from each dataset, the storage's pickled
+# state and the state of each tally.
+MAGIC = b"GRCHKPT\0"
+VERSION = 1
+HEADER = struct.Struct("<8sI")
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION))
+        f.write(zlib.compress(pickle.dumps(checkpoint, pickle.HIGHEST_PROTOCOL), 1))
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise Exception("%s is not a version %d checkpoint" % (path, VERSION))
+    return pickle.loads(zlib.decompress(data[HEADER.size:]))  # type: ignore
+
+
+class Checkpointer:
+    """
+    Saves and restores the state of a replay: the storage, which holds the
+    ratings and the timeout flags used by should_skip_game, the tallies, and
+    where in each dataset the replay is.
+
+    Construct it after the storage and tallies, and before iterating
+    `game_data`, so that with --restore the storage and tallies are reloaded
+    and the datasets continue after the last game the checkpoint covered.
+    Call `processed` after each game has been rated and tallied, and `close`
+    at the end.
+
+    The storage must support pickling its state with `__getstate__` and
+    `__setstate__`, like InMemoryStorage does, so not SqliteStorage.
+    """
+
+    path: str
+    every: int
+    games: int
+    _game_data: GameData
+    _storage: Any
+    _tallies: List[TallyGameAnalytics]
+    _positions: Dict[str, GameKey]
+    _dataset: Optional[str]
+    _last: Optional[GameRecord]
+
+    def __init__(
+        self,
+        game_data: GameData,
+        storage: Any,
+        tallies: List[TallyGameAnalytics],
+        path: Optional[str] = None,
+        every: Optional[int] = None,
+    ) -> None:
+        self.path = config.args.checkpoint if path is None else path
+        if (self.path or config.args.restore) and isinstance(storage, SqliteStorage):
+            raise Exception("--checkpoint and --restore can't be used with --storage, its file keeps the ratings")
+        self.every = max(1, config.args.checkpoint_every if every is None else every)
+        self.games = 0
+        self._game_data = game_data
+        self._storage = storage
+        self._tallies = tallies
+        self._positions = {}
+        self._dataset = None
+        self._last = None
+        if config.args.restore:
+            self.restore(config.args.restore)
+
+    def restore(self, path: str) -> None:
+        checkpoint = load_checkpoint(path)
+        if len(checkpoint["tallies"]) != len(self._tallies):
+            raise Exception("%s has %d tallies, expected %d" % (path, len(checkpoint["tallies"]), len(self._tallies)))
+        self._storage.__setstate__(checkpoint["storage"])
+        for tally, state in zip(self._tallies, checkpoint["tallies"]):
+            tally.set_state(state)
+        self.games = checkpoint["games"]
+        self._positions = dict(checkpoint["positions"])
+        self._game_data.set_start_keys(self._positions)
+        sys.stdout.write("Restored %s from %s after %d games\n" % (checkpoint["name"], path, self.games))
+        sys.stdout.flush()
+
+    def processed(self, game: GameRecord) -> None:
+        dataset = self._game_data.dataset
+        if dataset != self._dataset:
+            self._save_position()
+            self._dataset = dataset
+        self._last = game
+        self.games += 1
+        if self.path and self.games % self.every == 0:
+            self.save()
+
+    def _save_position(self) -> None:
+        if self._dataset is not None and self._last is not None:
+            self._positions[self._dataset] = (self._last.ended, self._last.game_id)
+
+    def save(self, path: Optional[str] = None) -> None:
+        self._save_position()
+        save_checkpoint(
+            path or self.path,
+            {
+                "name": config.name,
+                "args": vars(config.args),
+                "games": self.games,
+                "positions": self._positions,
+                "storage": self._storage.__getstate__(),
+                "tallies": [tally.get_state() for tally in self._tallies],
+            },
+        )
+
+    def close(self) -> None:
+        if self.path:
+            self.save()
@@ -1,48 +1,66 @@
 import argparse
 import locale
 
-from goratings.math.glicko2 import glicko2_configure
+from goratings.math.glicko2 import VOLATILITY_SOLVERS, Glicko2Config, glicko2_config, glicko2_configure
 
 from .CLI import cli
-from .RatingMath import configure_rating_to_rank
+from .Profiler import profiler
+from .RatingMath import RankSystem, configure_rating_to_rank
 
-__all__ = ["config"]
-
-
-locale.setlocale(locale.LC_ALL, "")
+__all__ = ["config", "glicko2_config_from_args"]
 
 
 class Config:
+    args: argparse.Namespace
+    name: str
+    rank_system: RankSystem
+    glicko2: Glicko2Config
+
     def __init__(self) -> None:
         pass
 
     def __call__(self, args: argparse.Namespace, name: str) -> None:
+        # For the locale aware progress output, set here rather than on import.
+        locale.setlocale(locale.LC_ALL, "")
         self.args = args
-        configure_rating_to_rank(args)
-        configure_glicko2(args)
+        self.rank_system = configure_rating_to_rank(args)
+        self.glicko2 = configure_glicko2(args)
         self.name = name
+        if args.profile or args.profile_trace:
+            profiler.install(args.profile_trace, args.profile_trace_limit)
 
 
-glicko2_config = cli.add_argument_group("glicko2 configuration")
-glicko2_config.add_argument("--tao", dest="tao", type=float, default=0.5, help="tao")
-glicko2_config.add_argument("--min-rd", dest="min_rd", type=float, default=10.0, help="minimum rating deviation")
-glicko2_config.add_argument(
+glicko2_args = cli.add_argument_group("glicko2 configuration")
+glicko2_args.add_argument("--tao", dest="tao", type=float, default=0.5, help="tao")
+glicko2_args.add_argument("--min-rd", dest="min_rd", type=float, default=10.0, help="minimum rating deviation")
+glicko2_args.add_argument(
     "--max-rd", dest="max_rd", type=float, default=500.0, help="maximum rating deviation",
 )
-glicko2_config.add_argument(
+glicko2_args.add_argument(
     "--aging-period", dest="aging_period", type=float,
     help="number of days in the aging period, or --no-aging-period to disable",
 )
-glicko2_config.add_argument(
+glicko2_args.add_argument(
     "--no-aging-period", dest="aging_period", action='store_const', const=None,
     help="turn off aging period",
 )
+glicko2_args.add_argument(
+    "--volatility-solver", dest="volatility_solver", type=str, choices=VOLATILITY_SOLVERS, default="illinois",
+    help="root finder used for the glicko2 volatility update",
+)
+
+
+def glicko2_config_from_args(args: argparse.Namespace) -> Glicko2Config:
+    return glicko2_config(
+        tao=args.tao, min_rd=args.min_rd, max_rd=args.max_rd,
+        aging_period_days=args.aging_period, volatility_solver=args.volatility_solver,
+    )
 
 
-def configure_glicko2(args: argparse.Namespace) -> None:
-    glicko2_configure(
+def configure_glicko2(args: argparse.Namespace) -> Glicko2Config:
+    return glicko2_configure(
         tao=args.tao, min_rd=args.min_rd, max_rd=args.max_rd,
-        aging_period_days=args.aging_period,
+        aging_period_days=args.aging_period, volatility_solver=args.volatility_solver,
     )
 
 
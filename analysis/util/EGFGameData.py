@@ -2,46 +2,94 @@ import os
 import sqlite3
 import sys
 from time import time
-from typing import Iterator
+from typing import Dict, Iterator, Optional, Tuple
 
 from goratings.interfaces import GameRecord
 
 from .Config import config
+from .ResumeToken import END_KEY, GameKey, load_resume_key, track_resume_key
 
 __all__ = ["EGFGameData"]
 
 
 class EGFGameData:
-    _conn: sqlite3.Connection
+    _connection: Optional[sqlite3.Connection]
+    sqlite_filename: str
     quiet: bool
+    start_key: Optional[GameKey]
+    _player_stats: Optional[Dict[int, Tuple[int, float]]]
 
     def __init__(self, sqlite_filename: str = "data/egf-data.db", quiet: bool = False) -> None:
         if not os.path.exists(sqlite_filename) and os.path.exists("../" + sqlite_filename):
             sqlite_filename = "../" + sqlite_filename
 
-        self._conn = sqlite3.connect(sqlite_filename)
+        self.sqlite_filename = sqlite_filename
+        self._connection = None
         self.quiet = quiet
+        self.start_key = None
+        self._player_stats = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use, TallyGameAnalytics keeps an instance for the
+        # org stats even when the EGF data isn't used.
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.sqlite_filename)
+        return self._connection
 
     def __iter__(self) -> Iterator[GameRecord]:
         c = self._conn.cursor()
-        limit = config.args.num_games or 99999999999
-        offset = config.args.games_offset
-        t = 0.0
-        ct = 0
+        after = self._start_key(c)
+        limit = config.args.num_games or -1
         num_records = 0
 
-        for row in c.execute(
-            """
-                SELECT count(*) from game_records
-            """
-        ):
+        if after is None:
+            c.execute("SELECT count(*) from game_records")
+        else:
+            c.execute("SELECT count(*) from game_records WHERE (ended, id) > (?, ?)", after)
+        for row in c:
             num_records = int(row[0])
-            if offset > num_records:
-                num_records = 0
-            else:
-                num_records = num_records - offset
-            if limit < num_records:
+            if limit >= 0 and limit < num_records:
                 num_records = limit
+        c.close()
+
+        games = self._iter_games(limit, after, num_records, self.quiet)
+        if config.args.resume_token:
+            return track_resume_key(games, config.args.resume_token, self.resume_name)
+        return games
+
+    def all_games(self) -> Iterator[GameRecord]:
+        return self._iter_games(-1, None, 0, True)
+
+    @property
+    def cache_name(self) -> str:
+        return "all"
+
+    @property
+    def resume_name(self) -> str:
+        return "%s.%s" % (os.path.basename(self.sqlite_filename), self.cache_name)
+
+    def _start_key(self, c: sqlite3.Cursor) -> Optional[GameKey]:
+        if self.start_key is not None:
+            return self.start_key
+        if config.args.resume_token:
+            key = load_resume_key(config.args.resume_token, self.resume_name)
+            if key is not None:
+                return key
+
+        offset = config.args.games_offset
+        if not offset:
+            return None
+        for row in c.execute("SELECT ended, id FROM game_records ORDER BY ended, id LIMIT 1 OFFSET ?", (offset - 1,)):
+            return (row[0], row[1])
+        return END_KEY
+
+    def _iter_games(
+        self, limit: int, after: Optional[GameKey], num_records: int, quiet: bool
+    ) -> Iterator[GameRecord]:
+        c = self._conn.cursor()
+        t = 0.0
+        ct = 0
 
         started = time()
         for row in c.execute(
@@ -60,16 +108,15 @@ class EGFGameData:
                     black_manual_rank_update,
                     white_manual_rank_update
                 FROM
-                    game_records ORDER BY ended
+                    game_records %s
+                ORDER BY ended, id
                 LIMIT
                     ?
-                OFFSET
-                    ?
-            """,
-            (limit, offset),
+            """ % ("" if after is None else "WHERE (ended, id) > (?, ?)"),
+            (limit,) if after is None else (after[0], after[1], limit),
         ):
             ct += 1
-            if not self.quiet and time() - t > 0.05:
+            if not quiet and time() - t > 0.05:
                 t = time()
                 records_per_second = ct / (time() - started)
                 seconds_left = (num_records - ct) / records_per_second
@@ -79,7 +126,7 @@ class EGFGameData:
                 sys.stdout.flush()
 
             handicap = row[2]
-            rules = "japanese", # best guess
+            rules = "japanese" # best guess
             komi = 0.5 if int(handicap) else 6.5
             yield GameRecord(
                 row[0], row[1], handicap, komi, row[4], row[5], row[6], row[7], row[8], row[9],
@@ -87,32 +134,38 @@ class EGFGameData:
                 row[10], row[11],
             )
 
-        if not self.quiet:
+        if not quiet:
             time_elapsed = time() - started
             sys.stdout.write(f"\n{ct:n} games processed in {time_elapsed:.1f} seconds\n")
             sys.stdout.flush()
         c.close()
 
+    def player_stats(self) -> Dict[int, Tuple[int, float]]:
+        """
+        Number of games played and when the last one ended, for every
+        player, from one aggregate query that is run once per loader.
+        """
+        if self._player_stats is None:
+            c = self._conn.cursor()
+            self._player_stats = {
+                row[0]: (row[1], row[2])
+                for row in c.execute(
+                    """
+                        SELECT player_id, count(*), max(ended)
+                        FROM (
+                            SELECT black_id AS player_id, ended FROM game_records
+                            UNION ALL
+                            SELECT white_id AS player_id, ended FROM game_records
+                        )
+                        GROUP BY player_id
+                    """
+                )
+            }
+            c.close()
+        return self._player_stats
 
     def last_game_played(self, player_id: int) -> float:
-        c = self._conn.cursor()
-        ret = 0
-        for row in c.execute('SELECT ended FROM game_records WHERE white_id = ? ORDER BY -ended LIMIT 1', [player_id]):
-            ret = max(ret, row[0])
-        for row in c.execute('SELECT ended FROM game_records WHERE black_id = ? ORDER BY -ended LIMIT 1', [player_id]):
-            ret = max(ret, row[0])
-        c.close()
-        return ret
+        return self.player_stats().get(player_id, (0, 0))[1]
 
     def num_games_played(self, player_id: int) -> int:
-        c = self._conn.cursor()
-        ret = 0
-        for row in c.execute('SELECT count(*) FROM game_records WHERE black_id = ?', [player_id]):
-            ret += row[0]
-        for row in c.execute('SELECT count(*) FROM game_records WHERE white_id = ?', [player_id]):
-            ret += row[0]
-        c.close()
-        return ret
-
-
-
+        return self.player_stats().get(player_id, (0, 0))[0]
@@ -0,0 +1,145 @@
+from array import array
+from typing import Any, Dict, Iterator, Sequence, Tuple
+
+from goratings.interfaces import GameRecord
+
+__all__ = ["GameBatch", "RULES", "normalize_rules", "rules_code"]
+
+
+# Interned rules, a rules code is the index into this tuple.
+RULES: Tuple[str, ...] = ("japanese", "chinese", "aga", "korean", "ing", "nz")
+
+# Spellings found in the game records, mapped to the rules they mean.
+_RULES_ALIASES: Dict[str, str] = {
+    "aga": "aga",
+    "chinese": "chinese",
+    "ing": "ing",
+    "japanese": "japanese",
+    "korean": "korean",
+    "nz": "nz",
+    "Japanese": "japanese",
+    "age": "aga",
+    "ing sst": "ing",
+    "ogs": "japanese",
+}
+
+_RULES_CODES: Dict[str, int] = {raw: RULES.index(rules) for raw, rules in _RULES_ALIASES.items()}
+
+
+def normalize_rules(raw: str) -> str:
+    return RULES[rules_code(raw)]
+
+
+def rules_code(raw: str) -> int:
+    code = _RULES_CODES.get(raw)
+    if code is None:
+        # Report new, unknown, rules spellings so we can clean them properly.
+        raise Exception("Unknown rules: '" + raw + "'")
+    return code
+
+
+class GameBatch:
+    """
+    A chunk of consecutive games stored as typed columns, one entry per game,
+    for engines that can consume games without building a GameRecord each.
+    Rules are stored as codes into `RULES`.  `time_per_move` and `ended` are
+    int64, or float64 in batches where the database has fractions of them.
+    """
+
+    game_id: "array[int]"
+    size: "array[int]"
+    handicap: "array[int]"
+    komi: "array[float]"
+    black_id: "array[int]"
+    white_id: "array[int]"
+    time_per_move: "array[Any]"
+    timeout: "array[int]"
+    winner_id: "array[int]"
+    ended: "array[Any]"
+    rules: "array[int]"
+
+    def __init__(self) -> None:
+        self.game_id = array("q")
+        self.size = array("h")
+        self.handicap = array("h")
+        self.komi = array("d")
+        self.black_id = array("q")
+        self.white_id = array("q")
+        self.time_per_move = array("q")
+        self.timeout = array("b")
+        self.winner_id = array("q")
+        self.ended = array("q")
+        self.rules = array("B")
+
+    @staticmethod
+    def from_rows(rows: Sequence[Sequence[Any]]) -> "GameBatch":
+        """
+        A batch of `rows`, which have the GameRecord fields in its order, up
+        to and including the rules.
+        """
+        game_id, size, handicap, komi, black_id, white_id, time_per_move, timeout, winner_id, ended, rules = list(
+            zip(*rows)
+        )[:11]
+        batch = GameBatch()
+        batch.game_id.extend(game_id)
+        batch.size.extend(size)
+        batch.handicap.extend(handicap)
+        batch.komi.extend(komi)
+        batch.black_id.extend(black_id)
+        batch.white_id.extend(white_id)
+        batch.time_per_move = _integer_column(time_per_move)
+        batch.timeout.extend(timeout)
+        batch.winner_id.extend(winner_id)
+        batch.ended = _integer_column(ended)
+        batch.rules.extend(map(rules_code, rules))
+        return batch
+
+    @staticmethod
+    def from_records(games: Sequence[GameRecord]) -> "GameBatch":
+        return GameBatch.from_rows(
+            [
+                (
+                    game.game_id,
+                    game.size,
+                    game.handicap,
+                    game.komi,
+                    game.black_id,
+                    game.white_id,
+                    game.time_per_move,
+                    game.timeout,
+                    game.winner_id,
+                    game.ended,
+                    game.rules,
+                )
+                for game in games
+            ]
+        )
+
+    def __len__(self) -> int:
+        return len(self.game_id)
+
+    def record(self, idx: int) -> GameRecord:
+        return GameRecord(
+            self.game_id[idx],
+            self.size[idx],
+            self.handicap[idx],
+            self.komi[idx],
+            self.black_id[idx],
+            self.white_id[idx],
+            self.time_per_move[idx],
+            bool(self.timeout[idx]),
+            self.winner_id[idx],
+            self.ended[idx],
+            RULES[self.rules[idx]],
+        )
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for idx in range(len(self)):
+            yield self.record(idx)
+
+
+def _integer_column(values: Sequence[Any]) -> "array[Any]":
+    try:
+        return array("q", values)
+    except TypeError:
+        return array("d", values)
@@ -0,0 +1,236 @@
+import mmap
+import os
+import struct
+import sys
+from math import isnan
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Optional, Tuple
+
+from goratings.interfaces import GameRecord
+
+from .Config import config
+from .GameBatch import RULES, rules_code
+from .ResumeToken import GameKey, load_resume_key
+
+__all__ = ["GameCache"]
+
+
+# File layout: a fixed header followed by fixed width little endian game
+# records, in the order the loader produced them (sorted by `ended`, then
+# game id).
+#
+#   header: magic, format version, record size, source .db size, source .db
+#           mtime (ns), number of records
+#   record: ended, game_id, black_id, white_id, winner_id, komi,
+#           time_per_move, black_manual_rank_update,
+#           white_manual_rank_update, handicap, size, timeout, rules code
+#
+# Missing manual rank updates are stored as NaN.
+MAGIC = b"GRGAMES\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIqqq")
+RECORD = struct.Struct("<dqqqqddddhhBB")
+_KEY = struct.Struct("<dq")
+_NAN = float("nan")
+
+
+class GameCache:
+    """
+    Memory-mapped, fixed width binary copy of a loader's filtered and sorted
+    game stream.  Build one with `GameCache.open_or_build`, which rebuilds the
+    file whenever the source .db file changes.
+    """
+
+    path: str
+    _file: Optional[BinaryIO]
+    _mmap: Optional[mmap.mmap]
+    _count: int
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, _, _, count = HEADER.unpack_from(self._mmap)
+        assert magic == MAGIC and version == VERSION and record_size == RECORD.size
+        self._count = count
+
+    @staticmethod
+    def open_or_build(
+        path: str, source_filename: str, games: Callable[[], Iterable[GameRecord]], quiet: bool = False
+    ) -> "GameCache":
+        """
+        Opens the cache at `path`, first (re)building it from `games()` if it
+        is missing, stale, or was written by a different version.
+        """
+        if not GameCache.is_fresh(path, source_filename):
+            if not quiet:
+                sys.stdout.write("Compiling game cache %s\n" % path)
+                sys.stdout.flush()
+            GameCache.build(path, source_filename, games())
+        return GameCache(path)
+
+    @staticmethod
+    def for_dataset(data: Any, quiet: bool = False) -> "GameCache":
+        """ The cache of the game stream of the loader `data`, kept next to its .db file. """
+        return GameCache.open_or_build(
+            "%s.%s.gamecache" % (data.sqlite_filename, data.cache_name),
+            data.sqlite_filename,
+            data.all_games,
+            quiet=quiet,
+        )
+
+    def dataset_range(self, data: Any) -> Tuple[int, Optional[int]]:
+        """
+        Start and stop indexes of the games iterating over the loader `data`
+        yields with the current options, for a cache from `for_dataset`.
+        """
+        start = config.args.games_offset
+        key = data.start_key
+        if key is None and config.args.resume_token:
+            key = load_resume_key(config.args.resume_token, data.resume_name)
+        if key is not None:
+            start = self.find_after(key)
+        stop = start + config.args.num_games if config.args.num_games else None
+        return start, stop
+
+    @staticmethod
+    def is_fresh(path: str, source_filename: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        stat = os.stat(source_filename)
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+        if len(header) != HEADER.size:
+            return False
+        magic, version, record_size, source_size, source_mtime, _ = HEADER.unpack(header)
+        return (
+            magic == MAGIC
+            and version == VERSION
+            and record_size == RECORD.size
+            and source_size == stat.st_size
+            and source_mtime == stat.st_mtime_ns
+        )
+
+    @staticmethod
+    def build(path: str, source_filename: Optional[str], games: Iterable[GameRecord]) -> None:
+        """
+        Writes `games` to a new cache file at `path`.  Without a
+        `source_filename` the cache is never considered fresh, which is fine
+        for scratch files that are not reopened with `open_or_build`.
+        """
+        source_size, source_mtime = 0, 0
+        if source_filename is not None:
+            stat = os.stat(source_filename)
+            source_size, source_mtime = stat.st_size, stat.st_mtime_ns
+        tmp_path = path + ".tmp"
+        count = 0
+        pack = RECORD.pack
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, source_size, source_mtime, 0))
+            for game in games:
+                f.write(
+                    pack(
+                        game.ended,
+                        game.game_id,
+                        game.black_id,
+                        game.white_id,
+                        game.winner_id,
+                        game.komi,
+                        game.time_per_move,
+                        _NAN if game.black_manual_rank_update is None else game.black_manual_rank_update,
+                        _NAN if game.white_manual_rank_update is None else game.white_manual_rank_update,
+                        game.handicap,
+                        game.size,
+                        bool(game.timeout),
+                        rules_code(game.rules),
+                    )
+                )
+                count += 1
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, source_size, source_mtime, count))
+        os.replace(tmp_path, path)
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def key(self, idx: int) -> GameKey:
+        assert self._mmap is not None
+        return _KEY.unpack_from(self._mmap, HEADER.size + idx * RECORD.size)  # type: ignore
+
+    def find_after(self, key: GameKey) -> int:
+        """ Returns the index of the first record whose (ended, game_id) is after `key`. """
+        lo = 0
+        hi = self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) <= tuple(key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def record(self, idx: int) -> GameRecord:
+        assert self._mmap is not None
+        return _to_game_record(RECORD.unpack_from(self._mmap, HEADER.size + idx * RECORD.size))
+
+    def iter_records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[GameRecord]:
+        for fields in self._iter_fields(start, stop):
+            yield _to_game_record(fields)
+
+    def iter_pairings(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[float, int, int]]:
+        """ (ended, black_id, white_id) of each record, cheaper than `iter_records` for planning a replay. """
+        for fields in self._iter_fields(start, stop):
+            yield fields[0], fields[2], fields[3]
+
+    def _iter_fields(self, start: int, stop: Optional[int]) -> Iterator[tuple]:
+        stop = self._count if stop is None else min(stop, self._count)
+        if self._mmap is None or start >= stop:
+            return
+        view = memoryview(self._mmap)[HEADER.size + start * RECORD.size : HEADER.size + stop * RECORD.size]
+        try:
+            yield from RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        return self.iter_records()
+
+
+def _to_game_record(fields: tuple) -> GameRecord:
+    (
+        ended,
+        game_id,
+        black_id,
+        white_id,
+        winner_id,
+        komi,
+        time_per_move,
+        black_manual_rank_update,
+        white_manual_rank_update,
+        handicap,
+        size,
+        timeout,
+        rules,
+    ) = fields
+    return GameRecord(
+        game_id,
+        size,
+        handicap,
+        komi,
+        black_id,
+        white_id,
+        int(time_per_move) if time_per_move.is_integer() else time_per_move,
+        bool(timeout),
+        winner_id,
+        int(ended) if ended.is_integer() else ended,
+        RULES[rules],
+        None if isnan(black_manual_rank_update) else black_manual_rank_update,
+        None if isnan(white_manual_rank_update) else white_manual_rank_update,
+    )
@@ -1,5 +1,8 @@
 import sys
-from typing import Dict, Iterator
+from datetime import datetime, timezone
+from itertools import takewhile
+from time import time
+from typing import Dict, Iterator, List, Optional, Union
 
 from goratings.interfaces import GameRecord
 
@@ -8,8 +11,18 @@ from .CLI import cli, defaults
 from .Config import config
 from .EGFGameData import EGFGameData
 from .OGSGameData import OGSGameData
+from .ResumeToken import GameKey, track_resume_key
+
+__all__ = ["GameData", "datasets_used", "parse_timestamp"]
+
+
+def parse_timestamp(text: str) -> float:
+    """ Parses seconds since the epoch, or a YYYY-MM-DD date (UTC). """
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.strptime(text, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
 
-__all__ = ["GameData", "datasets_used"]
 
 cli.add_argument(
     "--egf", dest="use_egf_data", const=1, default=False, action="store_const", help="Use EGF dataset",
@@ -33,7 +46,27 @@ cli.add_argument(
 
 cli.add_argument(
     "--games-offset", dest="games_offset", type=int, default=0,
-    help="Number of early games to skip before processing, 0 for none",
+    help="Number of early games to skip before processing, 0 for none. Without --game-cache the skipped games are "
+    "stepped over in the database, which takes time in proportion to the offset; --resume-token starts at a game "
+    "directly",
+)
+
+cli.add_argument(
+    "--resume-token", dest="resume_token", type=str, default="",
+    help="File recording the last game processed from each dataset. Processing continues after that game, and the "
+    "file is updated with the last game processed when the run finishes or stops",
+)
+
+cli.add_argument(
+    "--until", dest="until", type=parse_timestamp, default=None, metavar="DATE",
+    help="Only process games that ended before DATE, given as YYYY-MM-DD or a unix timestamp. Use with --checkpoint "
+    "to save the state at DATE for later runs to --restore",
+)
+
+cli.add_argument(
+    "--game-cache", dest="game_cache", const=1, default=False, action="store_const",
+    help="Read games from a memory-mapped binary cache of each dataset, compiled on first use and rebuilt when the "
+    ".db file changes",
 )
 
 cli.add_argument(
@@ -51,9 +84,14 @@ cli.add_argument(
 class GameData:
     quiet: bool
     ogsdata: OGSGameData
+    egfdata: EGFGameData
+    agadata: AGAGameData
+    # The resume name of the dataset games are currently coming from.
+    dataset: Optional[str]
 
     def __init__(self, quiet: bool = False):
         self.quiet = quiet
+        self.dataset = None
 
         size = config.args.size
         speed = 3 if config.args.corr else 2 if config.args.live else 0
@@ -62,26 +100,61 @@ class GameData:
         self.egfdata = EGFGameData(quiet=quiet)
         self.agadata = AGAGameData(quiet=quiet)
 
-    def __iter__(self) -> Iterator[GameRecord]:
-        data_to_use = datasets_used()
+    def set_start_keys(self, keys: Dict[str, GameKey]) -> None:
+        """ Continues each dataset after the game `keys` gives for its resume name. """
+        for data in (self.ogsdata, self.egfdata, self.agadata):
+            data.start_key = keys.get(data.resume_name)
 
-        if data_to_use["ogs"]:
-            if not self.quiet:
-                sys.stdout.write("\nProcessing OGS data\n")
-            for entry in self.ogsdata:
-                yield entry
-
-        if data_to_use["egf"]:
-            if not self.quiet:
-                sys.stdout.write("\nProcessing EGF data\n")
-            for entry in self.egfdata:
+    def __iter__(self) -> Iterator[GameRecord]:
+        for name in self.dataset_names():
+            for entry in self.dataset_games(name):
                 yield entry
 
-        if data_to_use["aga"]:
-            if not self.quiet:
-                sys.stdout.write("\nProcessing AGA data\n")
-            for entry in self.agadata:
-                yield entry
+    def dataset_names(self) -> List[str]:
+        """ The datasets to use, in the order they are iterated. """
+        data_to_use = datasets_used()
+        return [name for name in ("ogs", "egf", "aga") if data_to_use[name]]
+
+    def dataset_games(self, name: str) -> Iterator[GameRecord]:
+        """ The games of just the dataset `name`, "ogs", "egf" or "aga". """
+        if not self.quiet:
+            sys.stdout.write("\nProcessing %s data\n" % name.upper())
+        data: Union[OGSGameData, EGFGameData, AGAGameData] = {
+            "ogs": self.ogsdata, "egf": self.egfdata, "aga": self.agadata
+        }[name]
+        return self._games(data)
+
+    def _games(self, data: Union[OGSGameData, EGFGameData, AGAGameData]) -> Iterator[GameRecord]:
+        self.dataset = data.resume_name
+        games = self._dataset_games(data)
+        if config.args.until is not None:
+            until = config.args.until
+            return takewhile(lambda game: game.ended < until, games)
+        return games
+
+    def _dataset_games(self, data: Union[OGSGameData, EGFGameData, AGAGameData]) -> Iterator[GameRecord]:
+        if not config.args.game_cache:
+            return iter(data)
+
+        from .GameCache import GameCache
+
+        cache = GameCache.for_dataset(data, self.quiet)
+        start, stop = cache.dataset_range(data)
+        games = self._report_cached(cache.iter_records(start, stop))
+        if config.args.resume_token:
+            return track_resume_key(games, config.args.resume_token, data.resume_name)
+        return games
+
+    def _report_cached(self, games: Iterator[GameRecord]) -> Iterator[GameRecord]:
+        started = time()
+        ct = 0
+        for game in games:
+            ct += 1
+            yield game
+        if not self.quiet:
+            time_elapsed = time() - started
+            sys.stdout.write(f"{ct:n} cached games processed in {time_elapsed:.1f} seconds\n")
+            sys.stdout.flush()
 
 
 def datasets_used() -> Dict[str, bool]:
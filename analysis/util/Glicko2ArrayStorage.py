@@ -0,0 +1,155 @@
+from array import array
+from typing import Any, Collection, Dict, Iterator, Mapping
+
+from goratings.math.glicko2 import Glicko2Entry
+
+from .InMemoryStorage import InMemoryStorage
+
+__all__ = ["Glicko2ArrayStorage"]
+
+
+_FLAG_TIMEOUT = 1
+_FLAG_HAS_ENTRY = 2
+
+
+class Glicko2ArrayStorage(InMemoryStorage):
+    """
+    Storage for Glicko2Entry ratings kept as a struct of typed arrays, one row
+    per player, instead of one long lived Python object per player.
+
+    `get` materializes a short lived Glicko2Entry from the player's row.  The
+    entry is a snapshot: engines read the pre-game entry after storing the
+    updated one, so it must not change under them, and changes to it are only
+    kept once passed back to `set`.
+
+    Rating and match history is inherited from InMemoryStorage.  The arrays
+    are pickled with the rest of the storage, and `get_players_state` and
+    `update_players_state` use the same format as InMemoryStorage, so players
+    can be moved between the two.
+    """
+
+    _rows: Dict[int, int]
+    _ids: "array[int]"
+    _rating: "array[float]"
+    _deviation: "array[float]"
+    _volatility: "array[float]"
+    # Game timestamps may have fractions of a second.
+    _timestamp: "array[float]"
+    _set_count_col: "array[int]"
+    _flags: bytearray
+
+    def __init__(self) -> None:
+        super().__init__(Glicko2Entry)
+        self._rows = {}
+        self._ids = array("q")
+        self._rating = array("d")
+        self._deviation = array("d")
+        self._volatility = array("d")
+        self._timestamp = array("d")
+        self._set_count_col = array("q")
+        self._flags = bytearray()
+
+    def _row(self, player_id: int) -> int:
+        row = self._rows.get(player_id)
+        if row is None:
+            row = len(self._ids)
+            self._rows[player_id] = row
+            self._ids.append(player_id)
+            self._rating.append(1500.0)
+            self._deviation.append(350.0)
+            self._volatility.append(0.06)
+            self._timestamp.append(0.0)
+            self._set_count_col.append(0)
+            self._flags.append(0)
+        return row
+
+    def get_players_state(self, player_ids: Collection[int]) -> Dict[str, Any]:
+        state = super().get_players_state(player_ids)
+        for player_id in player_ids:
+            row = self._rows.get(player_id)
+            if row is None:
+                continue
+            if self._flags[row] & _FLAG_HAS_ENTRY:
+                state["_data"][player_id] = self._entry(row)
+            state["_timeout_flags"][player_id] = bool(self._flags[row] & _FLAG_TIMEOUT)
+            state["_set_count"][player_id] = self._set_count_col[row]
+        return state
+
+    def update_players_state(self, state: Dict[str, Any]) -> None:
+        for player_id, entry in state["_data"].items():
+            row = self._row(player_id)
+            self._store(row, entry)
+            self._flags[row] |= _FLAG_HAS_ENTRY
+        for player_id, tf in state["_timeout_flags"].items():
+            self.set_timeout_flag(player_id, tf)
+        for player_id, count in state["_set_count"].items():
+            self._set_count_col[self._row(player_id)] = count
+        self._rating_history.update(state["_rating_history"])
+        self._match_history.update(state["_match_history"])
+
+    def get(self, player_id: int) -> Glicko2Entry:
+        row = self._row(player_id)
+        self._flags[row] |= _FLAG_HAS_ENTRY
+        return self._entry(row)
+
+    def _entry(self, row: int) -> Glicko2Entry:
+        return Glicko2Entry(
+            self._rating[row], self._deviation[row], self._volatility[row], self._timestamp[row] or None,
+        )
+
+    def set(self, player_id: int, entry: Any) -> None:
+        row = self._row(player_id)
+        self._store(row, entry)
+        self._set_count_col[row] += 1
+        self._flags[row] |= _FLAG_HAS_ENTRY
+
+    def _store(self, row: int, entry: Any) -> None:
+        self._rating[row] = entry.rating
+        self._deviation[row] = entry.deviation
+        self._volatility[row] = entry.volatility
+        self._timestamp[row] = entry.timestamp or 0
+
+    def clear_set_count(self, player_id: int) -> None:
+        self._set_count_col[self._row(player_id)] = 0
+
+    def get_set_count(self, player_id: int) -> int:
+        row = self._rows.get(player_id)
+        return 0 if row is None else self._set_count_col[row]
+
+    def all_players(self) -> Mapping[int, Any]:  # type: ignore
+        return _Glicko2ArrayPlayers(self)
+
+    def get_timeout_flag(self, player_id: int) -> bool:
+        row = self._rows.get(player_id)
+        return row is not None and bool(self._flags[row] & _FLAG_TIMEOUT)
+
+    def set_timeout_flag(self, player_id: int, tf: bool) -> None:
+        row = self._row(player_id)
+        if tf:
+            self._flags[row] |= _FLAG_TIMEOUT
+        else:
+            self._flags[row] &= ~_FLAG_TIMEOUT & 0xFF
+
+
+class _Glicko2ArrayPlayers(Mapping):
+    # Read only `all_players()` mapping of player id to entry, covering the
+    # players that have been given an entry through `get` or `set`.
+    _storage: Glicko2ArrayStorage
+
+    def __init__(self, storage: Glicko2ArrayStorage) -> None:
+        self._storage = storage
+
+    def __getitem__(self, player_id: int) -> Glicko2Entry:
+        row = self._storage._rows.get(player_id)
+        if row is None or not self._storage._flags[row] & _FLAG_HAS_ENTRY:
+            raise KeyError(player_id)
+        return self._storage._entry(row)
+
+    def __iter__(self) -> Iterator[int]:
+        flags = self._storage._flags
+        for row, player_id in enumerate(self._storage._ids):
+            if flags[row] & _FLAG_HAS_ENTRY:
+                yield player_id
+
+    def __len__(self) -> int:
+        return sum(1 for flag in self._storage._flags if flag & _FLAG_HAS_ENTRY)
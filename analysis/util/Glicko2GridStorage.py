@@ -0,0 +1,177 @@
+from array import array
+from typing import Any, Dict, Iterator, List, Mapping, Tuple
+
+from goratings.math.glicko2 import Glicko2Entry
+
+from .InMemoryStorage import InMemoryStorage
+
+__all__ = ["GRID_SIZES", "GRID_SPEEDS", "Glicko2GridStorage", "grid_category"]
+
+
+# Categories are every combination of a speed and a size, either of which
+# can be 999 for all speeds or sizes.
+GRID_SPEEDS: Tuple[int, ...] = (999, 1, 2, 3)
+GRID_SIZES: Tuple[int, ...] = (999, 9, 13, 19)
+NUM_CATEGORIES = len(GRID_SPEEDS) * len(GRID_SIZES)
+
+_SPEED_INDEX: Dict[int, int] = {speed: idx for idx, speed in enumerate(GRID_SPEEDS)}
+_SIZE_INDEX: Dict[int, int] = {size: idx for idx, size in enumerate(GRID_SIZES)}
+
+# Values stored for each category: rating, deviation and volatility.
+_STRIDE = 3
+_ROW_VALUES = NUM_CATEGORIES * _STRIDE
+_DEFAULT_ROW = array("d", (1500.0, 350.0, 0.06) * NUM_CATEGORIES)
+
+
+def grid_category(speed: int, size: int) -> int:
+    return _SPEED_INDEX[speed] * len(GRID_SIZES) + _SIZE_INDEX[size]
+
+
+class Glicko2GridStorage:
+    """
+    Glicko2 ratings for all the speed / size categories, kept in one row per
+    player so an engine can read and update all of a game's categories
+    together.  A player's row holds the rating, deviation and volatility of
+    every category back to back in `values`, starting at
+    `row * NUM_CATEGORIES * 3`, and one bit per category in the timeout flag
+    and has-entry masks.
+
+    `category(speed, size)` gives a Storage view of one category, for code
+    that works with a single storage such as TallyGameAnalytics.
+    """
+
+    values: "array[float]"
+    timeouts: "array[int]"
+    has_entry: "array[int]"
+    _rows: Dict[int, int]
+    _ids: "array[int]"
+    _set_counts: "array[int]"
+    _categories: List["Glicko2GridCategory"]
+
+    def __init__(self) -> None:
+        self.values = array("d")
+        self.timeouts = array("l")
+        self.has_entry = array("l")
+        self._rows = {}
+        self._ids = array("q")
+        self._set_counts = array("q")
+        self._categories = [Glicko2GridCategory(self, category) for category in range(NUM_CATEGORIES)]
+
+    # The category views are left out of pickles, for checkpoints, and kept
+    # when restoring into an existing grid so views handed out stay valid.
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_categories"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        if "_categories" not in self.__dict__:
+            self._categories = [Glicko2GridCategory(self, category) for category in range(NUM_CATEGORIES)]
+
+    def row(self, player_id: int) -> int:
+        row = self._rows.get(player_id)
+        if row is None:
+            row = len(self._ids)
+            self._rows[player_id] = row
+            self._ids.append(player_id)
+            self.values.extend(_DEFAULT_ROW)
+            self.timeouts.append(0)
+            self.has_entry.append(0)
+            self._set_counts.extend(array("q", bytes(8 * NUM_CATEGORIES)))
+        return row
+
+    def offset(self, row: int, category: int) -> int:
+        """ Index of the rating of `category` in `values`, followed by the deviation and volatility. """
+        return row * _ROW_VALUES + category * _STRIDE
+
+    def set_values(self, row: int, category: int, rating: float, deviation: float, volatility: float) -> None:
+        values = self.values
+        base = row * _ROW_VALUES + category * _STRIDE
+        values[base] = rating
+        values[base + 1] = deviation
+        values[base + 2] = volatility
+        self._set_counts[row * NUM_CATEGORIES + category] += 1
+        self.has_entry[row] |= 1 << category
+
+    def category(self, speed: int, size: int) -> "Glicko2GridCategory":
+        return self._categories[grid_category(speed, size)]
+
+
+class Glicko2GridCategory(InMemoryStorage):
+    """
+    Storage view of one category of a Glicko2GridStorage.  `get` returns a
+    Glicko2Entry snapshot of the player's ratings, as Glicko2ArrayStorage
+    does.  Rating and match history is inherited from InMemoryStorage.
+    """
+
+    _grid: Glicko2GridStorage
+    _category: int
+    _bit: int
+
+    def __init__(self, grid: Glicko2GridStorage, category: int) -> None:
+        super().__init__(Glicko2Entry)
+        self._grid = grid
+        self._category = category
+        self._bit = 1 << category
+
+    def get(self, player_id: int) -> Glicko2Entry:
+        row = self._grid.row(player_id)
+        self._grid.has_entry[row] |= self._bit
+        return self._entry(row)
+
+    def _entry(self, row: int) -> Glicko2Entry:
+        base = self._grid.offset(row, self._category)
+        values = self._grid.values
+        return Glicko2Entry(values[base], values[base + 1], values[base + 2])
+
+    def set(self, player_id: int, entry: Any) -> None:
+        self._grid.set_values(self._grid.row(player_id), self._category, entry.rating, entry.deviation, entry.volatility)
+
+    def clear_set_count(self, player_id: int) -> None:
+        self._grid._set_counts[self._grid.row(player_id) * NUM_CATEGORIES + self._category] = 0
+
+    def get_set_count(self, player_id: int) -> int:
+        row = self._grid._rows.get(player_id)
+        return 0 if row is None else self._grid._set_counts[row * NUM_CATEGORIES + self._category]
+
+    def all_players(self) -> Mapping[int, Any]:  # type: ignore
+        return _Glicko2GridPlayers(self)
+
+    def get_timeout_flag(self, player_id: int) -> bool:
+        row = self._grid._rows.get(player_id)
+        return row is not None and bool(self._grid.timeouts[row] & self._bit)
+
+    def set_timeout_flag(self, player_id: int, tf: bool) -> None:
+        row = self._grid.row(player_id)
+        if tf:
+            self._grid.timeouts[row] |= self._bit
+        else:
+            self._grid.timeouts[row] &= ~self._bit
+
+
+class _Glicko2GridPlayers(Mapping):
+    # Read only `all_players()` mapping of player id to entry, covering the
+    # players that have been given an entry in the category.
+    _category: Glicko2GridCategory
+
+    def __init__(self, category: Glicko2GridCategory) -> None:
+        self._category = category
+
+    def __getitem__(self, player_id: int) -> Glicko2Entry:
+        grid = self._category._grid
+        row = grid._rows.get(player_id)
+        if row is None or not grid.has_entry[row] & self._category._bit:
+            raise KeyError(player_id)
+        return self._category._entry(row)
+
+    def __iter__(self) -> Iterator[int]:
+        grid = self._category._grid
+        bit = self._category._bit
+        for row, player_id in enumerate(grid._ids):
+            if grid.has_entry[row] & bit:
+                yield player_id
+
+    def __len__(self) -> int:
+        bit = self._category._bit
+        return sum(1 for mask in self._category._grid.has_entry if mask & bit)
@@ -1,27 +1,66 @@
+from bisect import bisect_left
 from collections import defaultdict
-from typing import Any, DefaultDict, Dict, List, Tuple
+from collections.abc import Sequence
+from itertools import islice
+from typing import Any, Collection, DefaultDict, Dict, Iterator, List
 
 from goratings.interfaces import Storage
 
 __all__ = ["InMemoryStorage"]
 
 
+# The attributes holding something per player.
+_PLAYER_STATE = ("_data", "_timeout_flags", "_match_history", "_rating_history", "_set_count")
+
+
 class InMemoryStorage(Storage):
     _data: Dict[int, Any]
     _timeout_flags: DefaultDict[int, bool]
-    _match_history: DefaultDict[int, List[Tuple[int, Any]]]
-    _rating_history: DefaultDict[int, List[Tuple[int, Any]]]
+    _match_history: DefaultDict[int, "History"]
+    _rating_history: DefaultDict[int, "History"]
     _set_count: DefaultDict[int, int]
     entry_type: Any
 
     def __init__(self, entry_type: type) -> None:
         self._data = {}
         self._timeout_flags = defaultdict(lambda: False)
-        self._match_history = defaultdict(lambda: [])
-        self._rating_history = defaultdict(lambda: [])
+        self._match_history = defaultdict(History)
+        self._rating_history = defaultdict(History)
         self._set_count = defaultdict(lambda: 0)
         self.entry_type = entry_type
 
+    # The defaultdicts' factories can't be pickled, so they are pickled as
+    # plain dicts, for checkpoints.
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        for name in ("_timeout_flags", "_match_history", "_rating_history", "_set_count"):
+            state[name] = dict(state[name])
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._timeout_flags = defaultdict(lambda: False, state["_timeout_flags"])
+        self._match_history = defaultdict(History, state["_match_history"])
+        self._rating_history = defaultdict(History, state["_rating_history"])
+        self._set_count = defaultdict(lambda: 0, state["_set_count"])
+
+    def get_players_state(self, player_ids: Collection[int]) -> Dict[str, Any]:
+        """ The part of `__getstate__` about `player_ids`, to continue rating them in another storage. """
+        state: Dict[str, Any] = {"entry_type": self.entry_type}
+        for name in _PLAYER_STATE:
+            values = getattr(self, name)
+            state[name] = {player_id: values[player_id] for player_id in player_ids if player_id in values}
+        return state
+
+    def update_players_state(self, state: Dict[str, Any]) -> None:
+        """
+        Replaces the state of the players in `state`, as returned by
+        `get_players_state` or `__getstate__`.  New players are added in the
+        order of `state["_data"]`.
+        """
+        for name in _PLAYER_STATE:
+            getattr(self, name).update(state[name])
+
     def get(self, player_id: int) -> Any:
         if player_id not in self._data:
             self._data[player_id] = self.entry_type()
@@ -46,44 +85,83 @@ class InMemoryStorage(Storage):
     def set_timeout_flag(self, player_id: int, tf: bool) -> None:
         self._timeout_flags[player_id] = tf
 
-    # We assume we add these entries in ascending order (by timestamp).
+    # We assume we add these entries in ascending order (by timestamp), which
+    # lets the window lookups below binary search the timestamps.
     def add_rating_history(self, player_id: int, timestamp: int, entry: Any) -> None:
-        self._rating_history[player_id].append((timestamp, entry))
+        self._rating_history[player_id].append(timestamp, entry)
 
     def add_match_history(self, player_id: int, timestamp: int, entry: Any) -> None:
-        self._match_history[player_id].append((timestamp, entry))
+        self._match_history[player_id].append(timestamp, entry)
 
     def get_last_game_timestamp(self, player_id: int) -> int:
         if player_id in self._rating_history:
-            return self._rating_history[player_id][-1][0]
+            return self._rating_history[player_id].timestamps[-1]
         return 0
 
     def get_first_rating_older_than(self, player_id: int, timestamp: int) -> Any:
-        for e in reversed(self._rating_history[player_id]):
-            if e[0] < timestamp:
-                return e[1]
+        history = self._rating_history[player_id]
+        idx = bisect_left(history.timestamps, timestamp)
+        if idx > 0:
+            return history.entries[idx - 1]
         return self.entry_type()
 
-    def get_ratings_newer_or_equal_to(self, player_id: int, timestamp: int) -> Any:
-        ct = 0
-        for e in reversed(self._rating_history[player_id]):
-            if e[0] >= timestamp:
-                ct += 1
-            else:
-                break
-        return [e[1] for e in self._rating_history[player_id][-ct:]]
+    def get_ratings_newer_or_equal_to(self, player_id: int, timestamp: int) -> Sequence[Any]:
+        history = self._rating_history[player_id]
+        return HistorySlice(history.entries, bisect_left(history.timestamps, timestamp), len(history.entries))
 
     def get_first_timestamp_older_than(self, player_id: int, timestamp: int) -> Any:
-        for e in reversed(self._rating_history[player_id]):
-            if e[0] < timestamp:
-                return e[0]
+        history = self._rating_history[player_id]
+        idx = bisect_left(history.timestamps, timestamp)
+        if idx > 0:
+            return history.timestamps[idx - 1]
         return None
 
-    def get_matches_newer_or_equal_to(self, player_id: int, timestamp: int) -> Any:
-        ct = 0
-        for e in reversed(self._match_history[player_id]):
-            if e[0] >= timestamp:
-                ct += 1
-            else:
-                break
-        return [e[1] for e in self._match_history[player_id][-ct:]]
+    def get_matches_newer_or_equal_to(self, player_id: int, timestamp: int) -> Sequence[Any]:
+        history = self._match_history[player_id]
+        return HistorySlice(history.entries, bisect_left(history.timestamps, timestamp), len(history.entries))
+
+
+class History:
+    # Parallel, timestamp ordered, lists of timestamps and history entries.
+    __slots__ = ("timestamps", "entries")
+
+    timestamps: List[int]
+    entries: List[Any]
+
+    def __init__(self) -> None:
+        self.timestamps = []
+        self.entries = []
+
+    def append(self, timestamp: int, entry: Any) -> None:
+        self.timestamps.append(timestamp)
+        self.entries.append(entry)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class HistorySlice(Sequence):
+    # Read only view of `entries[start:stop]` that doesn't copy the entries.
+    # Entries appended to the history after the slice was taken are not part
+    # of the slice.
+    __slots__ = ("_entries", "_start", "_stop")
+
+    def __init__(self, entries: List[Any], start: int, stop: int) -> None:
+        self._entries = entries
+        self._start = start
+        self._stop = stop
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, idx: Any) -> Any:
+        if isinstance(idx, slice):
+            return [self._entries[i] for i in range(self._start, self._stop)[idx]]
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(idx)
+        return self._entries[self._start + idx]
+
+    def __iter__(self) -> Iterator[Any]:
+        return islice(self._entries, self._start, self._stop)
@@ -1,19 +1,24 @@
 import os
 import sqlite3
 import sys
+from itertools import islice
 from time import time
-from typing import Iterator
+from typing import Iterator, Optional, Tuple
 
 from goratings.interfaces import GameRecord
 
 from .Config import config
+from .GameBatch import GameBatch, normalize_rules
+from .ResumeToken import END_KEY, GameKey, load_resume_key, track_resume_key, track_resume_key_by
 
 __all__ = ["OGSGameData"]
 
 
 class OGSGameData:
-    _conn: sqlite3.Connection
+    _connection: Optional[sqlite3.Connection]
+    sqlite_filename: str
     quiet: bool
+    start_key: Optional[GameKey]
     size: int
     speed: int
 
@@ -21,19 +26,147 @@ class OGSGameData:
         if not os.path.exists(sqlite_filename) and os.path.exists("../" + sqlite_filename):
             sqlite_filename = "../" + sqlite_filename
 
-        self._conn = sqlite3.connect(sqlite_filename)
+        self.sqlite_filename = sqlite_filename
+        self._connection = None
         self.quiet = quiet
+        self.start_key = None
         self.size = size
         self.speed = speed
 
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Connected on first use, so constructing a loader is free.
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.sqlite_filename)
+        return self._connection
+
     def __iter__(self) -> Iterator[GameRecord]:
         c = self._conn.cursor()
-        limit = config.args.num_games or 99999999999
-        offset = config.args.games_offset
+        after = self._start_key(c)
+        limit = config.args.num_games or -1
+        num_records = self._count(c, after, limit)
+        c.close()
+
+        games = self._iter_games(limit, after, num_records, self.quiet)
+        if config.args.resume_token:
+            return track_resume_key(games, config.args.resume_token, self.resume_name)
+        return games
+
+    def all_games(self) -> Iterator[GameRecord]:
+        return self._iter_games(-1, None, 0, True)
+
+    @property
+    def cache_name(self) -> str:
+        # Distinguishes the differently filtered game streams of this database.
+        return "size%d-speed%d" % (self.size, self.speed)
+
+    @property
+    def resume_name(self) -> str:
+        return "%s.%s" % (os.path.basename(self.sqlite_filename), self.cache_name)
+
+    def _iter_games(
+        self, limit: int, after: Optional[GameKey], num_records: int, quiet: bool
+    ) -> Iterator[GameRecord]:
+        c = self._conn.cursor()
         t = 0.0
         ct = 0
-        num_records = 0
 
+        started = time()
+        for row in c.execute(self._select_query(after), self._select_params(limit, after)):
+            ct += 1
+            if not quiet and time() - t > 0.05:
+                t = time()
+                self._report_progress(ct, num_records, started)
+
+            yield GameRecord(
+                row[0], row[1], row[2], row[3], row[4], row[5], row[6], row[7], row[8], row[9],
+                normalize_rules(row[10]),
+            )
+
+        if not quiet:
+            time_elapsed = time() - started
+            sys.stdout.write(f"\n{ct:n} games processed in {time_elapsed:.1f} seconds\n")
+            sys.stdout.flush()
+        c.close()
+
+    def iter_batches(self, batch_size: int = 65536) -> Iterator[GameBatch]:
+        """
+        Yields the same games as iterating over this object, or over its game
+        cache with --game-cache, in chunks of up to `batch_size` games stored
+        as typed columns.  The resume token is updated as when iterating.
+        """
+        if config.args.game_cache:
+            from .GameCache import GameCache
+
+            cache = GameCache.for_dataset(self, self.quiet)
+            start, stop = cache.dataset_range(self)
+            batches = _cached_batches(cache.iter_records(start, stop), batch_size)
+        else:
+            batches = self._iter_batches(batch_size)
+        if config.args.resume_token:
+            return track_resume_key_by(batches, config.args.resume_token, self.resume_name, _last_key)
+        return batches
+
+    def _iter_batches(self, batch_size: int) -> Iterator[GameBatch]:
+        c = self._conn.cursor()
+        after = self._start_key(c)
+        limit = config.args.num_games or -1
+        num_records = self._count(c, after, limit)
+        ct = 0
+
+        started = time()
+        c.execute(self._select_query(after), self._select_params(limit, after))
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                break
+
+            batch = GameBatch.from_rows(rows)
+            ct += len(batch)
+            if not self.quiet:
+                self._report_progress(ct, num_records, started)
+            yield batch
+
+        if not self.quiet:
+            time_elapsed = time() - started
+            sys.stdout.write(f"\n{ct:n} games processed in {time_elapsed:.1f} seconds\n")
+            sys.stdout.flush()
+        c.close()
+
+    def _report_progress(self, ct: int, num_records: int, started: float) -> None:
+        records_per_second = ct / max(time() - started, 1e-9)
+        seconds_left = (num_records - ct) / records_per_second
+        sys.stdout.write(f"\r{ct:12n} / {num_records:12n} games processed. " + f"{seconds_left:6.1f}s remaining")
+        sys.stdout.flush()
+
+    def _start_key(self, c: sqlite3.Cursor) -> Optional[GameKey]:
+        # Continue after `start_key` if set, or the game saved in the resume
+        # token if there is one, otherwise after the game `--games-offset`
+        # games in.  sqlite can't seek to a row number, so finding that game
+        # steps over the `--games-offset` games before it.
+        if self.start_key is not None:
+            return self.start_key
+        if config.args.resume_token:
+            key = load_resume_key(config.args.resume_token, self.resume_name)
+            if key is not None:
+                return key
+
+        offset = config.args.games_offset
+        if not offset:
+            return None
+
+        join, where = self._join_and_where()
+        for row in c.execute(
+            """
+                SELECT ended, game_records.id FROM game_records %s %s
+                ORDER BY ended, game_records.id LIMIT 1 OFFSET ?
+            """ % (join, where),
+            (offset - 1,),
+        ):
+            return (row[0], row[1])
+        return END_KEY
+
+    def _where(self) -> str:
         where = ""
         if self.size or self.speed:
             where = 'WHERE '
@@ -46,19 +179,31 @@ class OGSGameData:
                     where += ' (time_per_move = 0 OR time_per_move > 3600) '
                 else:
                     where += ' (time_per_move > 0 AND time_per_move < 3600) '
+        return where
+
+    def _count(self, c: sqlite3.Cursor, after: Optional[GameKey], limit: int) -> int:
+        where = self._where()
+        params: Tuple = ()
+        if after is not None:
+            where += ' AND ' if where else 'WHERE '
+            where += ' (ended, id) > (?, ?) '
+            params = after
 
+        num_records = 0
         for row in c.execute(
             """
                 SELECT count(*) from game_records %s
-            """ % where
+            """ % where,
+            params,
         ):
             num_records = int(row[0])
-            if offset > num_records:
-                num_records = 0
-            else:
-                num_records = num_records - offset
-            if limit < num_records:
-                num_records = limit
+        if limit >= 0 and limit < num_records:
+            num_records = limit
+
+        return num_records
+
+    def _join_and_where(self) -> Tuple[str, str]:
+        where = self._where()
 
         NO_BAD_BOTS = True
         join = ''
@@ -76,11 +221,14 @@ class OGSGameData:
             where += ' AND (black_players.is_bot != 1 OR timeout = 0)'
             where += ' AND (white_players.is_bot != 1 OR timeout = 0)'
 
+        return join, where
 
+    def _select_query(self, after: Optional[GameKey]) -> str:
+        join, where = self._join_and_where()
+        if after is not None:
+            where += ' AND (ended, game_records.id) > (?, ?) '
 
-        started = time()
-        for row in c.execute(
-            """
+        return """
                 SELECT
                     game_records.id,
                     size,
@@ -97,46 +245,24 @@ class OGSGameData:
                     game_records
                 %s
                 %s
-                ORDER BY ended
+                ORDER BY ended, game_records.id
                 LIMIT
                     ?
-                OFFSET
-                    ?
-            """ % (join, where),
-            (limit, offset),
-        ):
-            ct += 1
-            if not self.quiet and time() - t > 0.05:
-                t = time()
-                records_per_second = ct / (time() - started)
-                seconds_left = (num_records - ct) / records_per_second
-                sys.stdout.write(
-                    f"\r{ct:12n} / {num_records:12n} games processed. " + f"{seconds_left:6.1f}s remaining"
-                )
-                sys.stdout.flush()
-
-            # Clean the rules field.
-            if row[10] in ["aga", "chinese", "ing", "japanese", "korean", "nz"]:
-                rules = row[10]
-            elif row[10] == "Japanese":
-                rules = "japanese"
-            elif row[10] == "age":
-                rules = "aga"
-            elif row[10] == "ing sst":
-                rules = "ing"
-            elif row[10] == "ogs":
-                rules = "japanese"
-            else:
-                # Report new, unknown, rules spellings so we can clean them properly.
-                raise Exception("Unknown rules: '" + row[10] + "'")
+            """ % (join, where)
 
-            yield GameRecord(
-                row[0], row[1], row[2], row[3], row[4], row[5], row[6], row[7], row[8], row[9],
-                rules,
-            )
+    def _select_params(self, limit: int, after: Optional[GameKey]) -> Tuple:
+        if after is None:
+            return (limit,)
+        return (after[0], after[1], limit)
 
-        if not self.quiet:
-            time_elapsed = time() - started
-            sys.stdout.write(f"\n{ct:n} games processed in {time_elapsed:.1f} seconds\n")
-            sys.stdout.flush()
-        c.close()
+
+def _cached_batches(games: Iterator[GameRecord], batch_size: int) -> Iterator[GameBatch]:
+    while True:
+        chunk = list(islice(games, batch_size))
+        if not chunk:
+            return
+        yield GameBatch.from_records(chunk)
+
+
+def _last_key(batch: GameBatch) -> GameKey:
+    return (batch.ended[-1], batch.game_id[-1])
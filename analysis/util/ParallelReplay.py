@@ -0,0 +1,327 @@
+import argparse
+import heapq
+import os
+import sys
+import tempfile
+from array import array
+from itertools import islice
+from multiprocessing import Pool
+from time import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from goratings.interfaces import RatingSystem
+
+from .CLI import cli
+from .Config import config
+from .GameCache import GameCache
+from .GameData import GameData
+from .GorAnalytics import GorAnalytics
+from .InMemoryStorage import InMemoryStorage
+from .TallyGameAnalytics import TallyGameAnalytics
+
+__all__ = ["plan_shards", "replay_datasets_in_parallel", "replay_in_parallel"]
+
+
+cli.add_argument(
+    "--replay-processes", dest="replay_processes", type=int, default=1,
+    help="Replay the games in this many processes, each rating players who play none of the players in the other "
+    "processes, with the same ratings as a serial replay. Needs the in memory storage, and can't be used with "
+    "--checkpoint",
+)
+cli.add_argument(
+    "--replay-window", dest="replay_window", type=float, default=0, metavar="DAYS",
+    help="With --replay-processes, split the players into independent sets for every DAYS days of games rather than "
+    "over the whole stream, moving their ratings between processes after each window. 0 for the whole stream",
+)
+cli.add_argument(
+    "--concurrent-datasets", dest="concurrent_datasets", const=1, default=False, action="store_const",
+    help="Replay each dataset in its own process, with its own storage and tally, and merge them at the end. The "
+    "datasets have separate player ids, so the ratings are the same as replaying them one after the other. Needs the "
+    "in memory storage, and can't be used with --checkpoint or --resume-token",
+)
+
+EngineFactory = Callable[[InMemoryStorage], RatingSystem]
+# Offsets of a shard's games, in order, and its players.
+Shard = Tuple["array[int]", Set[int]]
+
+_cache: GameCache
+_engine_factory: EngineFactory
+_entry_type: type
+_tally_prefix: str
+_game_data: GameData
+_storage: InMemoryStorage
+
+
+def plan_shards(pairings: Sequence[Tuple[int, int]], num_shards: int) -> List[Shard]:
+    """
+    Splits games, given as (black_id, white_id) pairings, into up to
+    `num_shards` shards that have no players in common, with about as many
+    games in each.  Players connected by games, directly or through other
+    players, are in the same shard.  The split only depends on the pairings.
+    """
+    parent: Dict[int, int] = {}
+
+    def find(player_id: int) -> int:
+        while parent[player_id] != player_id:
+            parent[player_id] = parent[parent[player_id]]
+            player_id = parent[player_id]
+        return player_id
+
+    for black_id, white_id in pairings:
+        parent.setdefault(black_id, black_id)
+        parent.setdefault(white_id, white_id)
+        black_root = find(black_id)
+        white_root = find(white_id)
+        if black_root != white_root:
+            parent[black_root] = white_root
+
+    roots = [find(black_id) for black_id, _ in pairings]
+    num_games: Dict[int, int] = {}
+    for root in roots:
+        num_games[root] = num_games.get(root, 0) + 1
+
+    # Largest components first, each to the shard with the fewest games so
+    # far.  Ties go to the component seen first and the lowest shard.
+    shard_of: Dict[int, int] = {}
+    loads = [(0, shard) for shard in range(max(1, min(num_shards, len(num_games))))]
+    for root in sorted(num_games, key=lambda root: -num_games[root]):
+        load, shard = heapq.heappop(loads)
+        shard_of[root] = shard
+        heapq.heappush(loads, (load + num_games[root], shard))
+
+    shards: List[Shard] = [(array("q"), set()) for _ in loads]
+    for offset, root in enumerate(roots):
+        shards[shard_of[root]][0].append(offset)
+    for player_id in parent:
+        shards[shard_of[find(player_id)]][1].add(player_id)
+    return [shard for shard in shards if len(shard[0])]
+
+
+def replay_in_parallel(
+    game_data: GameData, storage: InMemoryStorage, tally: TallyGameAnalytics, engine_factory: EngineFactory
+) -> None:
+    """
+    Rates and tallies the games of `game_data` like calling
+    `engine_factory(storage).process_game` and then tallying each game in
+    order would, in --replay-processes processes.  The engine must keep all
+    of its state about players in the storage.
+    """
+    if not isinstance(storage, InMemoryStorage):
+        raise Exception("--replay-processes needs the in memory storage, it can't be used with --storage")
+    if config.args.checkpoint:
+        raise Exception("--replay-processes can't be used with --checkpoint")
+    args = config.args
+    processes = max(1, args.replay_processes)
+
+    fd, cache_path = tempfile.mkstemp(suffix=".gamecache")
+    os.close(fd)
+    try:
+        GameCache.build(cache_path, None, game_data)
+        cache = GameCache(cache_path)
+        windows = _windows(cache, args.replay_window * 86400)
+        started = time()
+        reported = 0.0
+        games_done = 0
+        largest_shards = 0
+        initargs = (args, config.name, cache_path, engine_factory, storage.entry_type, tally.prefix)
+        with Pool(processes, _init_worker, initargs) as pool:
+            for start, stop in windows:
+                shards = plan_shards([pairing[1:] for pairing in cache.iter_pairings(start, stop)], processes)
+                tasks = [
+                    (array("q", (start + offset for offset in offsets)), storage.get_players_state(players))
+                    for offsets, players in shards
+                ]
+                results = pool.map(replay_shard, tasks)
+                _merge(storage, tally, results)
+
+                games_done += stop - start
+                largest_shards += max(len(offsets) for offsets, _ in shards)
+                if time() - reported > 0.5:
+                    reported = time()
+                    sys.stdout.write("\r%12d / %12d games replayed" % (games_done, len(cache)))
+                    sys.stdout.flush()
+        sys.stdout.write(
+            "\n%d games replayed in %d windows in %.1f seconds, at most %.1fx faster than one process\n"
+            % (games_done, len(windows), time() - started, games_done / max(1, largest_shards))
+        )
+        cache.close()
+    finally:
+        os.remove(cache_path)
+
+
+def _windows(cache: GameCache, window_seconds: float) -> List[Tuple[int, int]]:
+    # Index ranges of the windows.  Each dataset is sorted on its own, so a
+    # window also ends where the next dataset starts.
+    windows = []
+    start = 0
+    window_start = 0.0
+    last = 0.0
+    for idx, (ended, _, _) in enumerate(cache.iter_pairings()):
+        if idx == 0:
+            window_start = ended
+        elif ended < last or (window_seconds and ended - window_start >= window_seconds):
+            windows.append((start, idx))
+            start = idx
+            window_start = ended
+        last = ended
+    if start < len(cache):
+        windows.append((start, len(cache)))
+    return windows
+
+
+def _init_worker(
+    args: argparse.Namespace, name: str, cache_path: str, engine_factory: EngineFactory, entry_type: type, prefix: str
+) -> None:
+    global _cache
+    global _engine_factory
+    global _entry_type
+    global _tally_prefix
+    config(args, name)
+    _cache = GameCache(cache_path)
+    _engine_factory = engine_factory
+    _entry_type = entry_type
+    _tally_prefix = prefix
+
+
+def replay_shard(task: Tuple["array[int]", Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any], List[tuple]]:
+    """
+    Rates and tallies the games at the cache indexes in `task`, starting from
+    the players' state in `task`.  Returns the players' new state, the tally
+    state, and (game index, order, player id) of the players first stored
+    by each game, to add new players in the same order a serial replay does.
+    """
+    indexes, players = task
+    storage = InMemoryStorage(_entry_type)
+    storage.update_players_state(players)
+    engine = _engine_factory(storage)
+    tally = TallyGameAnalytics(storage, _tally_prefix)
+    stored = storage.all_players()
+    new_players: List[tuple] = []
+
+    for idx in indexes:
+        num_stored = len(stored)
+        _add_analytics(tally, engine.process_game(_cache.record(idx)))
+        if len(stored) != num_stored:
+            added = list(islice(reversed(stored), len(stored) - num_stored))
+            new_players.extend((idx, order, player_id) for order, player_id in enumerate(reversed(added)))
+
+    return storage.__getstate__(), tally.get_state(), new_players
+
+
+def _merge(
+    storage: InMemoryStorage,
+    tally: TallyGameAnalytics,
+    results: List[Tuple[Dict[str, Any], Dict[str, Any], List[tuple]]],
+) -> None:
+    merged: Optional[Dict[str, Any]] = None
+    for players, _, _ in results:
+        if merged is None:
+            merged = players
+        else:
+            for name, values in players.items():
+                if isinstance(values, dict):
+                    merged[name].update(values)
+    assert merged is not None
+
+    stored = storage.all_players()
+    entries = merged["_data"]
+    new_players = sorted(new for _, _, shard_new in results for new in shard_new)
+    ordered = {player_id: entry for player_id, entry in entries.items() if player_id in stored}
+    ordered.update((player_id, entries[player_id]) for _, _, player_id in new_players)
+    merged["_data"] = ordered
+    storage.update_players_state(merged)
+
+    for _, state, _ in results:
+        tally.merge_state(state)
+
+
+def replay_datasets_in_parallel(
+    game_data: GameData, storage: InMemoryStorage, tally: TallyGameAnalytics, engine_factory: EngineFactory
+) -> None:
+    """
+    Rates and tallies each dataset of `game_data` in its own process, like
+    `engine_factory(storage).process_game` and tallying each game would one
+    dataset after the other.  The engine must keep all of its state about
+    players in the storage.
+
+    Needs the fork start method: `game_data`, `storage` and the engine
+    factory reach the worker processes as Pool initializer arguments, which
+    forked processes inherit, and which other start methods would have to
+    pickle.
+    """
+    if not isinstance(storage, InMemoryStorage):
+        raise Exception("--concurrent-datasets needs the in memory storage, it can't be used with --storage")
+    if config.args.resume_token or config.args.checkpoint:
+        raise Exception("--concurrent-datasets can't be used with --resume-token or --checkpoint")
+    names = game_data.dataset_names()
+    started = time()
+
+    # Each process rates one dataset, starting from its own copy of the
+    # storage, which has ratings in it when restoring a checkpoint.
+    initargs = (config.args, config.name, game_data, storage, engine_factory, tally.prefix)
+    seen_in: Dict[int, str] = {}
+    with Pool(len(names), _init_dataset_worker, initargs, maxtasksperchild=1) as pool:
+        for name, (players, state, num_games, elapsed) in zip(names, pool.imap(replay_dataset, names)):
+            for player_id in players["_data"]:
+                if player_id in seen_in:
+                    raise Exception("Player %d is in both the %s and %s data" % (player_id, seen_in[player_id], name))
+                seen_in[player_id] = name
+            storage.update_players_state(players)
+            tally.merge_state(state)
+            sys.stdout.write("%s: %d games replayed in %.1f seconds\n" % (name.upper(), num_games, elapsed))
+            sys.stdout.flush()
+    sys.stdout.write("%d datasets replayed in %.1f seconds\n" % (len(names), time() - started))
+
+
+def _init_dataset_worker(
+    args: argparse.Namespace,
+    name: str,
+    game_data: GameData,
+    storage: InMemoryStorage,
+    engine_factory: EngineFactory,
+    prefix: str,
+) -> None:
+    global _game_data
+    global _storage
+    global _engine_factory
+    global _tally_prefix
+    config(args, name)
+    _game_data = game_data
+    # The processes' progress lines would garble each other.
+    for data in (game_data, game_data.ogsdata, game_data.egfdata, game_data.agadata):
+        data.quiet = True
+    _storage = storage
+    _engine_factory = engine_factory
+    _tally_prefix = prefix
+
+
+def replay_dataset(name: str) -> Tuple[Dict[str, Any], Dict[str, Any], int, float]:
+    """
+    Rates and tallies the games of the dataset `name`.  Returns the state of
+    the players in its games, the tally state, the number of games and the
+    time taken.
+    """
+    started = time()
+    engine = _engine_factory(_storage)
+    tally = TallyGameAnalytics(_storage, _tally_prefix)
+    seen: Set[int] = set()
+    num_games = 0
+    for game in _game_data.dataset_games(name):
+        seen.add(game.black_id)
+        seen.add(game.white_id)
+        _add_analytics(tally, engine.process_game(game))
+        num_games += 1
+
+    # In the order they were stored, so new players are added to the main
+    # storage in the same order as in a serial replay.
+    stored = _storage.all_players()
+    players = [player_id for player_id in stored if player_id in seen]
+    players.extend(seen.difference(stored))
+    return _storage.get_players_state(players), tally.get_state(), num_games, time() - started
+
+
+def _add_analytics(tally: TallyGameAnalytics, analytics: Any) -> None:
+    if isinstance(analytics, GorAnalytics):
+        tally.add_gor_analytics(analytics)
+    else:
+        tally.add_glicko2_analytics(analytics)
@@ -0,0 +1,226 @@
+import atexit
+import json
+import os
+import sys
+from functools import wraps
+from importlib import import_module
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from .CLI import cli
+
+__all__ = ["profiler"]
+
+
+profiling = cli.add_argument_group("profiling")
+profiling.add_argument(
+    "--profile", dest="profile", const=1, default=False, action="store_const",
+    help="Time each stage of the run (fetching games, skip logic, handicap adjustment, rating updates, storage "
+    "history, tallying) and print a breakdown at exit",
+)
+profiling.add_argument(
+    "--profile-trace", dest="profile_trace", type=str, default="", metavar="FILE",
+    help="Profile as with --profile, and also write the timed calls to FILE in the Chrome trace event format, "
+    "which chrome://tracing, Perfetto and speedscope open",
+)
+profiling.add_argument(
+    "--profile-trace-limit", dest="profile_trace_limit", type=int, default=200000,
+    help="Number of calls written to the --profile-trace file, the first ones of the run",
+)
+
+# Functions timed as a stage, found by module and name.  Wherever a module
+# has imported one of them by name, the timed version replaces it there too.
+_STAGE_FUNCTIONS = [
+    ("should_skip_game", "analysis.util.SkipLogic", "should_skip_game"),
+    ("glicko2_update", "goratings.math.glicko2", "glicko2_update"),
+    ("glicko2_update", "goratings.math.glicko2", "glicko2_update_one"),
+    ("glicko2_update", "goratings.math.glicko2_periods", "glicko2_period_update"),
+    ("gor_update", "goratings.math.gor", "gor_update"),
+]
+
+# Methods timed as a stage, found by module, class and method name.
+_HISTORY_METHODS = [
+    "add_rating_history",
+    "add_match_history",
+    "get_first_rating_older_than",
+    "get_ratings_newer_or_equal_to",
+    "get_first_timestamp_older_than",
+    "get_matches_newer_or_equal_to",
+    "get_last_game_timestamp",
+]
+_STAGE_METHODS = [
+    ("handicap adjustment", "analysis.util.RatingMath", "RankSystem", ["get_handicap_adjustment"]),
+    ("storage history", "analysis.util.InMemoryStorage", "InMemoryStorage", _HISTORY_METHODS),
+    ("storage history", "analysis.util.SqliteStorage", "SqliteStorage", _HISTORY_METHODS),
+    ("storage history", "analysis.util.Glicko2ArrayStorage", "Glicko2ArrayStorage", _HISTORY_METHODS),
+    ("storage history", "analysis.util.Glicko2GridStorage", "Glicko2GridStorage", _HISTORY_METHODS),
+    ("tally", "analysis.util.TallyGameAnalytics", "TallyGameAnalytics", ["add_glicko2_analytics", "add_gor_analytics"]),
+]
+
+
+class Profiler:
+    """
+    Times the stages of an analysis run.  Nothing is timed unless `install`
+    is called, which `config` does for --profile.  It wraps the functions and
+    methods of each stage in a timer, so stages only cost the timing when
+    profiling.  Times are exclusive: a stage called from within another is
+    only counted as itself.
+    """
+
+    enabled: bool
+    seconds: Dict[str, float]
+    calls: Dict[str, int]
+    trace_file: str
+    trace_limit: int
+    # (stage, start, duration) of the first `trace_limit` timed calls.
+    events: List[Tuple[str, float, float]]
+    _started: float
+    # Time spent in timed calls nested in each call being timed.
+    _nested: List[float]
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.seconds = {}
+        self.calls = {}
+        self.trace_file = ""
+        self.trace_limit = 0
+        self.events = []
+        self._started = 0.0
+        self._nested = [0.0]
+
+    def install(self, trace_file: str = "", trace_limit: int = 0) -> None:
+        """ Starts timing the stages, and reports them when the process exits. """
+        if self.enabled:
+            return
+        self.enabled = True
+        self.trace_file = trace_file
+        self.trace_limit = trace_limit if trace_file else 0
+
+        # The game loaders yield games as they are read, so what is timed is
+        # getting each next game.
+        self._time_method("fetch games", import_module("analysis.util.GameData").GameData, "__iter__", self._timed_iter)
+
+        for stage, module_name, name in _STAGE_FUNCTIONS:
+            try:
+                module = import_module(module_name)
+            except ImportError:
+                continue
+            original = getattr(module, name)
+            timed = self.timed(stage, original)
+            for loaded in list(sys.modules.values()):
+                namespace = getattr(loaded, "__dict__", None)
+                if namespace is None:
+                    continue
+                for key, value in list(namespace.items()):
+                    if value is original:
+                        namespace[key] = timed
+
+        for stage, module_name, class_name, methods in _STAGE_METHODS:
+            cls = getattr(import_module(module_name), class_name)
+            for method in methods:
+                if method in cls.__dict__:
+                    self._time_method(stage, cls, method, self.timed)
+
+        # Whatever the engines do besides the stages above.
+        from goratings.interfaces import RatingSystem
+
+        for engine in _subclasses(RatingSystem):
+            if "process_game" in engine.__dict__:
+                self._time_method("process_game (rest)", engine, "process_game", self.timed)
+
+        self._started = perf_counter()
+        atexit.register(self.report)
+
+    def timed(self, stage: str, fn: Callable) -> Callable:
+        seconds = self.seconds
+        calls = self.calls
+        nested = self._nested
+        events = self.events
+        seconds.setdefault(stage, 0.0)
+        calls.setdefault(stage, 0)
+
+        @wraps(fn)
+        def timed_call(*args: Any, **kwargs: Any) -> Any:
+            nested.append(0.0)
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                seconds[stage] += elapsed - nested.pop()
+                calls[stage] += 1
+                nested[-1] += elapsed
+                if len(events) < self.trace_limit:
+                    events.append((stage, start, elapsed))
+
+        return timed_call
+
+    def report(self) -> None:
+        total = perf_counter() - self._started
+        print("")
+        print("Time per stage, not counting the stages called from within it:")
+        print("%-24s %12s %10s %7s %10s" % ("stage", "calls", "seconds", "share", "us/call"))
+        for stage, seconds in self.seconds.items():
+            calls = self.calls[stage]
+            if calls:
+                print(
+                    "%-24s %12d %10.2f %6.1f%% %10.2f"
+                    % (stage, calls, seconds, 100 * seconds / total, 1e6 * seconds / calls)
+                )
+        other = total - sum(self.seconds.values())
+        print("%-24s %12s %10.2f %6.1f%%" % ("other", "", other, 100 * other / total))
+        print("%-24s %12s %10.2f" % ("total", "", total))
+
+        if self.trace_file:
+            self.write_trace(self.trace_file)
+            print("Wrote %d of the timed calls to %s" % (len(self.events), self.trace_file))
+
+    def write_trace(self, filename: str) -> None:
+        pid = os.getpid()
+        with open(filename, "w") as f:
+            json.dump(
+                {
+                    "traceEvents": [
+                        {
+                            "name": stage,
+                            "ph": "X",
+                            "ts": (start - self._started) * 1e6,
+                            "dur": duration * 1e6,
+                            "pid": pid,
+                            "tid": 0,
+                        }
+                        for stage, start, duration in self.events
+                    ],
+                    "displayTimeUnit": "ms",
+                },
+                f,
+            )
+
+    def _time_method(self, stage: str, cls: type, name: str, wrapper: Callable) -> None:
+        setattr(cls, name, wrapper(stage, getattr(cls, name)))
+
+    def _timed_iter(self, stage: str, method: Callable) -> Callable:
+        next_game = self.timed(stage, next)
+
+        @wraps(method)
+        def timed_iter(obj: Any) -> Iterator:
+            games = method(obj)
+            while True:
+                try:
+                    game = next_game(games)
+                except StopIteration:
+                    return
+                yield game
+
+        return timed_iter
+
+
+def _subclasses(cls: type) -> List[type]:
+    ret = []
+    for subclass in cls.__subclasses__():
+        ret.append(subclass)
+        ret.extend(_subclasses(subclass))
+    return ret
+
+
+profiler = Profiler()
@@ -1,10 +1,16 @@
 import argparse
+from bisect import bisect_right
+from functools import lru_cache
 from math import exp, log, sqrt
-from typing import Callable, Dict, List, Union
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 from .CLI import cli, defaults
 
 __all__ = [
+    "RankSystem",
+    "get_rank_system",
+    "make_rank_system",
+    "rank_system_from_args",
     "rank_to_rating",
     "rating_to_rank",
     "get_handicap_adjustment",
@@ -45,19 +51,72 @@ linear = cli.add_argument_group("linear ranking variables", "rating to ranks con
 linear.add_argument("-m", dest="m", type=float, default=100.0, help="m")
 linear.add_argument("-b", dest="b", type=float, default=9.0, help="b")
 
+cli.add_argument(
+    "--rank-table-size", dest="rank_table_size", type=int, default=0,
+    help="Convert between ratings and ranks by linear interpolation in tables of this many points, 0 to compute "
+    "them exactly. Only faster than exact for the more expensive rank systems, such as sig. Smaller tables are "
+    "less accurate, the error between the table points is estimated when they are built",
+)
+
+# Domain of the interpolation tables, in ranks.  Outside of it the exact
+# conversions are used.
+RANK_TABLE_MIN = -10.0
+RANK_TABLE_MAX = 50.0
+
+
+class RankSystem(NamedTuple):
+    """
+    A conversion between ratings and ranks.  The module level functions use
+    the system set up by `configure_rating_to_rank`; engines can be given
+    their own RankSystem to run several side by side.
+    """
+
+    name: str
+    rank_to_rating: Callable[[float], float]
+    rating_to_rank: Callable[[float], float]
+    params: Tuple[Tuple[str, float], ...] = ()
+    table_size: int = 0
+    # Error of the interpolation tables, if used, as sampled at the cell
+    # midpoints when they were built: (ranks for rating_to_rank, rating for
+    # rank_to_rating).  The error elsewhere can be somewhat larger.
+    table_error: Tuple[float, float] = (0.0, 0.0)
+
+    def get_handicap_adjustment(
+        self, player: str, rating: float, handicap: int, size: int, komi: float, rules: str
+    ) -> float:
+        rank_difference = get_handicap_rank_difference(handicap, size, komi, rules)
+
+        # Apply the +/- for white/black in the "rank" domain where it's symmetric.
+        # Note that the "rating" domain is log-scale, where +/- is asymmetric.
+        assert player == "white" or player == "black"
+        if player == "black":
+            effective_rank = self.rating_to_rank(rating) + rank_difference
+        else:
+            effective_rank = self.rating_to_rank(rating) - rank_difference
+
+        return self.rank_to_rating(effective_rank) - rating
+
+    def describe(self) -> Dict[str, Union[str, float]]:
+        ret: Dict[str, Union[str, float]] = {"system": self.name}
+        ret.update(self.params)
+        return ret
 
-_rank_to_rating: Callable[[float], float]
-_rating_to_rank: Callable[[float], float]
+
+_rank_system: RankSystem
 rating_config: Dict[str, Union[str, float]] = {}
 optimizer_rating_control_points: List[float]
 
 
+def get_rank_system() -> RankSystem:
+    return _rank_system
+
+
 def rank_to_rating(rank: float) -> float:
-    return _rank_to_rating(rank)
+    return _rank_system.rank_to_rating(rank)
 
 
 def rating_to_rank(rating: float) -> float:
-    return _rating_to_rank(rating)
+    return _rank_system.rating_to_rank(rating)
 
 def set_exhaustive_log_parameters(a: float, c:float, d:float, p:float = 1.0) -> None:
     global A
@@ -68,9 +127,13 @@ def set_exhaustive_log_parameters(a: float, c:float, d:float, p:float = 1.0) ->
     C = c
     D = d
     P = p
+    _rebuild_if_using("exhaustivelog", "exhaustivelogp")
 
 
+@lru_cache(maxsize=None)
 def get_handicap_rank_difference(handicap: int, size: int, komi: float, rules: str) -> float:
+    # Memoized, there are only a handful of distinct handicap, size, komi and
+    # rules combinations in the game records.
     # Number of extra moves black makes before white responds.
     num_extra_moves = handicap - 1 if handicap > 1 else 0
 
@@ -124,44 +187,54 @@ def get_handicap_rank_difference(handicap: int, size: int, komi: float, rules: s
 
 
 def get_handicap_adjustment(player: str, rating: float, handicap: int, size: int, komi: float, rules: str) -> float:
-    rank_difference = get_handicap_rank_difference(handicap, size, komi, rules)
-
-    # Apply the +/- for white/black in the "rank" domain where it's symmetric.
-    # Note that the "rating" domain is log-scale, where +/- is asymmetric.
-    assert player == "white" or player == "black"
-    if player == "black":
-        effective_rank = rating_to_rank(rating) + rank_difference
-    else:
-        effective_rank = rating_to_rank(rating) - rank_difference
-
-    return rank_to_rating(effective_rank) - rating
+    return _rank_system.get_handicap_adjustment(player, rating, handicap, size, komi, rules)
 
 
 def set_optimizer_rating_points(points: List[float]) -> None:
     global optimizer_rating_control_points
     optimizer_rating_control_points = points
+    _rebuild_if_using("optimizer")
 
-def configure_rating_to_rank(args: argparse.Namespace) -> None:
-    global _rank_to_rating
-    global _rating_to_rank
-    global optimizer_rating_control_points
-    global A
-    global C
-    global D
 
-    system: str = args.ranks
-    a: float = args.a
-    c: float = args.c
-    d: float = args.d
-    m: float = args.m
-    b: float = args.b
-    p: float = args.p
+def _rebuild_if_using(*names: str) -> None:
+    # The exhaustive log and optimizer systems take their parameters from the
+    # module globals when they are made, so remake the configured system when
+    # those change.
+    global _rank_system
+    if "_rank_system" in globals() and _rank_system.name in names:
+        _rank_system = make_rank_system(_rank_system.name, table_size=_rank_system.table_size)
+        rating_config.clear()
+        rating_config.update(_rank_system.describe())
 
+def rank_system_from_args(args: argparse.Namespace) -> RankSystem:
+    system: str = args.ranks
     if system == "auto":
         system = defaults["ranking"]
-
-    rating_config["system"] = system
-
+    return make_rank_system(
+        system, a=args.a, c=args.c, d=args.d, m=args.m, b=args.b, p=args.p, table_size=args.rank_table_size,
+    )
+
+
+def make_rank_system(
+    system: str,
+    a: float = 525.0,
+    c: float = 23.15,
+    d: float = 0.0,
+    m: float = 100.0,
+    b: float = 9.0,
+    p: float = 1.0,
+    optimizer_points: Optional[Sequence[float]] = None,
+    table_size: int = 0,
+) -> RankSystem:
+    """
+    Makes the named rank system.  The exhaustive log systems use the
+    parameters from `set_exhaustive_log_parameters`, and the optimizer system
+    uses `optimizer_points`, or the points from `set_optimizer_rating_points`.
+
+    With a `table_size`, the conversions interpolate in tables of that many
+    points, and the system's `table_error` estimates how far off they are.
+    """
+    params: Tuple[Tuple[str, float], ...] = ()
 
     if system == "linear":
 
@@ -171,39 +244,39 @@ def configure_rating_to_rank(args: argparse.Namespace) -> None:
         def __rating_to_rank(rating: float) -> float:
             return (rating / m) + b
 
-        _rank_to_rating = __rank_to_rating
-        _rating_to_rank = __rating_to_rank
-        rating_config["b"] = b
-        rating_config["m"] = m
+        params = (("b", b), ("m", m))
     elif system == "optimizer":
+        if optimizer_points is None:
+            optimizer_points = optimizer_rating_control_points
+        points = tuple(optimizer_points)
+        # rating_to_rank binary searches the points.
+        if any(later < earlier for earlier, later in zip(points, points[1:])):
+            raise ValueError("optimizer rating control points must be in increasing order")
 
         def __rank_to_rating(rank: float) -> float:
             base = min(37, max(0, int(rank)))
             a = rank - base
 
             return lerp(
-                optimizer_rating_control_points[base],
-                optimizer_rating_control_points[base + 1],
+                points[base],
+                points[base + 1],
                 a
             )
 
         def __rating_to_rank(rating: float) -> float:
-            if rating < optimizer_rating_control_points[0]:
+            rank = bisect_right(points, rating, 0, 38)
+            if rank == 0:
                 return 0
-            for rank in range(1, 38):
-                if rating < optimizer_rating_control_points[rank]:
-                    return lerp(
-                        rank-1,
-                        rank,
-                        (rating - optimizer_rating_control_points[rank - 1]) /
-                        (optimizer_rating_control_points[rank] - optimizer_rating_control_points[rank - 1])
-                    )
+            if rank < 38:
+                return lerp(
+                    rank-1,
+                    rank,
+                    (rating - points[rank - 1]) /
+                    (points[rank] - points[rank - 1])
+                )
 
             return 39
 
-        _rank_to_rating = __rank_to_rating
-        _rating_to_rank = __rating_to_rank
-
     elif system == "gor":
 
         def __rank_to_rating(rank: float) -> float:
@@ -212,41 +285,32 @@ def configure_rating_to_rank(args: argparse.Namespace) -> None:
         def __rating_to_rank(rating: float) -> float:
             return (rating / 100.0) + 9
 
-        _rank_to_rating = __rank_to_rating
-        _rating_to_rank = __rating_to_rank
-        rating_config["b"] = 9
-        rating_config["m"] = 100
+        params = (("b", 9), ("m", 100))
     elif system == "exhaustivelog":
+        ea, ec, ed = A, C, D
 
         def __rank_to_rating(rank: float) -> float:
-            return A * exp((rank - D) / C)
+            return ea * exp((rank - ed) / ec)
 
         def __rating_to_rank(rating: float) -> float:
-            return log(rating / A) * C + D
+            return log(rating / ea) * ec + ed
 
-        _rank_to_rating = __rank_to_rating
-        _rating_to_rank = __rating_to_rank
-        rating_config["d"] = D
-        rating_config["c"] = C
-        rating_config["a"] = A
+        params = (("d", ed), ("c", ec), ("a", ea))
 
     elif system == "exhaustivelogp":
+        ea, ec, ep = A, C, P
 
         def __rank_to_rating(rank: float) -> float:
             if rank < 0:
                 rank = 0
-            return A * exp(((rank) / C) ** (1/P))
+            return ea * exp(((rank) / ec) ** (1/ep))
 
         def __rating_to_rank(rating: float) -> float:
-            if rating < A:
-                rating = A
-            return (log(rating / A) ** P) * C
+            if rating < ea:
+                rating = ea
+            return (log(rating / ea) ** ep) * ec
 
-        _rank_to_rating = __rank_to_rating
-        _rating_to_rank = __rating_to_rank
-        rating_config["p"] = P
-        rating_config["c"] = C
-        rating_config["a"] = A
+        params = (("p", ep), ("c", ec), ("a", ea))
 
     elif system == "log":
 
@@ -256,11 +320,7 @@ def configure_rating_to_rank(args: argparse.Namespace) -> None:
         def __rating_to_rank(rating: float) -> float:
             return log(rating / a) * c + d
 
-        _rank_to_rating = __rank_to_rating
-        _rating_to_rank = __rating_to_rank
-        rating_config["d"] = d
-        rating_config["c"] = c
-        rating_config["a"] = a
+        params = (("d", d), ("c", c), ("a", a))
 
     elif system == "logp":
 
@@ -274,11 +334,7 @@ def configure_rating_to_rank(args: argparse.Namespace) -> None:
                 rating = a
             return (log(rating / a) ** p) * c
 
-        _rank_to_rating = __rank_to_rating
-        _rating_to_rank = __rating_to_rank
-        rating_config["p"] = p
-        rating_config["c"] = c
-        rating_config["a"] = a
+        params = (("p", p), ("c", c), ("a", a))
 
     elif system == "sig":
         inflection = 1500
@@ -300,13 +356,69 @@ def configure_rating_to_rank(args: argparse.Namespace) -> None:
             d = inflection - rating
             return f(inflection) * 2 - f(inflection + d)
 
-        _rank_to_rating = __rank_to_rating
-        _rating_to_rank = __rating_to_rank
-        rating_config["c"] = c
-        rating_config["a"] = a
+        params = (("c", c), ("a", a))
     else:
         raise NotImplementedError
 
+    # The optimizer system is already a piecewise linear lookup.
+    if table_size < 2 or system == "optimizer":
+        return RankSystem(system, __rank_to_rating, __rating_to_rank, params)
+
+    rank_to_rating, rank_to_rating_error = _tabulate(__rank_to_rating, RANK_TABLE_MIN, RANK_TABLE_MAX, table_size)
+    rating_to_rank, rating_to_rank_error = _tabulate(
+        __rating_to_rank, __rank_to_rating(RANK_TABLE_MIN), __rank_to_rating(RANK_TABLE_MAX), table_size
+    )
+    return RankSystem(
+        system, rank_to_rating, rating_to_rank, params, table_size, (rating_to_rank_error, rank_to_rating_error)
+    )
+
+
+def _tabulate(f: Callable[[float], float], lo: float, hi: float, size: int) -> Tuple[Callable[[float], float], float]:
+    # Returns a piecewise linear interpolation of f over [lo, hi] using `size`
+    # samples, falling back to f outside of that range, along with the
+    # largest error found at the cell midpoints, an estimate of its error.
+    if not hi > lo:
+        return f, 0.0
+
+    step = (hi - lo) / (size - 1)
+    inv_step = 1 / step
+    table = [f(lo + i * step) for i in range(size)]
+    last = size - 1
+
+    def lookup(x: float) -> float:
+        t = (x - lo) * inv_step
+        i = int(t)
+        if t < 0 or i >= last:
+            return f(x)
+        y = table[i]
+        return y + (table[i + 1] - y) * (t - i)
+
+    error = 0.0
+    for i in range(last):
+        x = lo + (i + 0.5) * step
+        error = max(error, abs(lookup(x) - f(x)))
+    return lookup, error
+
+
+def configure_rating_to_rank(args: argparse.Namespace) -> RankSystem:
+    """ Sets the rank system used by the module level functions, and returns it. """
+    global _rank_system
+
+    _rank_system = rank_system_from_args(args)
+    rating_config.clear()
+    rating_config.update(_rank_system.describe())
+
+    # Interpolation tables don't round trip ratings exactly.  Converting to a
+    # rank and back is off by up to the rank_to_rating error, plus the
+    # rating_to_rank error scaled by the ratings per rank, doubled as the
+    # errors were only sampled.
+    tolerance = 0.5e-8
+    if _rank_system.table_size:
+        rank = _rank_system.rating_to_rank(1000.0)
+        ratings_per_rank = _rank_system.rank_to_rating(rank + 0.5) - _rank_system.rank_to_rating(rank - 0.5)
+        rank_error, rating_error = _rank_system.table_error
+        tolerance += 2 * (rating_error + abs(ratings_per_rank) * rank_error)
+
     for size in [9, 13, 19]:
         for player in ["white", "black"]:
             # KataGo and AlphaGo believe white is ahead by 0.5 points when
@@ -318,8 +430,10 @@ def configure_rating_to_rank(args: argparse.Namespace) -> None:
             #   Sensei's Library: <https://senseis.xmp.net/?Komi#toc8>
             # - "Perfect Komi" on the "Komi (Go)" page at Wikipedia:
             #   <https://en.wikipedia.org/wiki/Komi_(Go)#Perfect_Komi>
-            assert round(get_handicap_adjustment(player, 1000.0, 0, size=size, rules="japanese", komi=6), 8) == 0
-            assert round(get_handicap_adjustment(player, 1000.0, 0, size=size, rules="aga", komi=7), 8) == 0
+            assert abs(get_handicap_adjustment(player, 1000.0, 0, size=size, rules="japanese", komi=6)) < tolerance
+            assert abs(get_handicap_adjustment(player, 1000.0, 0, size=size, rules="aga", komi=7)) < tolerance
+
+    return _rank_system
 
 
 def lerp(x:float, y:float, a:float):
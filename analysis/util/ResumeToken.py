@@ -0,0 +1,71 @@
+import json
+import os
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from goratings.interfaces import GameRecord
+
+__all__ = ["END_KEY", "GameKey", "load_resume_key", "save_resume_key", "track_resume_key", "track_resume_key_by"]
+
+
+# Position of a game in a loader's stream. Loaders order games by
+# (ended, game_id) so they can seek past a key using the game_ended_idx index
+# instead of stepping over skipped rows with OFFSET.
+GameKey = Tuple[float, int]
+
+T = TypeVar("T")
+
+# Key that sorts after every game, for offsets past the end of a dataset.
+END_KEY: GameKey = (float("inf"), 0)
+
+
+def load_resume_key(path: str, name: str) -> Optional[GameKey]:
+    """
+    Returns the key of the last game processed from the stream `name`, as
+    saved in the resume token file at `path`, or None if there isn't one.
+    """
+    tokens = _load(path)
+    if name not in tokens:
+        return None
+    ended, game_id = tokens[name]
+    return (ended, game_id)
+
+
+def save_resume_key(path: str, name: str, key: GameKey) -> None:
+    tokens = _load(path)
+    tokens[name] = [key[0], key[1]]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(tokens, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def track_resume_key(games: Iterator[GameRecord], path: str, name: str) -> Iterator[GameRecord]:
+    """
+    Passes `games` through, saving the key of the last game the consumer
+    finished with (asked for the next game after) when the stream ends or is
+    abandoned, so the next run can continue after it.
+    """
+    return track_resume_key_by(games, path, name, _game_key)
+
+
+def track_resume_key_by(items: Iterator[T], path: str, name: str, key: Callable[[T], GameKey]) -> Iterator[T]:
+    """ `track_resume_key` for a stream of something other than games, `key` giving the last game of each item. """
+    last: Optional[GameKey] = None
+    try:
+        for item in items:
+            yield item
+            last = key(item)
+    finally:
+        if last is not None:
+            save_resume_key(path, name, last)
+
+
+def _game_key(game: GameRecord) -> GameKey:
+    return (game.ended, game.game_id)
+
+
+def _load(path: str) -> Dict[str, List[float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)  # type: ignore
@@ -0,0 +1,325 @@
+import atexit
+import os
+import pickle
+import sqlite3
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, Iterator, List, Mapping, Optional, Set, Tuple
+
+from goratings.interfaces import Storage
+from goratings.math.glicko2 import Glicko2Entry
+
+from .CLI import cli
+from .Config import config
+from .InMemoryStorage import InMemoryStorage
+
+__all__ = ["SqliteStorage", "make_storage"]
+
+
+cli.add_argument(
+    "--storage", dest="storage", type=str, default=None, metavar="FILE",
+    help="Keep player ratings and history in this sqlite file instead of in memory. Ratings already in the file are "
+    "carried over, so runs can continue from where an earlier one left off, e.g. with --resume-token. History is "
+    "appended, so games a player already has history for in the file can't be rated again. Can't be used with "
+    "--checkpoint, --restore, --replay-processes or --concurrent-datasets",
+)
+cli.add_argument(
+    "--array-storage", dest="array_storage", const=1, default=False, action="store_const",
+    help="Keep Glicko2 ratings in memory as typed arrays, one row per player, instead of one object per player",
+)
+cli.add_argument(
+    "--storage-cache-mb", dest="storage_cache_mb", type=float, default=256,
+    help="Size of the in memory cache of player ratings kept with --storage",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    entry BLOB,
+    timeout INTEGER NOT NULL DEFAULT 0,
+    set_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS rating_history (
+    player_id INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    entry BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rating_history_player_timestamp ON rating_history (player_id, timestamp);
+CREATE TABLE IF NOT EXISTS match_history (
+    player_id INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    entry BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS match_history_player_timestamp ON match_history (player_id, timestamp);
+"""
+
+# Rough memory use of a cached player besides its pickled entry: the cache
+# record, the entry object and the OrderedDict node.
+_CACHED_PLAYER_OVERHEAD = 400
+_COMMIT_EVERY = 100000
+
+
+class SqliteStorage(Storage):
+    """
+    Storage kept in a sqlite file, so replays aren't limited by memory and
+    ratings outlive the process.
+
+    Players are read through an LRU cache holding about `cache_mb` megabytes
+    of entries, and changes are written back when a player is evicted, on
+    `flush` and on `close`.  As with InMemoryStorage, `get` returns the cached
+    entry itself, so entries must not be changed without being passed back
+    to `set`.
+
+    History is appended straight to the file, and is assumed to be added in
+    ascending timestamp order for every player, like InMemoryStorage does.
+    Entries are stored pickled, so history lookups return copies.  Reopening
+    a file and rating games it already has history for would add their
+    history again, so the first history added for each player raises if it
+    is older than the player's history already in the file.
+    """
+
+    path: str
+    entry_type: Any
+    _conn: sqlite3.Connection
+    _cache: "OrderedDict[int, _CachedPlayer]"
+    _capacity: int
+    _writes: int
+    # (table, player id) of the history checked against what the file had.
+    _history_checked: Set[Tuple[str, int]]
+
+    def __init__(self, path: str, entry_type: type, cache_mb: float = 256) -> None:
+        self.entry_type = entry_type
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._cache = OrderedDict()
+        entry_size = len(pickle.dumps(entry_type(), pickle.HIGHEST_PROTOCOL)) + _CACHED_PLAYER_OVERHEAD
+        self._capacity = max(1, int(cache_mb * 1024 * 1024) // entry_size)
+        self._writes = 0
+        self._history_checked = set()
+
+    def __getstate__(self) -> Any:
+        raise TypeError("SqliteStorage can't be pickled, its file already keeps the ratings")
+
+    def _player(self, player_id: int) -> "_CachedPlayer":
+        player = self._cache.get(player_id)
+        if player is not None:
+            self._cache.move_to_end(player_id)
+            return player
+
+        row = self._conn.execute(
+            "SELECT entry, timeout, set_count FROM players WHERE id = ?", (player_id,)
+        ).fetchone()
+        if row is None:
+            player = _CachedPlayer(None, False, 0)
+        else:
+            player = _CachedPlayer(None if row[0] is None else pickle.loads(row[0]), bool(row[1]), row[2])
+        self._cache[player_id] = player
+        if len(self._cache) > self._capacity:
+            evicted_id, evicted = self._cache.popitem(last=False)
+            if evicted.dirty:
+                self._write(evicted_id, evicted)
+        return player
+
+    def _write(self, player_id: int, player: "_CachedPlayer") -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO players (id, entry, timeout, set_count) VALUES (?, ?, ?, ?)",
+            (
+                player_id,
+                None if player.entry is None else pickle.dumps(player.entry, pickle.HIGHEST_PROTOCOL),
+                int(player.timeout),
+                player.set_count,
+            ),
+        )
+        player.dirty = False
+        self._wrote()
+
+    def _wrote(self) -> None:
+        self._writes += 1
+        if self._writes >= _COMMIT_EVERY:
+            self._conn.commit()
+            self._writes = 0
+
+    def flush(self) -> None:
+        """ Writes all changed players back to the file and commits. """
+        for player_id, player in self._cache.items():
+            if player.dirty:
+                self._write(player_id, player)
+        self._conn.commit()
+        self._writes = 0
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None  # type: ignore
+
+    def get(self, player_id: int) -> Any:
+        player = self._player(player_id)
+        if player.entry is None:
+            player.entry = self.entry_type()
+            player.dirty = True
+        return player.entry
+
+    def set(self, player_id: int, entry: Any) -> None:
+        player = self._player(player_id)
+        player.entry = entry
+        player.set_count += 1
+        player.dirty = True
+
+    def clear_set_count(self, player_id: int) -> None:
+        player = self._player(player_id)
+        player.set_count = 0
+        player.dirty = True
+
+    def get_set_count(self, player_id: int) -> int:
+        return self._player(player_id).set_count
+
+    def all_players(self) -> Mapping[int, Any]:  # type: ignore
+        self.flush()
+        return _SqlitePlayers(self)
+
+    def get_timeout_flag(self, player_id: int) -> bool:
+        return self._player(player_id).timeout
+
+    def set_timeout_flag(self, player_id: int, tf: bool) -> None:
+        player = self._player(player_id)
+        if player.timeout != tf:
+            player.timeout = tf
+            player.dirty = True
+
+    def add_rating_history(self, player_id: int, timestamp: int, entry: Any) -> None:
+        self._add_history("rating_history", player_id, timestamp, entry)
+
+    def add_match_history(self, player_id: int, timestamp: int, entry: Any) -> None:
+        self._add_history("match_history", player_id, timestamp, entry)
+
+    def _add_history(self, table: str, player_id: int, timestamp: int, entry: Any) -> None:
+        if (table, player_id) not in self._history_checked:
+            self._history_checked.add((table, player_id))
+            (last,) = self._conn.execute(
+                "SELECT MAX(timestamp) FROM %s WHERE player_id = ?" % table, (player_id,)
+            ).fetchone()
+            if last is not None and timestamp < last:
+                raise Exception(
+                    "%s already has %s of player %d up to %s, rating their games from %s again would duplicate it"
+                    % (self.path, table, player_id, _timestamp(last), timestamp)
+                )
+        self._conn.execute(
+            "INSERT INTO %s (player_id, timestamp, entry) VALUES (?, ?, ?)" % table,
+            (player_id, timestamp, pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)),
+        )
+        self._wrote()
+
+    def get_last_game_timestamp(self, player_id: int) -> int:
+        row = self._conn.execute(
+            "SELECT timestamp FROM rating_history WHERE player_id = ? ORDER BY timestamp DESC, rowid DESC LIMIT 1",
+            (player_id,),
+        ).fetchone()
+        return 0 if row is None else _timestamp(row[0])
+
+    def get_first_rating_older_than(self, player_id: int, timestamp: int) -> Any:
+        row = self._last_before("rating_history", player_id, timestamp)
+        return self.entry_type() if row is None else pickle.loads(row[1])
+
+    def get_first_timestamp_older_than(self, player_id: int, timestamp: int) -> Any:
+        row = self._last_before("rating_history", player_id, timestamp)
+        return None if row is None else _timestamp(row[0])
+
+    def _last_before(self, table: str, player_id: int, timestamp: int) -> Optional[tuple]:
+        return self._conn.execute(
+            "SELECT timestamp, entry FROM %s WHERE player_id = ? AND timestamp < ? ORDER BY timestamp DESC, rowid DESC "
+            "LIMIT 1" % table,
+            (player_id, timestamp),
+        ).fetchone()
+
+    def get_ratings_newer_or_equal_to(self, player_id: int, timestamp: int) -> Sequence[Any]:
+        return self._newer_or_equal_to("rating_history", player_id, timestamp)
+
+    def get_matches_newer_or_equal_to(self, player_id: int, timestamp: int) -> Sequence[Any]:
+        return self._newer_or_equal_to("match_history", player_id, timestamp)
+
+    def _newer_or_equal_to(self, table: str, player_id: int, timestamp: int) -> List[Any]:
+        return [
+            pickle.loads(row[0])
+            for row in self._conn.execute(
+                "SELECT entry FROM %s WHERE player_id = ? AND timestamp >= ? ORDER BY timestamp, rowid" % table,
+                (player_id, timestamp),
+            )
+        ]
+
+
+def _timestamp(value: float) -> Any:
+    return int(value) if value.is_integer() else value
+
+
+class _CachedPlayer:
+    __slots__ = ("entry", "timeout", "set_count", "dirty")
+
+    entry: Any
+    timeout: bool
+    set_count: int
+    dirty: bool
+
+    def __init__(self, entry: Any, timeout: bool, set_count: int) -> None:
+        self.entry = entry
+        self.timeout = timeout
+        self.set_count = set_count
+        self.dirty = False
+
+
+class _SqlitePlayers(Mapping):
+    # Read only `all_players()` mapping of player id to entry, covering the
+    # players that have been given an entry, read from the file as of the
+    # `all_players()` call.
+    _storage: SqliteStorage
+
+    def __init__(self, storage: SqliteStorage) -> None:
+        self._storage = storage
+
+    def __getitem__(self, player_id: int) -> Any:
+        row = self._storage._conn.execute(
+            "SELECT entry FROM players WHERE id = ? AND entry IS NOT NULL", (player_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(player_id)
+        return pickle.loads(row[0])
+
+    def __iter__(self) -> Iterator[int]:
+        rows = self._storage._conn.execute("SELECT id FROM players WHERE entry IS NOT NULL ORDER BY id").fetchall()
+        for (player_id,) in rows:
+            yield player_id
+
+    def __len__(self) -> int:
+        return self._storage._conn.execute("SELECT COUNT(*) FROM players WHERE entry IS NOT NULL").fetchone()[0]
+
+    def items(self) -> Iterator[tuple]:  # type: ignore
+        for player_id, entry in self._storage._conn.execute(
+            "SELECT id, entry FROM players WHERE entry IS NOT NULL ORDER BY id"
+        ):
+            yield player_id, pickle.loads(entry)
+
+
+def make_storage(entry_type: type) -> Storage:
+    """
+    The storage selected on the command line: a SqliteStorage, closed at
+    exit, with --storage, a Glicko2ArrayStorage with --array-storage,
+    otherwise an InMemoryStorage.
+    """
+    if config.args.array_storage:
+        if config.args.storage:
+            raise Exception("--array-storage can't be used with --storage")
+        if entry_type is not Glicko2Entry:
+            raise Exception("--array-storage only keeps Glicko2Entry ratings, not %s" % entry_type.__name__)
+        from .Glicko2ArrayStorage import Glicko2ArrayStorage
+
+        return Glicko2ArrayStorage()
+    if not config.args.storage:
+        return InMemoryStorage(entry_type)
+    if config.args.checkpoint or config.args.restore:
+        raise Exception("--storage can't be used with --checkpoint or --restore, the file already keeps the ratings")
+    storage = SqliteStorage(os.path.expanduser(config.args.storage), entry_type, config.args.storage_cache_mb)
+    atexit.register(storage.close)
+    return storage
@@ -0,0 +1,223 @@
+from array import array
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+
+__all__ = ["ALL", "FIELDS", "TallyAccumulator", "TallyView"]
+
+
+ALL: int = 999
+
+# Quantities tallied for each cell.
+FIELDS: Tuple[str, ...] = (
+    "count_black_wins",
+    "black_wins",
+    "predictions",
+    "predicted_outcome",
+    "prediction_cost",
+    "count",
+)
+
+# Values tracked individually along each axis.  Code 0 of every axis is
+# `ALL`, the values follow, and the last code collects any other value.
+# Games with such values are still tallied in the `ALL` cells but are never
+# reported on their own.
+SIZES: Tuple[int, ...] = (9, 13, 19)
+SPEEDS: Tuple[int, ...] = (1, 2, 3)
+RANK_MIN = -40
+RANK_MAX = 59
+RANK_BAND = 5
+HANDICAPS: Tuple[int, ...] = tuple(range(10))
+
+RankKey = Union[int, str]
+
+_NUM_BANDS = (RANK_MAX - RANK_MIN + 1) // RANK_BAND
+_NUM_RANKS = RANK_MAX - RANK_MIN + 1
+_SHAPE = (
+    len(SIZES) + 2,
+    len(SPEEDS) + 2,
+    _NUM_BANDS + _NUM_RANKS + 2,
+    len(HANDICAPS) + 2,
+)
+_FLUSH_SIZE = 65536
+
+
+def _rank_keys() -> List[RankKey]:
+    keys: List[RankKey] = [ALL]
+    keys.extend("%d+%d" % (band, RANK_BAND) for band in range(RANK_MIN, RANK_MAX + 1, RANK_BAND))
+    keys.extend(range(RANK_MIN, RANK_MAX + 1))
+    return keys
+
+
+_SIZE_KEYS: List[int] = [ALL, *SIZES]
+_SPEED_KEYS: List[int] = [ALL, *SPEEDS]
+_RANK_KEYS: List[RankKey] = _rank_keys()
+_HANDICAP_KEYS: List[int] = [ALL, *HANDICAPS]
+
+_SIZE_CODES: Dict[int, int] = {key: code for code, key in enumerate(_SIZE_KEYS)}
+_SPEED_CODES: Dict[int, int] = {key: code for code, key in enumerate(_SPEED_KEYS)}
+_RANK_CODES: Dict[RankKey, int] = {key: code for code, key in enumerate(_RANK_KEYS)}
+_HANDICAP_CODES: Dict[int, int] = {key: code for code, key in enumerate(_HANDICAP_KEYS)}
+
+
+class TallyAccumulator:
+    """
+    Dense tally of the `FIELDS` quantities, indexed by board size, game
+    speed, rank and handicap, each either a value or `ALL`.  Ranks are
+    tallied both individually and in 5 rank bands ("0+5", "5+5", ...).
+
+    Every game added is counted in the 2 x 2 x 3 x 2 cells it belongs to.
+    Games are buffered and scattered into the cells in batches; reads flush
+    the buffer first.
+    """
+
+    cells: np.ndarray
+    _size: "array[int]"
+    _speed: "array[int]"
+    _rank: "array[float]"
+    _handicap: "array[int]"
+    _values: List["array[float]"]
+
+    def __init__(self) -> None:
+        self.cells = np.zeros((len(FIELDS),) + _SHAPE)
+        self._clear_buffer()
+
+    def _clear_buffer(self) -> None:
+        self._size = array("q")
+        self._speed = array("q")
+        self._rank = array("d")
+        self._handicap = array("q")
+        self._values = [array("d") for _ in FIELDS]
+
+    def add(self, size: int, speed: int, rank: float, handicap: int, values: Tuple[float, ...]) -> None:
+        """ Adds one game, `values` holds the amount to add to each of the `FIELDS`. """
+        self._size.append(size)
+        self._speed.append(speed)
+        self._rank.append(rank)
+        self._handicap.append(handicap)
+        for column, value in zip(self._values, values):
+            column.append(value)
+        if len(self._size) >= _FLUSH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if not len(self._size):
+            return
+        self.add_batch(
+            np.frombuffer(self._size, dtype=np.int64),
+            np.frombuffer(self._speed, dtype=np.int64),
+            np.frombuffer(self._rank, dtype=np.float64),
+            np.frombuffer(self._handicap, dtype=np.int64),
+            np.array([np.frombuffer(column, dtype=np.float64) for column in self._values]),
+        )
+        self._clear_buffer()
+
+    def add_batch(
+        self, size: np.ndarray, speed: np.ndarray, rank: np.ndarray, handicap: np.ndarray, values: np.ndarray
+    ) -> None:
+        """
+        Adds a batch of games given as parallel arrays, with `values` of
+        shape (len(FIELDS), number of games).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        # In slices, to bound the memory used by the cell indexes.
+        for start in range(0, len(size), _FLUSH_SIZE):
+            end = start + _FLUSH_SIZE
+            self._add_slice(size[start:end], speed[start:end], rank[start:end], handicap[start:end], values[:, start:end])
+
+    def _add_slice(
+        self, size: np.ndarray, speed: np.ndarray, rank: np.ndarray, handicap: np.ndarray, values: np.ndarray
+    ) -> None:
+        n = len(size)
+
+        # Truncate like int(rank), then band with floor division like the
+        # "%d+5" % ((int(rank) // 5) * 5) keys.
+        int_rank = np.trunc(rank).astype(np.int64)
+        band = (int_rank // RANK_BAND) * RANK_BAND
+
+        zero = np.zeros(n, dtype=np.int64)
+        size_codes = np.stack([zero, _codes(size, SIZES, _SHAPE[0])])
+        speed_codes = np.stack([zero, _codes(speed, SPEEDS, _SHAPE[1])])
+        rank_codes = np.stack(
+            [
+                zero,
+                np.where((band >= RANK_MIN) & (band <= RANK_MAX), 1 + (band - RANK_MIN) // RANK_BAND, _SHAPE[2] - 1),
+                np.where(
+                    (int_rank >= RANK_MIN) & (int_rank <= RANK_MAX), 1 + _NUM_BANDS + int_rank - RANK_MIN, _SHAPE[2] - 1
+                ),
+            ]
+        )
+        handicap_codes = np.stack([zero, _codes(handicap, HANDICAPS, _SHAPE[3])])
+
+        # Flat cell index of each of the 24 combinations for every game.
+        cell = (
+            (size_codes[:, None, None, None] * _SHAPE[1] + speed_codes[None, :, None, None]) * _SHAPE[2]
+            + rank_codes[None, None, :, None]
+        ) * _SHAPE[3] + handicap_codes[None, None, None, :]
+        cell = cell.reshape(-1)
+
+        flat = self.cells.reshape(len(FIELDS), -1)
+        for field in range(len(FIELDS)):
+            weights = np.broadcast_to(values[field], (24, n)).reshape(-1)
+            flat[field] += np.bincount(cell, weights, minlength=flat.shape[1])
+
+    def get(self, field: str, size: int, speed: int, rank: RankKey, handicap: int) -> float:
+        self.flush()
+        try:
+            idx = (
+                FIELDS.index(field),
+                _SIZE_CODES[size],
+                _SPEED_CODES[speed],
+                _RANK_CODES[rank],
+                _HANDICAP_CODES[handicap],
+            )
+        except KeyError:
+            return 0
+        value = self.cells[idx]
+        return int(value) if value.is_integer() else float(value)
+
+    def view(self, field: str) -> "TallyView":
+        """ Read only `view[size][speed][rank][handicap]` access to one field. """
+        return TallyView(self, field, ())
+
+    def to_dict(self, field: str) -> Dict[int, Dict[int, Dict[RankKey, Dict[int, Union[int, float]]]]]:
+        """
+        The tallies of `field` as nested size, speed, rank, handicap dicts,
+        for the ranks any game was counted in.  Every handicap is present for
+        those ranks, zero if no game was counted, as the visualizer indexes
+        them unguarded.
+        """
+        self.flush()
+        touched = self.cells.any(axis=(0, 4))
+        data = self.cells[FIELDS.index(field)]
+        ret: Dict[int, Dict[int, Dict[RankKey, Dict[int, Union[int, float]]]]] = {}
+        for s, sp, r in zip(*np.nonzero(touched[:-1, :-1, :-1])):
+            ret.setdefault(_SIZE_KEYS[s], {}).setdefault(_SPEED_KEYS[sp], {})[_RANK_KEYS[r]] = {
+                key: (int(value) if value.is_integer() else float(value))
+                for key, value in zip(_HANDICAP_KEYS, data[s, sp, r, :-1])
+            }
+        return ret
+
+
+def _codes(values: np.ndarray, keys: Tuple[int, ...], axis_len: int) -> np.ndarray:
+    codes = np.full(len(values), axis_len - 1, dtype=np.int64)
+    for code, key in enumerate(keys, 1):
+        codes[values == key] = code
+    return codes
+
+
+class TallyView:
+    _accumulator: TallyAccumulator
+    _field: str
+    _keys: Tuple[Any, ...]
+
+    def __init__(self, accumulator: TallyAccumulator, field: str, keys: Tuple[Any, ...]) -> None:
+        self._accumulator = accumulator
+        self._field = field
+        self._keys = keys
+
+    def __getitem__(self, key: Any) -> Any:
+        keys = self._keys + (key,)
+        if len(keys) == 4:
+            return self._accumulator.get(self._field, *keys)
+        return TallyView(self._accumulator, self._field, keys)
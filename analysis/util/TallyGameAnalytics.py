@@ -4,16 +4,18 @@ import math
 import os
 import sys
 from collections import defaultdict
+from functools import lru_cache
 from math import isnan
 from pathlib import Path
 from statistics import mean
 from sys import argv
-from time import ctime, time
-from typing import Any, DefaultDict, Dict, List, Union
+from time import time
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from filelock import FileLock
+import numpy as np
 
 from .AGAGameData import AGAGameData
+from .AnalyticsRecorder import AnalyticsRecorder, RecordedAnalytics
 from .CLI import cli
 from .Config import config
 from .EGFGameData import EGFGameData
@@ -21,14 +23,14 @@ from .GameData import datasets_used
 from .Glicko2Analytics import Glicko2Analytics
 from .GorAnalytics import GorAnalytics
 from .InMemoryStorage import InMemoryStorage
-from .RatingMath import get_handicap_rank_difference, rating_config, rating_to_rank
+from .RatingMath import RankSystem, get_handicap_rank_difference, get_rank_system
+from .TallyAccumulator import ALL, TallyAccumulator, TallyView
 
 __all__ = ["TallyGameAnalytics", "num2rank"]
 
 
 egfdb = EGFGameData()
 agadb = AGAGameData()
-ALL: int = 999
 EGF_OFFSET = 1000000000
 AGA_OFFSET = 2000000000
 LAST_ORG_GAME_PLAYED_CUTOFF = 1559347200 # 2019-06-01
@@ -36,14 +38,11 @@ MIN_ORG_GAMES_PLAYED_CUTOFF = 6
 PROVISIONAL_DEVIATION_CUTOFF = 100
 
 
-# Result storage is indexed by size, speed, rank, handicap
+# Results are indexed by size, speed, rank, handicap
 # Board size, `ALL` for all
 # Game speed, `ALL` for all, 1=blitz, 2=live, 3=correspondence
 # rank, or rank+5 for 5 rank bands (the str "0+5", "5+5", "10+5", etc), `ALL` for all
 # Handicap, 0-9 or `ALL` for all
-ResultStorageType = DefaultDict[
-    int, DefaultDict[int, DefaultDict[Union[int, str], DefaultDict[int, Union[int, float]]]],
-]
 
 cli.add_argument(
     "--mismatch-threshold-black-wins", dest="mismatch_threshold_black_wins", type=float, default=1.0,
@@ -53,33 +52,74 @@ cli.add_argument(
     "--mismatch-threshold-predictions", dest="mismatch_threshold_predictions", type=float, default=1.0,
     help="Rank difference threshold for ignoring mismatched games in prediction tables",
 )
+cli.add_argument(
+    "--provisional-deviation-cutoff", dest="provisional_deviation_cutoff", type=float,
+    default=PROVISIONAL_DEVIATION_CUTOFF,
+    help="Ignore glicko2 games where either player's deviation is above this",
+)
 
 class TallyGameAnalytics:
     games_ignored: int
-    black_wins: ResultStorageType
-    predictions: ResultStorageType
-    predicted_outcome: ResultStorageType
-    prediction_cost: ResultStorageType
-    count: ResultStorageType
-    count_black_wins: ResultStorageType
+    accumulator: TallyAccumulator
+    black_wins: TallyView
+    predictions: TallyView
+    predicted_outcome: TallyView
+    prediction_cost: TallyView
+    count: TallyView
+    count_black_wins: TallyView
     storage: InMemoryStorage
     prefix: str
+    rank_system: RankSystem
+    recorder: Optional[AnalyticsRecorder]
 
-    def __init__(self, storage: InMemoryStorage, prefix: str = '') -> None:
+    def __init__(self, storage: InMemoryStorage, prefix: str = '', rank_system: Optional[RankSystem] = None) -> None:
         self.prefix = prefix
         self.games_ignored = 0
         self.storage = storage
-        self.black_wins = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: 0))))
-        self.predictions = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: 0.0))))
-        self.predicted_outcome = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: 0.0))))
-        self.prediction_cost = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: 0.0))))
-        self.count = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: 0))))
-        self.count_black_wins = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: 0))))
+        self.rank_system = get_rank_system() if rank_system is None else rank_system
+        self.accumulator = TallyAccumulator()
+        self.black_wins = self.accumulator.view("black_wins")
+        self.predictions = self.accumulator.view("predictions")
+        self.predicted_outcome = self.accumulator.view("predicted_outcome")
+        self.prediction_cost = self.accumulator.view("prediction_cost")
+        self.count = self.accumulator.view("count")
+        self.count_black_wins = self.accumulator.view("count_black_wins")
+        self.recorder = AnalyticsRecorder.for_tally(prefix) if config.args.record_analytics else None
+
+    def get_state(self) -> Dict[str, Any]:
+        """ The tallied counts, and the analytics recorded so far, for checkpoints. """
+        self.accumulator.flush()
+        return {
+            "games_ignored": self.games_ignored,
+            "cells": self.accumulator.cells,
+            "recorded": None if self.recorder is None else self.recorder.get_state(),
+        }
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        self.games_ignored = state["games_ignored"]
+        self.accumulator.cells[...] = state["cells"]
+        if self.recorder is not None and state.get("recorded") is not None:
+            self.recorder.set_state(state["recorded"])
+
+    def merge_state(self, state: Dict[str, Any]) -> None:
+        """ Adds the counts in another tally's `get_state()`, of games this tally hasn't counted. """
+        self.accumulator.flush()
+        self.games_ignored += state["games_ignored"]
+        self.accumulator.cells += state["cells"]
+        if self.recorder is not None and state.get("recorded") is not None:
+            self.recorder.merge_state(state["recorded"])
+
+    def save_recorded_analytics(self) -> None:
+        if self.recorder is not None:
+            self.recorder.save(self.storage.all_players())
 
     def add_glicko2_analytics(self, result: Glicko2Analytics) -> None:
         if result.skipped:
             return
-        if result.black_deviation > PROVISIONAL_DEVIATION_CUTOFF or result.white_deviation > PROVISIONAL_DEVIATION_CUTOFF:
+        if self.recorder is not None:
+            self.recorder.add_glicko2_analytics(result)
+        cutoff = config.args.provisional_deviation_cutoff
+        if result.black_deviation > cutoff or result.white_deviation > cutoff:
             self.games_ignored += 1
             return
 
@@ -95,37 +135,40 @@ class TallyGameAnalytics:
             return
 
         black_won = result.game.winner_id == result.game.black_id
-        white_won = result.game.winner_id == result.game.white_id
-
-        for size in [ALL, result.game.size]:
-            for speed in [ALL, result.game.speed]:
-                for rank in [
-                    ALL,
-                    str((int(result.black_rank) // 5) * 5) + "+5",
-                    int(result.black_rank),
-                ]:
-                    for handicap in [ALL, result.game.handicap]:
-                        if isinstance(rank, int) or isinstance(rank, str):  # this is just to make mypy happy
-                            if tally_black_wins:
-                                self.count_black_wins[size][speed][rank][handicap] += 1
-                                if black_won:
-                                    self.black_wins[size][speed][rank][handicap] += 1
-                            if tally_predictions:
-                                self.predictions[size][speed][rank][handicap] += result.expected_win_rate
-                                self.predicted_outcome[size][speed][rank][handicap] += (
-                                    black_won
-                                    if result.expected_win_rate > 0.5
-                                    else (not black_won if result.expected_win_rate < 0.5 else 0.5)
-                                )
-                                # Cap the expected win rate at 1 in 1M to avoid MathDomain errors.
-                                capped_win_rate = max(min(result.expected_win_rate, 0.999999), 0.000001)
-                                self.prediction_cost[size][speed][rank][handicap] += - math.log(capped_win_rate if black_won else 1 - capped_win_rate)
-                                self.count[size][speed][rank][handicap] += 1
 
+        predicted_outcome = 0.0
+        prediction_cost = 0.0
+        if tally_predictions:
+            predicted_outcome = (
+                black_won
+                if result.expected_win_rate > 0.5
+                else (not black_won if result.expected_win_rate < 0.5 else 0.5)
+            )
+            # Cap the expected win rate at 1 in 1M to avoid MathDomain errors.
+            capped_win_rate = max(min(result.expected_win_rate, 0.999999), 0.000001)
+            prediction_cost = - math.log(capped_win_rate if black_won else 1 - capped_win_rate)
+
+        # In `FIELDS` order.
+        self.accumulator.add(
+            result.game.size,
+            result.game.speed,
+            result.black_rank,
+            result.game.handicap,
+            (
+                tally_black_wins,
+                tally_black_wins and black_won,
+                result.expected_win_rate if tally_predictions else 0.0,
+                predicted_outcome,
+                prediction_cost,
+                tally_predictions,
+            ),
+        )
 
     def add_gor_analytics(self, result: GorAnalytics) -> None:
         if result.skipped:
             return
+        if self.recorder is not None:
+            self.recorder.add_gor_analytics(result)
 
         if result.black_games_played < 5 or result.white_games_played < 5:
             self.games_ignored += 1
@@ -137,21 +180,71 @@ class TallyGameAnalytics:
 
         black_won = result.game.winner_id == result.game.black_id
 
-        for size in [ALL, result.game.size]:
-            for speed in [ALL, result.game.speed]:
-                for rank in [
-                    ALL,
-                    str((int(result.black_rank) // 5) * 5) + "+5",
-                    int(result.black_rank),
-                ]:
-                    for handicap in [ALL, result.game.handicap]:
-                        if isinstance(rank, int) or isinstance(rank, str):  # this is just to make mypy happy
-                            if black_won:
-                                self.black_wins[size][speed][rank][handicap] += 1
-                            self.predictions[size][speed][rank][handicap] += result.expected_win_rate
-                            self.count[size][speed][rank][handicap] += 1
+        # In `FIELDS` order.
+        self.accumulator.add(
+            result.game.size,
+            result.game.speed,
+            result.black_rank,
+            result.game.handicap,
+            (0, black_won, result.expected_win_rate, 0.0, 0.0, 1),
+        )
+
+    def add_recorded_analytics(self, recorded: RecordedAnalytics) -> None:
+        """
+        Tallies games recorded with --record-analytics, applying the same
+        filters as `add_glicko2_analytics` and `add_gor_analytics` to all of
+        them at once.
+        """
+        if not len(recorded):
+            return
+        columns = recorded.columns
+        black_won = columns["black_won"].astype(bool)
+        expected_win_rate = columns["expected_win_rate"]
+        black_rank = columns["black_rank"]
+        white_rank = columns["white_rank"]
+        zero = np.zeros(len(recorded))
+
+        if recorded.kind == "glicko2":
+            cutoff = config.args.provisional_deviation_cutoff
+            provisional = (columns["black_deviation"] > cutoff) | (columns["white_deviation"] > cutoff)
+            effective_rank_difference = np.abs(black_rank + columns["handicap_rank_difference"] - white_rank)
+            tally_black_wins = ~provisional & (effective_rank_difference <= config.args.mismatch_threshold_black_wins)
+            tally_predictions = ~provisional & (effective_rank_difference <= config.args.mismatch_threshold_predictions)
+            keep = tally_black_wins | tally_predictions
+
+            predicted_outcome = np.where(
+                expected_win_rate > 0.5, black_won, np.where(expected_win_rate < 0.5, ~black_won, 0.5)
+            )
+            capped_win_rate = np.clip(expected_win_rate, 0.000001, 0.999999)
+            prediction_cost = -np.log(np.where(black_won, capped_win_rate, 1 - capped_win_rate))
+            values = np.array(
+                [
+                    tally_black_wins,
+                    tally_black_wins & black_won,
+                    np.where(tally_predictions, expected_win_rate, zero),
+                    np.where(tally_predictions, predicted_outcome, zero),
+                    np.where(tally_predictions, prediction_cost, zero),
+                    tally_predictions,
+                ],
+                dtype=np.float64,
+            )
+        else:
+            keep = (
+                (columns["black_games_played"] >= 5)
+                & (columns["white_games_played"] >= 5)
+                & (np.abs(black_rank + columns["handicap"] - white_rank) <= 1)
+            )
+            one = np.ones(len(recorded))
+            values = np.array([zero, black_won, expected_win_rate, zero, zero, one], dtype=np.float64)
+
+        self.games_ignored += int(len(keep) - np.count_nonzero(keep))
+        self.accumulator.flush()
+        self.accumulator.add_batch(
+            columns["size"][keep], columns["speed"][keep], black_rank[keep], columns["handicap"][keep], values[:, keep]
+        )
 
     def print(self) -> None:
+        self.save_recorded_analytics()
         self.print_handicap_performance()
         self.print_handicap_prediction()
         self.print_handicap_cost()
@@ -161,19 +254,17 @@ class TallyGameAnalytics:
         self.print_self_reported_stats()
         self.update_visualizer_data()
 
+    def get_compact_stats(self) -> Dict[str, float]:
+        """ Average prediction cost overall and for handicap 0, 1 and 2 games, lower is better. """
+        return {
+            "all": self.prediction_cost[ALL][ALL][ALL][ALL] / max(1, self.count[ALL][ALL][ALL][ALL]),
+            "h0": self.prediction_cost[ALL][ALL][ALL][0] / max(1, self.count[ALL][ALL][ALL][0]),
+            "h1": self.prediction_cost[ALL][ALL][ALL][1] / max(1, self.count[ALL][ALL][ALL][1]),
+            "h2": self.prediction_cost[ALL][ALL][ALL][2] / max(1, self.count[ALL][ALL][ALL][2]),
+        }
+
     def print_compact_stats(self) -> None:
-        prediction = (
-            self.prediction_cost[ALL][ALL][ALL][ALL] / max(1, self.count[ALL][ALL][ALL][ALL])
-        )
-        prediction_h0 = (
-            self.prediction_cost[ALL][ALL][ALL][0] / max(1, self.count[ALL][ALL][ALL][0])
-        )
-        prediction_h1 = (
-            self.prediction_cost[ALL][ALL][ALL][1] / max(1, self.count[ALL][ALL][ALL][1])
-        )
-        prediction_h2 = (
-            self.prediction_cost[ALL][ALL][ALL][2] / max(1, self.count[ALL][ALL][ALL][2])
-        )
+        stats = self.get_compact_stats()
 
         #unexp_change = (
         #    self.unexpected_rank_changes[ALL][ALL][ALL][ALL] / max(1, self.count[ALL][ALL][ALL][ALL]) / 2
@@ -194,10 +285,10 @@ class TallyGameAnalytics:
             "| {name:>s} | {prediction:>13.1%} | {prediction_h0:>5.1%} "
             "| {prediction_h1:>5.1%} | {prediction_h2:>5.1%} |".format(
                 name=Path(argv[0]).name.replace("analyze_", "")[0:14],
-                prediction=prediction,
-                prediction_h0=prediction_h0,
-                prediction_h1=prediction_h1,
-                prediction_h2=prediction_h2,
+                prediction=stats["all"],
+                prediction_h0=stats["h0"],
+                prediction_h1=stats["h1"],
+                prediction_h2=stats["h2"],
             )
         )
 
@@ -239,7 +330,7 @@ class TallyGameAnalytics:
                         "%20s    %3s     %s     %4.0f  %4.0f     %3.0f  %3.0f"
                         % (
                             name,
-                            num2rank(rating_to_rank(entry.rating)),
+                            num2rank(self.rank_system.rating_to_rank(entry.rating)),
                             str(entry),
                             min(rh, key=lambda x: x.rating, default=entry).rating,
                             max(rh, key=lambda x: x.rating, default=entry).rating,
@@ -347,99 +438,28 @@ class TallyGameAnalytics:
         if not datasets["ogs"]:
             return
 
-
-        if os.path.exists('./data'):
-            pathname = './data/'
-        elif os.path.exists('../data'):
-            pathname = '../data/'
-        else:
-            raise Exception('Failed to find data directory')
-
-        if os.path.exists(pathname + 'self_reported_account_links.full.json'):
-            pathname += 'self_reported_account_links.full.json'
-        elif os.path.exists(pathname + 'self_reported_account_links.json'):
-            pathname = 'self_reported_account_links.json'
-        else:
-            raise Exception('Failed to find self_reported_account_links json file')
-
-
-        with open(pathname, 'r') as f:
-            stats = json.loads(f.read())
-
-        def get_org_rank(entry, org_country):
-            for org in ['org1', 'org2', 'org3']:
-                if org in entry and entry[org] == org_country:
-                    if org + '_rank' in entry:
-                        return entry[org + '_rank']
-            return None
-
-        def get_org_id(entry, org_country):
-            for org in ['org1', 'org2', 'org3']:
-                if org in entry and entry[org] == org_country:
-                    if org + '_id' in entry:
-                        try:
-                            return int(entry[org + '_id'])
-                        except:
-                            return None
-            return None
-
-        def date(timestamp) -> str:
-            return ctime(timestamp) if timestamp else ''
-
-
-        egf_count = 0
-        aga_count = 0
-
         bins     = defaultdict(lambda: defaultdict(lambda: list()))
 
-        for e in stats:
-            id = e[0]
-            username = e[1]
-            entry = e[2]
-            player = self.storage.get(id)
-            rank = rating_to_rank(player.rating)
+        for account in _linked_accounts():
+            player = self.storage.get(account.player_id)
+            rank = self.rank_system.rating_to_rank(player.rating)
 
-            aga = get_org_rank(entry, 'us')
-            egf = get_org_rank(entry, 'eu')
-            aga_id = get_org_id(entry, 'us')
-            egf_id = get_org_id(entry, 'eu')
+            aga = account.aga_rank
+            egf = account.egf_rank
 
             if (aga and aga > 100) or (egf and egf > 100):
                 pass # throwout pros for our purposes
 
-
-            aga_num_games_played = agadb.num_games_played(aga_id + AGA_OFFSET) if aga_id else 0
-            aga_last_game_played = agadb.last_game_played(aga_id + AGA_OFFSET) if aga_id else 0
-            egf_num_games_played = egfdb.num_games_played(egf_id + EGF_OFFSET) if egf_id else 0
-            egf_last_game_played = egfdb.last_game_played(egf_id + EGF_OFFSET) if egf_id else 0
-
-            jan_2019 = 1546300800
-            #if aga and aga_last_game_played > 0:
-            if aga and aga_last_game_played > jan_2019 and aga_num_games_played > 5:
+            if aga and account.aga_active:
                 bins['aga'][aga].append(rank - aga)
 
-            #if egf and egf_last_game_played > 0:
-            if egf and egf_last_game_played > jan_2019 and egf_num_games_played > 5:
+            if egf and account.egf_active:
                 bins['egf'][egf].append(rank - egf)
 
+            for server, server_rank in account.server_ranks:
+                bins[server][server_rank].append(rank - server_rank)
 
-            for server in ['dgs', 'fox', 'kgs', 'igs', 'fox', 'yike', 'golem', 'tygem', 'goquest', 'wbaduk']:
-                if ('%s_rank' % server) in entry:
-                    server_rank = int(entry[('%s_rank' % server)])
-                    bins[server][server_rank].append(rank - server_rank)
-
-        ret = {}
-
-        for k in bins.keys():
-            ret[k] = []
-            for rank in range(0, 40):
-                if bins[k][rank]:
-                    ret[k].append(bins[k][rank])
-                else:
-                    ret[k].append([])
-
-        return ret
-
+        return _bins_by_rank(bins)
 
     def get_self_reported_rating(self) -> Dict[str, Dict[int, List[float]]]:
         datasets = datasets_used()
@@ -447,100 +467,29 @@ class TallyGameAnalytics:
         if not datasets["ogs"]:
             return
 
-
-        if os.path.exists('./data'):
-            pathname = './data/'
-        elif os.path.exists('../data'):
-            pathname = '../data/'
-        else:
-            raise Exception('Failed to find data directory')
-
-        if os.path.exists(pathname + 'self_reported_account_links.full.json'):
-            pathname += 'self_reported_account_links.full.json'
-        elif os.path.exists(pathname + 'self_reported_account_links.json'):
-            pathname = 'self_reported_account_links.json'
-        else:
-            raise Exception('Failed to find self_reported_account_links json file')
-
-
-        with open(pathname, 'r') as f:
-            stats = json.loads(f.read())
-
-        def get_org_rank(entry, org_country):
-            for org in ['org1', 'org2', 'org3']:
-                if org in entry and entry[org] == org_country:
-                    if org + '_rank' in entry:
-                        return entry[org + '_rank']
-            return None
-
-        def get_org_id(entry, org_country):
-            for org in ['org1', 'org2', 'org3']:
-                if org in entry and entry[org] == org_country:
-                    if org + '_id' in entry:
-                        try:
-                            return int(entry[org + '_id'])
-                        except:
-                            return None
-            return None
-
-        def date(timestamp) -> str:
-            return ctime(timestamp) if timestamp else ''
-
-
-        egf_count = 0
-        aga_count = 0
-
         bins     = defaultdict(lambda: defaultdict(lambda: list()))
 
-        for e in stats:
-            id = e[0]
-            username = e[1]
-            entry = e[2]
-            player = self.storage.get(id)
-            rank = rating_to_rank(player.rating)
+        for account in _linked_accounts():
+            player = self.storage.get(account.player_id)
             if player.rating == 1500:
                 continue
 
-            aga = get_org_rank(entry, 'us')
-            egf = get_org_rank(entry, 'eu')
-            aga_id = get_org_id(entry, 'us')
-            egf_id = get_org_id(entry, 'eu')
+            aga = account.aga_rank
+            egf = account.egf_rank
 
             if (aga and aga > 100) or (egf and egf > 100):
                 continue # throwout pros for our purposes
 
-
-            aga_num_games_played = agadb.num_games_played(aga_id + AGA_OFFSET) if aga_id else 0
-            aga_last_game_played = agadb.last_game_played(aga_id + AGA_OFFSET) if aga_id else 0
-            egf_num_games_played = egfdb.num_games_played(egf_id + EGF_OFFSET) if egf_id else 0
-            egf_last_game_played = egfdb.last_game_played(egf_id + EGF_OFFSET) if egf_id else 0
-
-            jan_2019 = 1546300800
-            #if aga and aga_last_game_played > 0:
-            if aga and aga_last_game_played > jan_2019 and aga_num_games_played > 5:
+            if aga and account.aga_active:
                 bins['aga'][aga].append(player.rating)
 
-            #if egf and egf_last_game_played > 0:
-            if egf and egf_last_game_played > jan_2019 and egf_num_games_played > 5:
+            if egf and account.egf_active:
                 bins['egf'][egf].append(player.rating)
 
+            for server, server_rank in account.server_ranks:
+                bins[server][server_rank].append(player.rating)
 
-            for server in ['dgs', 'fox', 'kgs', 'igs', 'fox', 'yike', 'golem', 'tygem', 'goquest', 'wbaduk']:
-                if ('%s_rank' % server) in entry:
-                    server_rank = int(entry[('%s_rank' % server)])
-                    bins[server][server_rank].append(player.rating)
-
-        ret = {}
-
-        for k in bins.keys():
-            ret[k] = []
-            for rank in range(0, 40):
-                if bins[k][rank]:
-                    ret[k].append(bins[k][rank])
-                else:
-                    ret[k].append([])
-
-        return ret
+        return _bins_by_rank(bins)
 
     def print_handicap_cost(self) -> None:
         print("")
@@ -580,7 +529,7 @@ class TallyGameAnalytics:
         ret["name"] = config.name
         ret["datasets"] = datasets
         ret["num_games"] = config.args.num_games
-        ret["rating_config"] = rating_config
+        ret["rating_config"] = self.rank_system.describe()
 
         return ret
 
@@ -614,15 +563,15 @@ class TallyGameAnalytics:
 
         obj["name"] = self.get_descriptive_name()
         obj["timestamp"] = time()
-        obj["black_wins"] = self.black_wins
-        obj["predictions"] = self.predictions
-        obj["count"] = self.count
+        obj["black_wins"] = self.accumulator.to_dict("black_wins")
+        obj["predictions"] = self.accumulator.to_dict("predictions")
+        obj["count"] = self.accumulator.to_dict("count")
         obj["ignored"] = self.games_ignored
         obj["config"] = self.get_config()
 
         rank_distribution = [0 for x in range(40)]
         for _id, player in self.storage.all_players().items():
-            rank = max(0, min(39, int(rating_to_rank(player.rating))))
+            rank = max(0, min(39, int(self.rank_system.rating_to_rank(player.rating))))
             rank_distribution[rank] += 1
 
         obj["rank_distribution"] = rank_distribution
@@ -631,6 +580,16 @@ class TallyGameAnalytics:
         return obj
 
     def update_visualizer_data(self) -> Any:
+        obj = self.get_visualizer_data()
+        TallyGameAnalytics.write_visualizer_data([obj])
+        return obj
+
+    @staticmethod
+    def write_visualizer_data(objs: List[Any]) -> None:
+        """
+        Merges the visualizer data objects `objs` into the visualizer's
+        data.json, taking its lock once for all of them.
+        """
         fname: str = "data.json"
 
         if os.path.exists("visualizer/"):
@@ -641,19 +600,112 @@ class TallyGameAnalytics:
             raise Exception("Can't find visualizer directory")
 
         data: Any = {}
-        obj = self.get_visualizer_data()
+
+        # Imported here, it's slow to import and only needed at the end of a run.
+        from filelock import FileLock
 
         with FileLock(fname + ".lock"):
             if os.path.exists(fname):
                 with open(fname, "r") as f:
                     data = json.load(f)
 
-            data[obj["name"]] = obj
+            for obj in objs:
+                data[obj["name"]] = obj
 
             with open(fname, "w") as f:
                 json.dump(data, f)
 
-        return obj
+
+class _LinkedAccount:
+    """ An OGS player's self-reported ranks on other servers and with the AGA and EGF. """
+
+    __slots__ = ("player_id", "aga_rank", "egf_rank", "aga_active", "egf_active", "server_ranks")
+
+    player_id: int
+    aga_rank: Optional[int]
+    egf_rank: Optional[int]
+    aga_active: bool  # recently played enough games in the AGA / EGF data
+    egf_active: bool
+    server_ranks: List[Tuple[str, int]]
+
+    def __init__(self, player_id: int, entry: Dict[str, Any]) -> None:
+        self.player_id = player_id
+        self.aga_rank = _get_org_rank(entry, 'us')
+        self.egf_rank = _get_org_rank(entry, 'eu')
+        self.aga_active = _active(agadb, self.aga_rank, _get_org_id(entry, 'us'), AGA_OFFSET)
+        self.egf_active = _active(egfdb, self.egf_rank, _get_org_id(entry, 'eu'), EGF_OFFSET)
+        self.server_ranks = [
+            (server, int(entry['%s_rank' % server]))
+            for server in ['dgs', 'fox', 'kgs', 'igs', 'fox', 'yike', 'golem', 'tygem', 'goquest', 'wbaduk']
+            if ('%s_rank' % server) in entry
+        ]
+
+
+@lru_cache(maxsize=None)
+def _linked_accounts() -> Tuple[_LinkedAccount, ...]:
+    """
+    The self-reported account links, read once per process.  The AGA and EGF
+    activity of every linked player comes from one query per dataset.
+    """
+    if os.path.exists('./data'):
+        pathname = './data/'
+    elif os.path.exists('../data'):
+        pathname = '../data/'
+    else:
+        raise Exception('Failed to find data directory')
+
+    if os.path.exists(pathname + 'self_reported_account_links.full.json'):
+        pathname += 'self_reported_account_links.full.json'
+    elif os.path.exists(pathname + 'self_reported_account_links.json'):
+        pathname += 'self_reported_account_links.json'
+    else:
+        raise Exception('Failed to find self_reported_account_links json file')
+
+    with open(pathname, 'r') as f:
+        links = json.loads(f.read())
+
+    return tuple(_LinkedAccount(e[0], e[2]) for e in links)
+
+
+def _get_org_rank(entry: Dict[str, Any], org_country: str) -> Optional[int]:
+    for org in ['org1', 'org2', 'org3']:
+        if org in entry and entry[org] == org_country:
+            if org + '_rank' in entry:
+                return entry[org + '_rank']
+    return None
+
+
+def _get_org_id(entry: Dict[str, Any], org_country: str) -> Optional[int]:
+    for org in ['org1', 'org2', 'org3']:
+        if org in entry and entry[org] == org_country:
+            if org + '_id' in entry:
+                try:
+                    return int(entry[org + '_id'])
+                except:
+                    return None
+    return None
+
+
+def _active(db: Union[AGAGameData, EGFGameData], rank: Optional[int], org_id: Optional[int], offset: int) -> bool:
+    if not rank or not org_id:
+        return False
+    num_games_played, last_game_played = db.player_stats().get(org_id + offset, (0, 0))
+    jan_2019 = 1546300800
+    return last_game_played > jan_2019 and num_games_played > 5
+
+
+def _bins_by_rank(bins: Dict[str, Dict[int, List[float]]]) -> Dict[str, List[List[float]]]:
+    ret = {}
+
+    for k in bins.keys():
+        ret[k] = []
+        for rank in range(0, 40):
+            if bins[k][rank]:
+                ret[k].append(bins[k][rank])
+            else:
+                ret[k].append([])
+
+    return ret
 
 
 def num2rank(num: float) -> str:
@@ -1,37 +1,65 @@
+from .AnalyticsRecorder import AnalyticsRecorder, RecordedAnalytics, load_analytics
+from .Checkpoint import Checkpointer
 from .CLI import cli, defaults
-from .Config import config
+from .Config import config, glicko2_config_from_args
 from .EGFGameData import EGFGameData
-from .GameData import GameData
+from .GameBatch import GameBatch
+from .GameData import GameData, parse_timestamp
 from .Glicko2Analytics import Glicko2Analytics
+from .Glicko2GridStorage import GRID_SIZES, GRID_SPEEDS, Glicko2GridStorage, grid_category
 from .GorAnalytics import GorAnalytics
 from .InMemoryStorage import InMemoryStorage
 from .OGSGameData import OGSGameData
+from .Profiler import profiler
 from .RatingMath import (
+    RankSystem,
     get_handicap_adjustment,
     get_handicap_rank_difference,
+    get_rank_system,
+    make_rank_system,
     rank_to_rating,
     rating_to_rank,
     set_exhaustive_log_parameters,
     set_optimizer_rating_points,
 )
+from .SqliteStorage import SqliteStorage, make_storage
 from .SkipLogic import should_skip_game
+from .TallyAccumulator import TallyAccumulator
 from .TallyGameAnalytics import TallyGameAnalytics, num2rank
 
 __all__ = [
+    "AnalyticsRecorder",
+    "RecordedAnalytics",
+    "load_analytics",
+    "Checkpointer",
     "cli",
     "config",
+    "glicko2_config_from_args",
     "defaults",
     "Glicko2Analytics",
+    "Glicko2GridStorage",
+    "GRID_SIZES",
+    "GRID_SPEEDS",
+    "grid_category",
     "GorAnalytics",
     "InMemoryStorage",
+    "SqliteStorage",
+    "make_storage",
     "OGSGameData",
+    "profiler",
     "EGFGameData",
+    "GameBatch",
     "GameData",
+    "parse_timestamp",
+    "TallyAccumulator",
     "TallyGameAnalytics",
     "rating_to_rank",
     "rank_to_rating",
     "get_handicap_adjustment",
     "get_handicap_rank_difference",
+    "get_rank_system",
+    "make_rank_system",
+    "RankSystem",
     "should_skip_game",
     "configure_rating_to_rank",
     "num2rank",
@@ -0,0 +1,18 @@
+"""
+Benchmarks for the code in the per-game loop of the analysis scripts:
+the glicko2 and gor updates, the handicap adjustment, the storage's history
+queries, the tallies and a whole engine, run over seeded synthetic game
+streams.  Run from the repository root with the interpreter to measure:
+
+    python -m benchmarks --scale 10k
+    pypy3 -m benchmarks --scale 1m --save baseline.json
+    pypy3 -m benchmarks --scale 1m --compare baseline.json
+
+Each benchmark runs in its own process so its peak RSS can be reported.
+`python -m benchmarks.import_time` measures import times.
+
+The game streams come from `benchmarks.streams`, which models a population
+of players with latent strengths.  `python -m benchmarks.make_ogs_db` writes
+such a stream as a drop-in ogs-data.db for running the analysis scripts
+without the production data.
+"""
@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_case(name: str, scale: str, seed: int) -> Dict[str, Any]:
+    """ Runs one benchmark in this process. """
+    # The analysis scripts run with PYTHONPATH=..:. from the analysis directory.
+    sys.path[:0] = [ROOT, os.path.join(ROOT, "analysis")]
+    from benchmarks.cases import CASES
+    from benchmarks.streams import SCALES, chunked, synthetic_games
+
+    run = CASES[name]()
+    ops = 0
+    seconds = 0.0
+    for chunk in chunked(synthetic_games(SCALES[scale], seed)):
+        started = perf_counter()
+        ops += run(chunk)
+        seconds += perf_counter() - started
+    return {"ops": ops, "seconds": seconds, "ops_per_second": ops / seconds, "peak_rss_mb": _peak_rss_mb()}
+
+
+def run_in_subprocess(name: str, scale: str, seed: int) -> Dict[str, Any]:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks", "--child", name, "--scale", scale, "--seed", str(seed)],
+        cwd=ROOT,
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout
+    return json.loads(out)  # type: ignore
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """ Prints the change from `baseline` and returns the names of the benchmarks that got slower than `threshold`. """
+    if baseline["interpreter"] != results["interpreter"] or baseline["scale"] != results["scale"]:
+        print(
+            "warning: baseline is for %s at %s, these results are for %s at %s"
+            % (baseline["interpreter"], baseline["scale"], results["interpreter"], results["scale"])
+        )
+    regressions = []
+    print("")
+    print("%-30s %12s %12s %8s" % ("benchmark", "baseline/s", "now/s", "change"))
+    for name, result in results["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        change = result["ops_per_second"] / before["ops_per_second"] - 1
+        flag = ""
+        if change < -threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            "%-30s %12.0f %12.0f %+7.1f%%%s"
+            % (name, before["ops_per_second"], result["ops_per_second"], change * 100, flag)
+        )
+    return regressions
+
+
+def main() -> None:
+    cli = argparse.ArgumentParser(prog="python -m benchmarks", description="goratings hot path benchmarks")
+    cli.add_argument("--scale", default="10k", choices=["10k", "1m", "10m"], help="Number of games in the stream")
+    cli.add_argument("--seed", type=int, default=1, help="Seed of the synthetic game stream")
+    cli.add_argument("--only", action="append", help="Only run this benchmark, repeatable")
+    cli.add_argument("--save", metavar="FILE", help="Write the results to FILE as JSON")
+    cli.add_argument("--compare", metavar="FILE", help="Compare with results saved earlier with --save")
+    cli.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Slowdown, as a fraction, at which --compare reports a regression and exits with status 1",
+    )
+    cli.add_argument("--child", help=argparse.SUPPRESS)
+    args = cli.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.child, args.scale, args.seed)))
+        return
+
+    sys.path.insert(0, ROOT)
+    from benchmarks.cases import CASES
+
+    names = args.only or list(CASES)
+    results: Dict[str, Any] = {
+        "interpreter": "%s %s" % (platform.python_implementation(), platform.python_version()),
+        "scale": args.scale,
+        "seed": args.seed,
+        "results": {},
+    }
+    print("%s, %s games" % (results["interpreter"], args.scale))
+    print("%-30s %12s %10s %10s" % ("benchmark", "ops/s", "seconds", "peak MB"))
+    for name in names:
+        result = run_in_subprocess(name, args.scale, args.seed)
+        results["results"][name] = result
+        print("%-30s %12.0f %10.2f %10.1f" % (name, result["ops_per_second"], result["seconds"], result["peak_rss_mb"]))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    regressions: Optional[List[str]] = None
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
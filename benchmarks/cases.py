@@ -0,0 +1,161 @@
+from typing import Callable, Dict, List
+
+from goratings.interfaces import GameRecord
+
+__all__ = ["CASES"]
+
+
+# A benchmark case sets up its state and returns a function that processes
+# one chunk of games and returns the number of operations it did.  Only the
+# chunk functions are timed.
+Case = Callable[[], Callable[[List[GameRecord]], int]]
+
+DAY = 86400
+
+
+def _configure() -> None:
+    from analysis.util import cli, config
+
+    config(cli.parse_args([]), "benchmark")
+
+
+def glicko2_update() -> Callable[[List[GameRecord]], int]:
+    from goratings.math.glicko2 import Glicko2Entry, glicko2_update
+
+    entries: Dict[int, Glicko2Entry] = {}
+
+    def run(games: List[GameRecord]) -> int:
+        for game in games:
+            black = entries.get(game.black_id) or Glicko2Entry()
+            white = entries.get(game.white_id) or Glicko2Entry()
+            black_won = game.winner_id == game.black_id
+            entries[game.black_id] = glicko2_update(black, [(white, black_won)], timestamp=game.ended)
+            entries[game.white_id] = glicko2_update(white, [(black, not black_won)], timestamp=game.ended)
+        return len(games)
+
+    return run
+
+
+def gor_update() -> Callable[[List[GameRecord]], int]:
+    from goratings.math.gor import GorEntry, gor_update
+
+    entries: Dict[int, GorEntry] = {}
+
+    def run(games: List[GameRecord]) -> int:
+        for game in games:
+            black = entries.get(game.black_id) or GorEntry()
+            white = entries.get(game.white_id) or GorEntry()
+            black_won = game.winner_id == game.black_id
+            entries[game.black_id] = gor_update(black, white, 1 if black_won else 0)
+            entries[game.white_id] = gor_update(white, black, 0 if black_won else 1)
+        return len(games)
+
+    return run
+
+
+def compute_con() -> Callable[[List[GameRecord]], int]:
+    from goratings.math.gor import compute_con
+
+    def run(games: List[GameRecord]) -> int:
+        for game in games:
+            compute_con(game.black_id % 40 + 0.5)
+        return len(games)
+
+    return run
+
+
+def get_handicap_adjustment() -> Callable[[List[GameRecord]], int]:
+    _configure()
+    from analysis.util import get_handicap_adjustment
+
+    def run(games: List[GameRecord]) -> int:
+        for game in games:
+            get_handicap_adjustment(
+                "black", 1000 + game.black_id % 1500, game.handicap, komi=game.komi, size=game.size, rules=game.rules
+            )
+        return len(games)
+
+    return run
+
+
+def storage_history() -> Callable[[List[GameRecord]], int]:
+    # The history traffic of the windowed engines: record both players'
+    # ratings, then read back the rating before the window and the ratings
+    # in it.
+    _configure()
+    from analysis.util import InMemoryStorage
+    from goratings.math.glicko2 import Glicko2Entry
+
+    storage = InMemoryStorage(Glicko2Entry)
+
+    def run(games: List[GameRecord]) -> int:
+        for game in games:
+            for player_id in (game.black_id, game.white_id):
+                storage.add_rating_history(player_id, game.ended, storage.get(player_id))
+                storage.add_match_history(player_id, game.ended, game.game_id)
+                storage.get_first_rating_older_than(player_id, game.ended - 28 * DAY)
+                storage.get_ratings_newer_or_equal_to(player_id, game.ended - 28 * DAY)
+                storage.get_matches_newer_or_equal_to(player_id, game.ended - 7 * DAY)
+        return len(games)
+
+    return run
+
+
+def tally_add_glicko2_analytics() -> Callable[[List[GameRecord]], int]:
+    _configure()
+    from analysis.util import Glicko2Analytics, InMemoryStorage, TallyGameAnalytics
+    from goratings.math.glicko2 import Glicko2Entry
+
+    tally = TallyGameAnalytics(InMemoryStorage(Glicko2Entry))
+
+    def run(games: List[GameRecord]) -> int:
+        for game in games:
+            black_rank = (game.black_id * 7) % 40 + 0.5
+            tally.add_glicko2_analytics(
+                Glicko2Analytics(
+                    skipped=False,
+                    game=game,
+                    expected_win_rate=0.25 + (game.game_id % 50) / 100,
+                    black_rating=1500,
+                    white_rating=1500,
+                    black_deviation=60 + game.black_id % 60,
+                    white_deviation=60 + game.white_id % 60,
+                    black_rank=black_rank,
+                    white_rank=black_rank + (game.game_id % 5 - 2) * 0.4,
+                )
+            )
+        tally.accumulator.flush()
+        return len(games)
+
+    return run
+
+
+def engine_one_game_at_a_time() -> Callable[[List[GameRecord]], int]:
+    # The whole per-game loop of analyze_glicko2_one_game_at_a_time.py.
+    _configure()
+    from analysis.util import InMemoryStorage, TallyGameAnalytics
+    from analyze_glicko2_one_game_at_a_time import OneGameAtATime
+    from goratings.math.glicko2 import Glicko2Entry
+
+    storage = InMemoryStorage(Glicko2Entry)
+    engine = OneGameAtATime(storage)
+    tally = TallyGameAnalytics(storage)
+
+    def run(games: List[GameRecord]) -> int:
+        for game in games:
+            tally.add_glicko2_analytics(engine.process_game(game))
+        tally.accumulator.flush()
+        return len(games)
+
+    return run
+
+
+CASES: Dict[str, Case] = {
+    "glicko2_update": glicko2_update,
+    "gor_update": gor_update,
+    "compute_con": compute_con,
+    "get_handicap_adjustment": get_handicap_adjustment,
+    "storage_history": storage_history,
+    "tally_add_glicko2_analytics": tally_add_glicko2_analytics,
+    "engine_one_game_at_a_time": engine_one_game_at_a_time,
+}
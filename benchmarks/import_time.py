@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+#
+# Measures how long importing the analysis and rating modules takes, each
+# in a fresh interpreter, and lists the slowest imports, e.g.
+#
+#   python benchmarks/import_time.py
+#   python benchmarks/import_time.py --repeat 20 --module analysis.util --top 20
+#
+
+import argparse
+import os
+import subprocess
+import sys
+from statistics import median
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["goratings.math", "analysis.util"]
+
+_TIMER = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def _env() -> Dict[str, str]:
+    # The analysis scripts run with PYTHONPATH=..:. from the analysis directory.
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([ROOT, os.path.join(ROOT, "analysis")])
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def time_import(module: str, repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _TIMER.format(module=module)], env=_env(), cwd=ROOT, check=True,
+            stdout=subprocess.PIPE, universal_newlines=True,
+        ).stdout
+        times.append(float(out))
+    return times
+
+
+def slowest_imports(module: str, top: int) -> List[Tuple[int, int, str]]:
+    """ (self us, cumulative us, module) of the `top` slowest imports by cumulative time, from -X importtime. """
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import %s" % module], env=_env(), cwd=ROOT, check=True,
+        stderr=subprocess.PIPE, universal_newlines=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    rows.sort(key=lambda row: -row[1])
+    return rows[:top]
+
+
+def main() -> None:
+    cli = argparse.ArgumentParser(description="Import time benchmark")
+    cli.add_argument("--module", dest="modules", action="append", help="Module to import, repeatable")
+    cli.add_argument("--repeat", type=int, default=10, help="Number of fresh interpreters per module")
+    cli.add_argument("--top", type=int, default=10, help="Number of slowest imports to list, 0 for none")
+    args = cli.parse_args()
+
+    for module in args.modules or MODULES:
+        times = time_import(module, args.repeat)
+        print("%-20s  median %7.1f ms   min %7.1f ms" % (module, median(times) * 1000, min(times) * 1000))
+        if args.top:
+            for self_us, cumulative_us, name in slowest_imports(module, args.top):
+                print("    %7.1f ms  %7.1f ms self  %s" % (cumulative_us / 1000, self_us / 1000, name))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+#
+# Writes a synthetic stand-in for data/ogs-data.db, with the same tables and
+# indexes as data/scripts/make_ogs_db.py, so the loaders, engines and tallies
+# can be run and profiled without the production data, e.g.
+#
+#   python -m benchmarks.make_ogs_db --games 12000000 --output data/ogs-data.db
+#   python -m benchmarks.make_ogs_db --games 100000 --players 5000 --bots 3 --output /tmp/ogs-data.db
+#
+
+import argparse
+import os
+import sys
+
+from benchmarks.streams import Population, make_players, synthetic_games
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "data", "scripts"))
+
+from bulk_import import BulkInserter, connect_for_bulk_load  # noqa: E402 isort:skip
+
+defaults = Population()
+
+
+def main() -> None:
+    cli = argparse.ArgumentParser(prog="python -m benchmarks.make_ogs_db", description="Writes a synthetic ogs-data.db")
+    cli.add_argument("--output", default="ogs-data.db", help="Database to write, replaced if it exists")
+    cli.add_argument("--games", type=int, default=1000000, help="Number of games")
+    cli.add_argument("--seed", type=int, default=1, help="Seed of the players and games")
+    cli.add_argument(
+        "--players",
+        type=int,
+        default=0,
+        help="Number of human players, 0 for one per %d games" % defaults.games_per_player,
+    )
+    cli.add_argument(
+        "--activity-skew",
+        type=float,
+        default=defaults.activity_skew,
+        help="1 for players all playing about as often, higher for a few players playing most games",
+    )
+    cli.add_argument("--bots", type=int, default=defaults.num_bots, help="Number of bots")
+    cli.add_argument(
+        "--bot-games", type=float, default=defaults.bot_games, help="Share of the games against a bot",
+    )
+    cli.add_argument("--timeout-rate", type=float, default=defaults.timeout_rate, help="Share of games lost on time")
+    cli.add_argument(
+        "--handicap-rate", type=float, default=defaults.handicap_rate, help="Share of 19x19 games played with handicap",
+    )
+    cli.add_argument(
+        "--games-per-day", type=float, default=defaults.games_per_day, help="Average number of games per day",
+    )
+    args = cli.parse_args()
+
+    population = defaults._replace(
+        num_players=args.players,
+        activity_skew=args.activity_skew,
+        num_bots=args.bots,
+        bot_games=args.bot_games,
+        timeout_rate=args.timeout_rate,
+        handicap_rate=args.handicap_rate,
+        games_per_day=args.games_per_day,
+    )
+
+    if os.path.exists(args.output):
+        os.remove(args.output)
+    conn = connect_for_bulk_load(args.output)
+    conn.execute(
+        """
+        CREATE TABLE game_records
+        (
+            id INTEGER PRIMARY KEY,
+            rules TEXT,
+            size INTEGER,
+            handicap INTEGER,
+            komi REAL,
+            black_id INTEGER,
+            white_id INTEGER,
+            time_per_move INTEGER,
+            timeout INTEGER,
+            winner_id INTEGER,
+            ended INTEGER
+        )
+        """
+    )
+    conn.execute("CREATE TABLE players (id INTEGER PRIMARY KEY, date_joined INTEGER, is_bot BOOLEAN)")
+
+    players = BulkInserter(conn, "INSERT INTO players (id, date_joined, is_bot) VALUES (?, ?, ?)", "players")
+    for player in make_players(args.games, args.seed, population):
+        players.add((player.id, player.date_joined, player.is_bot))
+    players.close()
+
+    games = BulkInserter(
+        conn,
+        """
+        INSERT INTO game_records
+            (id, rules, size, handicap, komi, black_id, white_id, time_per_move, timeout, winner_id, ended)
+        VALUES
+            (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        "games",
+    )
+    for game in synthetic_games(args.games, args.seed, population):
+        games.add(
+            (
+                game.game_id,
+                game.rules,
+                game.size,
+                game.handicap,
+                game.komi,
+                game.black_id,
+                game.white_id,
+                game.time_per_move,
+                game.timeout,
+                game.winner_id,
+                game.ended,
+            )
+        )
+    games.close()
+
+    conn.execute("CREATE INDEX game_ended_idx ON game_records(ended)")
+    conn.execute("CREATE INDEX bots_idx ON players(is_bot)")
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
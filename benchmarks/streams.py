@@ -0,0 +1,170 @@
+import random
+from itertools import accumulate
+from math import exp, log1p
+from typing import Iterator, List, NamedTuple, Sequence, Tuple
+
+from goratings.interfaces import GameRecord
+
+__all__ = ["SCALES", "Population", "SyntheticPlayer", "chunked", "make_players", "synthetic_games"]
+
+
+# Number of games in each benchmark scale.
+SCALES = {"10k": 10000, "1m": 1000000, "10m": 10000000}
+
+# The OGS loader drops games of bots with ids up to this, so synthetic bots
+# are numbered above it.
+_OLD_BOT_IDS = 50000
+
+
+class Population(NamedTuple):
+    """
+    The players of a synthetic game stream and the mix of games they play.
+    The mixes are (value, weight) pairs.
+    """
+
+    # 0 for one player per `games_per_player` games.
+    num_players: int = 0
+    games_per_player: int = 50
+    # Players are drawn as int(num_players * random() ** activity_skew), so 1
+    # is uniform and higher values concentrate the games on the low ids.
+    activity_skew: float = 2.0
+    strength_mean: float = 1500.0
+    strength_deviation: float = 350.0
+    # Standard deviation of how many rating points per log(games played) a player improves.
+    improvement: float = 40.0
+    num_bots: int = 10
+    # Share of the games that have a bot as one of the players.
+    bot_games: float = 0.05
+    timeout_rate: float = 0.02
+    # Humans time out against bots more often.
+    bot_timeout_rate: float = 0.1
+    # Share of the 19x19 games played with handicap, given to the weaker player.
+    handicap_rate: float = 0.15
+    handicap_stone_value: float = 100.0
+    sizes: Sequence[Tuple[int, float]] = ((9, 0.2), (13, 0.1), (19, 0.7))
+    rules: Sequence[Tuple[str, float]] = (("japanese", 0.5), ("chinese", 0.3), ("aga", 0.1), ("korean", 0.1))
+    # Seconds per move: blitz, live and correspondence.
+    time_per_move: Sequence[Tuple[int, float]] = (
+        (5, 0.1), (10, 0.2), (20, 0.2), (30, 0.15), (60, 0.1), (86400, 0.2), (0, 0.05)
+    )
+    games_per_day: float = 1440.0
+    start: float = 1500000000.0
+
+
+class SyntheticPlayer(NamedTuple):
+    id: int
+    strength: float
+    improvement: float
+    is_bot: bool
+    date_joined: float
+
+
+def make_players(num_games: int, seed: int = 1, population: Population = Population()) -> List[SyntheticPlayer]:
+    """ The players `synthetic_games` uses for the same arguments, humans first and then bots. """
+    rng = random.Random(seed)
+    num_players = population.num_players or max(100, num_games // population.games_per_player)
+    players = [
+        SyntheticPlayer(
+            id,
+            rng.gauss(population.strength_mean, population.strength_deviation),
+            abs(rng.gauss(0, population.improvement)),
+            False,
+            population.start - rng.expovariate(1 / (365 * 86400)),
+        )
+        for id in range(1, num_players + 1)
+    ]
+    first_bot_id = max(num_players, _OLD_BOT_IDS) + 1
+    players.extend(
+        SyntheticPlayer(
+            first_bot_id + i,
+            rng.uniform(population.strength_mean - 700, population.strength_mean + 900),
+            0.0,
+            True,
+            population.start - 365 * 86400,
+        )
+        for i in range(population.num_bots)
+    )
+    return players
+
+
+def synthetic_games(num_games: int, seed: int = 1, population: Population = Population()) -> Iterator[GameRecord]:
+    """
+    A reproducible stream of `num_games` games, in `ended` order, between the
+    players of `make_players`.  Who wins is drawn from the players' latent
+    strengths, which grow with the number of games they have played.
+    """
+    players = make_players(num_games, seed, population)
+    humans = [player for player in players if not player.is_bot]
+    bots = [player for player in players if player.is_bot]
+    games_played = [0] * len(players)
+
+    rng = random.Random(seed * 2 + 1)
+    skew = population.activity_skew
+    sizes, size_weights = _cumulative(population.sizes)
+    rules_mix, rules_weights = _cumulative(population.rules)
+    speeds, speed_weights = _cumulative(population.time_per_move)
+    mean_gap = 86400 / population.games_per_day
+    ended = population.start
+
+    for game_id in range(1, num_games + 1):
+        black = int(len(humans) * rng.random() ** skew)
+        if bots and rng.random() < population.bot_games:
+            white = len(humans) + rng.randrange(len(bots))
+        else:
+            white = int(len(humans) * rng.random() ** skew)
+            if white == black:
+                white = (white + 1) % len(humans)
+        if rng.random() < 0.5:
+            black, white = white, black
+
+        strength = [players[i].strength + players[i].improvement * log1p(games_played[i]) for i in (black, white)]
+        games_played[black] += 1
+        games_played[white] += 1
+
+        size = rng.choices(sizes, cum_weights=size_weights)[0]
+        handicap = 0
+        if size == 19 and rng.random() < population.handicap_rate:
+            handicap = min(9, int(abs(strength[0] - strength[1]) / population.handicap_stone_value))
+            if strength[0] > strength[1]:
+                black, white = white, black
+                strength.reverse()
+        rules = rng.choices(rules_mix, cum_weights=rules_weights)[0]
+        if handicap:
+            komi = 0.5
+        else:
+            komi = 6.5 if rules in ("japanese", "korean") else 7.5
+
+        diff = strength[0] + handicap * population.handicap_stone_value - strength[1]
+        black_wins = rng.random() < 1 / (1 + exp(-diff / 250))
+        with_bot = players[black].is_bot or players[white].is_bot
+        timeout = rng.random() < (population.bot_timeout_rate if with_bot else population.timeout_rate)
+        ended += rng.expovariate(1 / mean_gap)
+
+        yield GameRecord(
+            game_id,
+            size,
+            handicap,
+            komi,
+            players[black].id,
+            players[white].id,
+            rng.choices(speeds, cum_weights=speed_weights)[0],
+            timeout,
+            players[black].id if black_wins else players[white].id,
+            int(ended),
+            rules,
+        )
+
+
+def _cumulative(mix: Sequence[Tuple]) -> Tuple[List, List[float]]:
+    return [value for value, _ in mix], list(accumulate(weight for _, weight in mix))
+
+
+def chunked(games: Iterator[GameRecord], size: int = 10000) -> Iterator[List[GameRecord]]:
+    chunk: List[GameRecord] = []
+    for game in games:
+        chunk.append(game)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
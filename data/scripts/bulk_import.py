@@ -0,0 +1,105 @@
+"""
+Helpers shared by the make_*_db.py scripts for loading large dumps into a
+fresh sqlite database quickly.
+"""
+
+import sqlite3
+import sys
+from datetime import datetime
+from functools import lru_cache
+from time import time
+from typing import Any, List, Sequence
+
+from dateutil import parser
+
+__all__ = ["BulkInserter", "connect_for_bulk_load", "parse_date", "parse_timestamp"]
+
+
+def connect_for_bulk_load(filename: str) -> sqlite3.Connection:
+    """
+    Opens `filename` with journaling and syncing turned off.  The scripts
+    rebuild their database from scratch, so an interrupted import is simply
+    rerun rather than rolled back.
+    """
+    conn = sqlite3.connect(filename)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -262144")  # 256MB, for building the indexes
+    return conn
+
+
+class BulkInserter:
+    """
+    Inserts rows with `executemany` in batches of `batch_size`, all in one
+    transaction, and reports progress in rows per second.  Call `close` at
+    the end to insert the last batch and print the totals.
+    """
+
+    conn: sqlite3.Connection
+    sql: str
+    label: str
+    batch_size: int
+    rows: int
+    _batch: List[Sequence[Any]]
+    _started: float
+    _last_report: float
+
+    def __init__(self, conn: sqlite3.Connection, sql: str, label: str = "rows", batch_size: int = 50000) -> None:
+        self.conn = conn
+        self.sql = sql
+        self.label = label
+        self.batch_size = batch_size
+        self.rows = 0
+        self._batch = []
+        self._started = time()
+        self._last_report = 0.0
+
+    def add(self, row: Sequence[Any]) -> None:
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._batch:
+            self.conn.executemany(self.sql, self._batch)
+            self.rows += len(self._batch)
+            self._batch = []
+        now = time()
+        if now - self._last_report > 0.5:
+            self._last_report = now
+            self._report("\r")
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.commit()
+        self._report("\n")
+
+    def _report(self, end: str) -> None:
+        elapsed = max(time() - self._started, 1e-9)
+        sys.stdout.write(
+            "%12d %s imported in %.1fs, %.0f %s/s%s" % (self.rows, self.label, elapsed, self.rows / elapsed, self.label, end)
+        )
+        sys.stdout.flush()
+
+
+def parse_timestamp(text: str) -> float:
+    """
+    Same result as `dateutil.parser.parse(text).timestamp()`, with a fast
+    path for the ISO formats found in the dumps ("2020-07-12",
+    "2020-07-12 13:45:00.123456+00").  Dates without a timezone are local
+    time, as with dateutil.
+    """
+    try:
+        if len(text) == 10:
+            return datetime(int(text[0:4]), int(text[5:7]), int(text[8:10])).timestamp()
+        if len(text) > 19 and text[-3] in "+-":
+            # Postgres writes "+00" offsets, fromisoformat wants "+00:00".
+            text = text + ":00"
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return parser.parse(text).timestamp()
+
+
+# Tournament dumps have a handful of distinct dates over many games.
+parse_date = lru_cache(maxsize=None)(parse_timestamp)
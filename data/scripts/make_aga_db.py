@@ -3,11 +3,11 @@
 import csv
 import gzip
 import json
-import sqlite3
 import sys
 from collections import defaultdict
 from math import isnan
-from dateutil import parser
+
+from bulk_import import BulkInserter, connect_for_bulk_load, parse_date
 
 AGA_OFFSET = 2000000000
 
@@ -83,7 +83,7 @@ FROM `tournaments`;
 """
 
 
-conn = sqlite3.connect("aga-data.db")
+conn = connect_for_bulk_load("aga-data.db")
 c = conn.cursor()
 c.execute("DROP TABLE IF EXISTS game_records")
 c.execute(
@@ -125,20 +125,38 @@ last_manual_rank = {}
 game_id = AGA_OFFSET
 
 print('')
-ct = 0
+games = BulkInserter(
+    conn,
+    """
+    INSERT INTO game_records
+        (
+            id,
+            black_id,
+            white_id,
+            handicap,
+            winner_id,
+            ended
+        )
+    VALUES
+        (
+            ?,
+            ?,
+            ?,
+            ?,
+            ?,
+            ?
+        )
+    """,
+    "games",
+)
 
 for row in rows:
-    ct += 1
-    if ct % 1000 == 0:
-        sys.stdout.write("%d\r" % ct)
-        sys.stdout.flush()
-
     exclude = int(row[14])
     if exclude:
         continue
 
     game_id += 1 # we use our own id's so by id they are ordered by date, round, game id
-    ended = parser.parse(row[2]).timestamp()
+    ended = parse_date(row[2])
     p1_id = int(row[4]) + AGA_OFFSET
     p1_color = row[5]
     p2_id = int(row[7]) + AGA_OFFSET
@@ -166,27 +184,7 @@ for row in rows:
     winner_id = p1_id if winner == 1 else p2_id
 
 
-    c.execute(
-        """
-        INSERT INTO game_records
-            (
-                id,
-                black_id,
-                white_id,
-                handicap,
-                winner_id,
-                ended
-            )
-        VALUES
-            (
-                ?,
-                ?,
-                ?,
-                ?,
-                ?,
-                ?
-            )
-    """,
+    games.add(
         (
             game_id,
             black_id,
@@ -194,8 +192,9 @@ for row in rows:
             handicap,
             winner_id,
             ended,
-        ),
+        )
     )
+games.close()
 
 c.execute(
     """
@@ -209,6 +208,12 @@ c.execute(
     """
 )
 
+c.execute(
+    """
+    CREATE INDEX game_ended_idx ON game_records (ended);
+    """
+)
+
 conn.commit()
 c.close()
 conn.execute("VACUUM")
@@ -3,11 +3,11 @@
 import csv
 import gzip
 import json
-import sqlite3
 import sys
 from collections import defaultdict
 from math import isnan
-from dateutil import parser
+
+from bulk_import import BulkInserter, connect_for_bulk_load, parse_date
 
 EGF_OFFSET = 1000000000
 
@@ -47,7 +47,7 @@ FROM
 """
 
 
-conn = sqlite3.connect("egf-data.db")
+conn = connect_for_bulk_load("egf-data.db")
 c = conn.cursor()
 c.execute("DROP TABLE IF EXISTS game_records")
 c.execute(
@@ -97,16 +97,38 @@ last_manual_rank = {}
 game_id = EGF_OFFSET
 
 print('')
-ct = 0
+games = BulkInserter(
+    conn,
+    """
+    INSERT INTO game_records
+        (
+            id,
+            black_id,
+            white_id,
+            handicap,
+            winner_id,
+            ended,
+            black_manual_rank_update,
+            white_manual_rank_update
+        )
+    VALUES
+        (
+            ?,
+            ?,
+            ?,
+            ?,
+            ?,
+            ?,
+            ?,
+            ?
+        )
+    """,
+    "games",
+)
 
 for row in rows:
-    ct += 1
-    if ct % 1000 == 0:
-        sys.stdout.write("%d\r" % ct)
-        sys.stdout.flush()
-
     game_id += 1
-    ended = parser.parse(row[1]).timestamp()
+    ended = parse_date(row[1])
     p1_id = int(row[3]) + EGF_OFFSET
     p1_color = row[4]
     p2_id = int(row[5]) + EGF_OFFSET
@@ -167,31 +189,7 @@ for row in rows:
     winner_id = p1_id if winner == 1 else p2_id
 
 
-    c.execute(
-        """
-        INSERT INTO game_records
-            (
-                id,
-                black_id,
-                white_id,
-                handicap,
-                winner_id,
-                ended,
-                black_manual_rank_update,
-                white_manual_rank_update
-            )
-        VALUES
-            (
-                ?,
-                ?,
-                ?,
-                ?,
-                ?,
-                ?,
-                ?,
-                ?
-            )
-    """,
+    games.add(
         (
             game_id,
             black_id,
@@ -201,8 +199,9 @@ for row in rows:
             ended,
             black_manual_rank,
             white_manual_rank
-        ),
+        )
     )
+games.close()
 
 c.execute(
     """
@@ -216,6 +215,12 @@ c.execute(
     """
 )
 
+c.execute(
+    """
+    CREATE INDEX game_ended_idx ON game_records (ended);
+    """
+)
+
 conn.commit()
 c.close()
 conn.execute("VACUUM")
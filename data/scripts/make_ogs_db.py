@@ -3,10 +3,9 @@
 import csv
 import gzip
 import json
-import sqlite3
-import sys
+from functools import lru_cache
 
-from dateutil import parser
+from bulk_import import BulkInserter, connect_for_bulk_load, parse_timestamp
 
 """
 Imports .csv files generated from our production database with the following
@@ -51,7 +50,7 @@ COPY (SELECT
 """
 
 
-conn = sqlite3.connect("ogs-data.db")
+conn = connect_for_bulk_load("ogs-data.db")
 c = conn.cursor()
 c.execute("DROP TABLE IF EXISTS game_records")
 c.execute("DROP TABLE IF EXISTS players")
@@ -90,11 +89,20 @@ def computeAverageMoveTime(time_control, old_time_per_move):
     if not time_control:
         return old_time_per_move or 0
 
-    if time_control:
-        try:
-            time_control = json.loads(time_control)
-        except:
-            return old_time_per_move or 0
+    average_move_time = parseAverageMoveTime(time_control)
+    if average_move_time is None:
+        return old_time_per_move or 0
+    return average_move_time
+
+
+# There are only a few thousand distinct time control strings, so each is
+# parsed once.
+@lru_cache(maxsize=None)
+def parseAverageMoveTime(time_control):
+    try:
+        time_control = json.loads(time_control)
+    except:
+        return None
 
     system = (
         time_control["system"]
@@ -124,50 +132,65 @@ def computeAverageMoveTime(time_control, old_time_per_move):
 ##
 ## Import players
 ##
-ct = 0
+players = BulkInserter(
+    conn,
+    """
+    INSERT INTO players
+        (
+            id,
+            date_joined,
+            is_bot
+        )
+    VALUES
+        (
+            ?,
+            ?,
+            ?
+        )
+    """,
+    "players",
+)
 with gzip.open("players.csv.gz", "rt") as players_f:
     players_csv = csv.reader(players_f, delimiter=";")
     for row in players_csv:
-        ct += 1
-        if ct % 100 == 0:
-            sys.stdout.write("%d\r" % ct)
-            sys.stdout.flush()
-
-        c.execute(
-            """
-            INSERT INTO players
-                (
-                    id,
-                    date_joined,
-                    is_bot
-                )
-            VALUES
-                (
-                    ?,
-                    ?,
-                    ?
-                )
-        """,
+        players.add(
             (
                 int(row[0]),
-                parser.parse(row[2]).timestamp(),
+                parse_timestamp(row[2]),
                 row[4] == "t",
-            ),
+            )
         )
+players.close()
 
 ##
 ## Import games
 ##
 
-ct = 0
+games = BulkInserter(
+    conn,
+    """
+    INSERT INTO game_records
+        (
+            id,
+            rules,
+            size,
+            handicap,
+            komi,
+            black_id,
+            white_id,
+            time_per_move,
+            timeout,
+            winner_id,
+            ended
+        )
+    VALUES
+        ( ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+    "games",
+)
 with gzip.open("games.csv.gz", "rt") as games_f:
     games_csv = csv.reader(games_f, delimiter=";")
     for row in games_csv:
-        ct += 1
-        if ct % 100 == 0:
-            sys.stdout.write("%d\r" % ct)
-            sys.stdout.flush()
-
         id = int(row[0])
         ladder_id = int(row[1]) if row[1] else 0
         tournament_id = int(row[2]) if row[2] else 0
@@ -182,8 +205,7 @@ with gzip.open("games.csv.gz", "rt") as games_f:
         rules = row[11]
         black_lost = row[12] == "t"
         white_lost = row[13] == "t"
-        started = parser.parse(row[14]).timestamp()
-        ended = parser.parse(row[15]).timestamp()
+        ended = parse_timestamp(row[15])
 
         timeout = "timeout" in outcome.lower()
         winner_id = 0
@@ -192,25 +214,7 @@ with gzip.open("games.csv.gz", "rt") as games_f:
         if white_lost and not black_lost:
             winner_id = black_id
 
-        c.execute(
-            """
-            INSERT INTO game_records
-                (
-                    id,
-                    rules,
-                    size,
-                    handicap,
-                    komi,
-                    black_id,
-                    white_id,
-                    time_per_move,
-                    timeout,
-                    winner_id,
-                    ended
-                )
-            VALUES
-                ( ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
+        games.add(
             (
                 id,
                 rules,
@@ -228,12 +232,13 @@ with gzip.open("games.csv.gz", "rt") as games_f:
                 # outcome,
                 # started,
                 ended,
-            ),
+            )
         )
+games.close()
 
 
-
-
+# Indexes are built after the load, which is much faster than keeping them
+# up to date row by row.
 c.execute(
     """
     CREATE INDEX IF NOT EXISTS game_ended_idx ON game_records(ended)
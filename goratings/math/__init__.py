@@ -1,11 +1,17 @@
-from .glicko2 import Glicko2Entry, glicko2_configure, glicko2_update
-from .gor import GorEntry, gor_configure, gor_update
+from .glicko2 import Glicko2Config, Glicko2Entry, glicko2_config, glicko2_configure, glicko2_update
+from .glicko2_periods import Glicko2PeriodEntry, glicko2_period_update
+from .gor import GorConfig, GorEntry, gor_configure, gor_update
 
 __all__ = [
+    "GorConfig",
     "GorEntry",
     "gor_configure",
     "gor_update",
+    "Glicko2Config",
     "Glicko2Entry",
+    "glicko2_config",
     "glicko2_configure",
     "glicko2_update",
+    "Glicko2PeriodEntry",
+    "glicko2_period_update",
 ]
@@ -1,7 +1,15 @@
 from math import exp, log, pi, sqrt
-from typing import List, Tuple
+from typing import List, NamedTuple, Tuple
 
-__all__ = ["Glicko2Entry", "glicko2_update", "glicko2_configure"]
+__all__ = [
+    "Glicko2Config",
+    "Glicko2Entry",
+    "glicko2_update",
+    "glicko2_update_one",
+    "glicko2_config",
+    "glicko2_configure",
+    "glicko2_volatility",
+]
 
 
 EPSILON = 0.000001
@@ -19,6 +27,27 @@ MAX_RATING = 6000.0
 PROVISIONAL_RATING_CUTOFF = 160.0
 GLICKO2_SCALE = 173.7178
 AGING_PERIOD_SECONDS = None
+VOLATILITY_SOLVERS = ("illinois", "newton")
+VOLATILITY_SOLVER = "illinois"
+NEWTON_MAX_ITERATIONS = 32
+
+
+class Glicko2Config(NamedTuple):
+    """
+    The tunable glicko2 parameters.  Functions and methods that take an
+    optional `config` use the module wide configuration, set with
+    `glicko2_configure`, when none is given.  Passing configs explicitly lets
+    several configurations run side by side in one process.
+    """
+
+    tao: float = 0.5
+    min_rd: float = 30.0
+    max_rd: float = 500.0
+    aging_period_seconds: int | None = None
+    volatility_solver: str = "illinois"
+
+
+CONFIG = Glicko2Config(TAO, MIN_RD, MAX_RD, AGING_PERIOD_SECONDS, VOLATILITY_SOLVER)
 
 
 class Glicko2Entry:
@@ -50,33 +79,42 @@ class Glicko2Entry:
         ret = Glicko2Entry(self.rating + rating_adjustment, self.deviation + rd_adjustment, self.volatility, self.timestamp,)
         return ret
 
-    def expand_deviation_because_no_games_played(self, n_periods: int = 1) -> "Glicko2Entry":
-        return self.expand_deviation(age=n_periods, override_aging_period=1)
+    def expand_deviation_because_no_games_played(
+        self, n_periods: int = 1, config: Glicko2Config | None = None
+    ) -> "Glicko2Entry":
+        return self.expand_deviation(age=n_periods, override_aging_period=1, config=config)
 
-    def after_aging_to_timestamp(self, timestamp: int | None, minus_one_period: bool = False) -> "Glicko2Entry":
-        global AGING_PERIOD_SECONDS
+    def after_aging_to_timestamp(
+        self, timestamp: int | None, minus_one_period: bool = False, config: Glicko2Config | None = None
+    ) -> "Glicko2Entry":
+        if config is None:
+            config = CONFIG
+        aging_period = config.aging_period_seconds
 
         # Create copy with the new timestamp and expand the deviation if the
         # timestamp is moving forward.
-        if timestamp and AGING_PERIOD_SECONDS and minus_one_period:
-            timestamp = max(self.timestamp if self.timestamp else 0, timestamp - AGING_PERIOD_SECONDS)
+        if timestamp and aging_period and minus_one_period:
+            timestamp = max(self.timestamp if self.timestamp else 0, timestamp - aging_period)
         copy = self.copy()
         copy.timestamp = timestamp
 
         if copy.timestamp and self.timestamp and copy.timestamp > self.timestamp:
-            copy.expand_deviation(age=copy.timestamp - self.timestamp)
+            copy.expand_deviation(age=copy.timestamp - self.timestamp, config=config)
         return copy
 
-    def expand_deviation(self, age: int, override_aging_period: int | None = None) -> "Glicko2Entry":
+    def expand_deviation(
+        self, age: int, override_aging_period: int | None = None, config: Glicko2Config | None = None
+    ) -> "Glicko2Entry":
         # Implementation as defined by [glicko2], but converted to closed form,
         # allowing deviation to expand continuously over fractional periods.
         #
         # [glicko2]: http://www.glicko.net/glicko/glicko2.pdf (note after step 8)
-        global MAX_RD
-        global MIN_RD
+        if config is None:
+            config = CONFIG
 
-        phi_prime = _age_phi(self.phi, self.volatility, age, override_aging_period)
-        self.deviation = min(MAX_RD, max(MIN_RD, GLICKO2_SCALE * phi_prime))
+        aging_period = config.aging_period_seconds if override_aging_period is None else override_aging_period
+        phi_prime = _age_phi(self.phi, self.volatility, age, aging_period)
+        self.deviation = min(config.max_rd, max(config.min_rd, GLICKO2_SCALE * phi_prime))
         self.phi = self.deviation / GLICKO2_SCALE
 
         return self
@@ -94,17 +132,14 @@ class Glicko2Entry:
         return E
 
 
-def _age_phi(phi: float, volatility: float, age: int | None, override_aging_period: int | None = None) -> float:
+def _age_phi(phi: float, volatility: float, age: int | None, aging_period: int | None) -> float:
     # Implementation as defined by [glicko2], but converted to closed form,
     # allowing deviation to expand continuously over fractional periods.
     #
     # [glicko2]: http://www.glicko.net/glicko/glicko2.pdf (note after step 8)
-    global AGING_PERIOD_SECONDS
-
     aging_factor = 1
     if age is not None:
         assert age >= 0
-        aging_period = AGING_PERIOD_SECONDS if override_aging_period is None else override_aging_period
         if aging_period:
             assert aging_period >= 0
             aging_factor = float(age) / aging_period
@@ -113,14 +148,17 @@ def _age_phi(phi: float, volatility: float, age: int | None, override_aging_peri
 
 
 def glicko2_update(player: Glicko2Entry, matches: List[Tuple[Glicko2Entry, int]],
-                   timestamp: int | None = None) -> Glicko2Entry:
+                   timestamp: int | None = None, config: Glicko2Config | None = None) -> Glicko2Entry:
     # Implementation as defined by: http://www.glicko.net/glicko/glicko2.pdf
+    if config is None:
+        config = CONFIG
+
     if len(matches) == 0:
-        return player.after_aging_to_timestamp(timestamp)
+        return player.after_aging_to_timestamp(timestamp, config=config)
 
     # Expand the deviation due to inactivity, in case the last game was more
     # than a period ago.
-    player = player.after_aging_to_timestamp(timestamp, minus_one_period=True);
+    player = player.after_aging_to_timestamp(timestamp, minus_one_period=True, config=config);
 
     # step 1/2 implicitly done during Glicko2Entry construction
 
@@ -128,7 +166,7 @@ def glicko2_update(player: Glicko2Entry, matches: List[Tuple[Glicko2Entry, int]]
     v_sum = 0.0
     delta_sum = 0.0
     for m in matches:
-        p = m[0].after_aging_to_timestamp(timestamp, minus_one_period=True)
+        p = m[0].after_aging_to_timestamp(timestamp, minus_one_period=True, config=config)
         outcome = m[1]
         g_phi_j = 1 / sqrt(1 + (3 * p.phi ** 2) / (pi ** 2))
         E = 1 / (1 + exp(-g_phi_j * (player.mu - p.mu)))
@@ -139,24 +177,116 @@ def glicko2_update(player: Glicko2Entry, matches: List[Tuple[Glicko2Entry, int]]
     delta = v * delta_sum
 
     # step 5
-    a = log(player.volatility ** 2)
+    new_volatility, _ = glicko2_volatility(player.phi, player.volatility, v, delta, config=config)
+
+    # step 6
+    phi_star = sqrt(player.phi ** 2 + new_volatility ** 2)
+
+    # step 7
+    phi_prime = 1 / sqrt(1 / phi_star ** 2 + 1 / v)
+    mu_prime = player.mu + (phi_prime ** 2) * delta_sum
+
+    # step 8
+    ret = Glicko2Entry(
+        rating=min(MAX_RATING, max(MIN_RATING, GLICKO2_SCALE * mu_prime + 1500)),
+        deviation=min(config.max_rd, max(config.min_rd, GLICKO2_SCALE * phi_prime)),
+        volatility=min(0.15, max(0.01, new_volatility)),
+        timestamp=timestamp,
+    )
+    return ret
+
+
+def glicko2_update_one(
+    rating: float,
+    deviation: float,
+    volatility: float,
+    opponent_rating: float,
+    opponent_deviation: float,
+    outcome: float,
+    config: Glicko2Config | None = None,
+) -> Tuple[float, float, float]:
+    """
+    `glicko2_update` for a single untimestamped match, taking and returning
+    plain (rating, deviation, volatility) values instead of entries, for
+    engines that keep ratings in arrays.  Gives the same results as
+    `glicko2_update(Glicko2Entry(rating, deviation, volatility),
+    [(Glicko2Entry(opponent_rating, opponent_deviation), outcome)])`.
+    """
+    if config is None:
+        config = CONFIG
+
+    mu = (rating - 1500) / GLICKO2_SCALE
+    phi = deviation / GLICKO2_SCALE
+    opponent_mu = (opponent_rating - 1500) / GLICKO2_SCALE
+    opponent_phi = opponent_deviation / GLICKO2_SCALE
+
+    g_phi_j = 1 / sqrt(1 + (3 * opponent_phi ** 2) / (pi ** 2))
+    E = 1 / (1 + exp(-g_phi_j * (mu - opponent_mu)))
+    v_sum = g_phi_j ** 2 * E * (1 - E)
+    delta_sum = g_phi_j * (outcome - E)
+
+    v = 1.0 / v_sum if v_sum else 9999
+    delta = v * delta_sum
+    new_volatility, _ = glicko2_volatility(phi, volatility, v, delta, config=config)
+    phi_star = sqrt(phi ** 2 + new_volatility ** 2)
+    phi_prime = 1 / sqrt(1 / phi_star ** 2 + 1 / v)
+    mu_prime = mu + (phi_prime ** 2) * delta_sum
+
+    return (
+        min(MAX_RATING, max(MIN_RATING, GLICKO2_SCALE * mu_prime + 1500)),
+        min(config.max_rd, max(config.min_rd, GLICKO2_SCALE * phi_prime)),
+        min(0.15, max(0.01, new_volatility)),
+    )
+
+
+def glicko2_volatility(
+    phi: float,
+    volatility: float,
+    v: float,
+    delta: float,
+    solver: str | None = None,
+    config: Glicko2Config | None = None,
+) -> Tuple[float, int]:
+    """
+    Step 5 of [glicko2], computing the new volatility.  Returns the new
+    volatility along with the number of evaluations of f(x) that the solver
+    needed, so solvers can be compared.  `solver` overrides the config's
+    volatility solver.
+
+    [glicko2]: http://www.glicko.net/glicko/glicko2.pdf
+    """
+    if config is None:
+        config = CONFIG
+    if solver is None:
+        solver = config.volatility_solver
+    if solver == "illinois":
+        return _volatility_illinois(phi, volatility, v, delta, config.tao)
+    if solver == "newton":
+        return _volatility_newton(phi, volatility, v, delta, config.tao)
+    raise ValueError("unknown volatility solver %r" % solver)
+
+
+def _volatility_illinois(phi: float, volatility: float, v: float, delta: float, tao: float) -> Tuple[float, int]:
+    # Illinois regula falsi, as given in the paper.
+    a = log(volatility ** 2)
+    evaluations = 0
 
     def f(x: float) -> float:
+        nonlocal evaluations
+        evaluations += 1
         ex = exp(x)
-        return (ex * (delta ** 2 - player.phi ** 2 - v - ex) / (2 * ((player.phi ** 2 + v + ex) ** 2))) - (
-            (x - a) / (TAO ** 2)
-        )
+        return (ex * (delta ** 2 - phi ** 2 - v - ex) / (2 * ((phi ** 2 + v + ex) ** 2))) - ((x - a) / (tao ** 2))
 
     A = a
-    if delta ** 2 > player.phi ** 2 + v:
-        B = log(delta ** 2 - player.phi ** 2 - v)
+    if delta ** 2 > phi ** 2 + v:
+        B = log(delta ** 2 - phi ** 2 - v)
     else:
         k = 1
         safety = 100
-        while f(a - k * TAO) < 0 and safety > 0:  # pragma: no cover
+        while f(a - k * tao) < 0 and safety > 0:  # pragma: no cover
             safety -= 1
             k += 1
-        B = a - k * TAO
+        B = a - k * tao
 
     fA = f(A)
     fB = f(B)
@@ -175,32 +305,121 @@ def glicko2_update(player: Glicko2Entry, matches: List[Tuple[Glicko2Entry, int]]
 
         safety -= 1
 
-    new_volatility = exp(A / 2)
+    return exp(A / 2), evaluations
 
-    # step 6
-    phi_star = sqrt(player.phi ** 2 + new_volatility ** 2)
 
-    # step 7
-    phi_prime = 1 / sqrt(1 / phi_star ** 2 + 1 / v)
-    mu_prime = player.mu + (phi_prime ** 2) * delta_sum
+def _volatility_newton(phi: float, volatility: float, v: float, delta: float, tao: float) -> Tuple[float, int]:
+    # Newton's method on the same f(x), safeguarded by bisection so it can
+    # never leave the bracket, and so never takes more than
+    # NEWTON_MAX_ITERATIONS evaluations of f(x) and f'(x).
+    #
+    # With u = e^x, D = phi^2 + v and K = delta^2 - D:
+    #
+    #   f(x)  = u(K - u) / 2(D + u)^2 - (x - a) / tao^2
+    #   f'(x) = u(K(D - u) - 2uD) / 2(D + u)^3 - 1 / tao^2
+    #
+    # The bracket is known in closed form.  f(a) has the sign of K - sigma^2.
+    # If K > 0, f(ln K) has the opposite sign.  Otherwise the first term of f
+    # is bounded by sigma^2 / 2(D + sigma^2) for all x < a, which bounds how
+    # far below a the root can be.
+    a = log(volatility ** 2)
+    D = phi ** 2 + v
+    K = delta ** 2 - D
+    tao2 = tao ** 2
+    inv_tao2 = 1 / tao2
+
+    def f_df(x: float) -> Tuple[float, float]:
+        u = exp(x)
+        s = D + u
+        inv_2s2 = 1 / (2 * s * s)
+        f = u * (K - u) * inv_2s2 - (x - a) * inv_tao2
+        df = u * (K * (D - u) - 2 * u * D) * inv_2s2 / s - inv_tao2
+        return f, df
+
+    if K > 0:
+        other = log(K)
+    else:
+        sigma2 = volatility ** 2
+        other = a - tao2 * sigma2 / (2 * (D + sigma2))
+
+    x = a
+    fx, dfx = f_df(x)
+    evaluations = 1
+    if fx == 0:
+        return exp(x / 2), evaluations
+
+    # Keep the bracket as [lo, hi] with f(lo) > 0 > f(hi); f is decreasing
+    # across the root.
+    if fx > 0:
+        lo, hi = x, max(x, other)
+    else:
+        lo, hi = min(x, other), x
 
-    # step 8
-    ret = Glicko2Entry(
-        rating=min(MAX_RATING, max(MIN_RATING, GLICKO2_SCALE * mu_prime + 1500)),
-        deviation=min(MAX_RD, max(MIN_RD, GLICKO2_SCALE * phi_prime)),
-        volatility=min(0.15, max(0.01, new_volatility)),
-        timestamp=timestamp,
+    while evaluations < NEWTON_MAX_ITERATIONS:
+        if dfx < 0:
+            x_new = x - fx / dfx
+            if not (min(lo, hi) <= x_new <= max(lo, hi)):
+                x_new = (lo + hi) / 2
+        else:
+            x_new = (lo + hi) / 2
+
+        if abs(x_new - x) <= EPSILON:
+            x = x_new
+            break
+
+        x = x_new
+        fx, dfx = f_df(x)
+        evaluations += 1
+        if fx == 0:
+            break
+        if fx > 0:
+            lo = x
+        else:
+            hi = x
+
+    return exp(x / 2), evaluations
+
+
+def glicko2_config(
+    tao: float,
+    min_rd: float,
+    max_rd: float,
+    aging_period_days: float | None = None,
+    volatility_solver: str = "illinois",
+) -> Glicko2Config:
+    assert volatility_solver in VOLATILITY_SOLVERS
+
+    return Glicko2Config(
+        tao=tao,
+        min_rd=min_rd,
+        max_rd=max_rd,
+        aging_period_seconds=int(aging_period_days * 24 * 60 * 60) if aging_period_days else None,
+        volatility_solver=volatility_solver,
     )
-    return ret
 
 
-def glicko2_configure(tao: float, min_rd: float, max_rd: float, aging_period_days: float) -> None:
+def glicko2_configure(
+    tao: float,
+    min_rd: float,
+    max_rd: float,
+    aging_period_days: float | None = None,
+    volatility_solver: str = "illinois",
+) -> Glicko2Config:
+    """ Sets the module wide configuration used when no config is passed, and returns it. """
+    global CONFIG
     global TAO
     global MIN_RD
     global MAX_RD
     global AGING_PERIOD_SECONDS
+    global VOLATILITY_SOLVER
+
+    CONFIG = glicko2_config(tao, min_rd, max_rd, aging_period_days, volatility_solver)
+
+    # Kept in step with CONFIG for code that reads the individual settings.
+    TAO = CONFIG.tao
+    MIN_RD = CONFIG.min_rd
+    MAX_RD = CONFIG.max_rd
+    AGING_PERIOD_SECONDS = CONFIG.aging_period_seconds
+    VOLATILITY_SOLVER = CONFIG.volatility_solver
 
-    TAO = tao
-    MIN_RD = min_rd
-    MAX_RD = max_rd
-    AGING_PERIOD_SECONDS = int(aging_period_days * 24 * 60 * 60) if aging_period_days else None
+    return CONFIG
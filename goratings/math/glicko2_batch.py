@@ -0,0 +1,196 @@
+from math import pi
+from typing import Optional, Tuple
+
+import numpy as np
+
+from . import glicko2
+from .glicko2 import Glicko2Config
+
+__all__ = ["glicko2_update_batch"]
+
+
+def glicko2_update_batch(
+    mu: np.ndarray,
+    phi: np.ndarray,
+    sigma: np.ndarray,
+    timestamps: np.ndarray,
+    match_offsets: np.ndarray,
+    match_opponents: np.ndarray,
+    match_outcomes: np.ndarray,
+    timestamp: Optional[int] = None,
+    match_rating_adjustments: Optional[np.ndarray] = None,
+    config: Optional[Glicko2Config] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized equivalent of calling `glicko2_update` once for every player in
+    a rating period.
+
+    Players are given as parallel arrays (`timestamps` of 0 means no
+    timestamp).  The matches of player `i` are stored CSR style in
+    `match_opponents[match_offsets[i]:match_offsets[i + 1]]`, as indexes into
+    the player arrays, along with the score of player `i` in
+    `match_outcomes`.  `match_rating_adjustments`, if given, is added to the
+    opponent's rating for that match, like `Glicko2Entry.copy(adjustment)`.
+    `config` defaults to the module wide glicko2 configuration; the volatility
+    is always found with the Illinois solver.
+
+    Returns the new `(mu, phi, sigma, timestamps)` arrays.
+    """
+    if config is None:
+        config = glicko2.CONFIG
+
+    mu = np.asarray(mu, dtype=np.float64)
+    phi = np.asarray(phi, dtype=np.float64)
+    sigma = np.asarray(sigma, dtype=np.float64)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    match_offsets = np.asarray(match_offsets, dtype=np.int64)
+    match_opponents = np.asarray(match_opponents, dtype=np.int64)
+    match_outcomes = np.asarray(match_outcomes, dtype=np.float64)
+
+    n = len(mu)
+    assert len(phi) == n and len(sigma) == n and len(timestamps) == n
+    assert len(match_offsets) == n + 1
+    assert len(match_opponents) == len(match_outcomes) == match_offsets[-1]
+
+    num_matches = np.diff(match_offsets)
+    has_matches = num_matches > 0
+    match_player = np.repeat(np.arange(n), num_matches)
+
+    # Players without matches are only aged, as in `glicko2_update`.
+    out_mu = mu.copy()
+    out_phi = _age(phi, sigma, timestamps, timestamp, False, config)
+    out_sigma = sigma.copy()
+    out_timestamps = np.full(n, timestamp if timestamp else 0, dtype=np.int64)
+
+    if not has_matches.any():
+        return out_mu, out_phi, out_sigma, out_timestamps
+
+    # Expand the deviation due to inactivity, in case the last game was more
+    # than a period ago.
+    aged_phi = _age(phi, sigma, timestamps, timestamp, True, config)
+
+    # step 3 / 4, compute 'v' and delta
+    opp_mu = mu[match_opponents]
+    if match_rating_adjustments is not None:
+        opp_mu = opp_mu + np.asarray(match_rating_adjustments, dtype=np.float64) / glicko2.GLICKO2_SCALE
+    opp_phi = aged_phi[match_opponents]
+
+    g_phi_j = 1 / np.sqrt(1 + (3 * opp_phi ** 2) / (pi ** 2))
+    E = 1 / (1 + np.exp(-g_phi_j * (mu[match_player] - opp_mu)))
+    v_sum = np.bincount(match_player, weights=g_phi_j ** 2 * E * (1 - E), minlength=n)
+    delta_sum = np.bincount(match_player, weights=g_phi_j * (match_outcomes - E), minlength=n)
+
+    idx = np.nonzero(has_matches)[0]
+    v_sum = v_sum[idx]
+    delta_sum = delta_sum[idx]
+    p_mu = mu[idx]
+    p_phi = aged_phi[idx]
+
+    v = np.where(v_sum != 0, 1.0 / np.where(v_sum != 0, v_sum, 1.0), 9999.0)
+    delta = v * delta_sum
+
+    # step 5
+    new_volatility = _illinois_volatility(p_phi, sigma[idx], v, delta, config.tao)
+
+    # step 6
+    phi_star = np.sqrt(p_phi ** 2 + new_volatility ** 2)
+
+    # step 7
+    phi_prime = 1 / np.sqrt(1 / phi_star ** 2 + 1 / v)
+    mu_prime = p_mu + (phi_prime ** 2) * delta_sum
+
+    # step 8
+    rating = np.clip(glicko2.GLICKO2_SCALE * mu_prime + 1500, glicko2.MIN_RATING, glicko2.MAX_RATING)
+    deviation = np.clip(glicko2.GLICKO2_SCALE * phi_prime, config.min_rd, config.max_rd)
+    out_mu[idx] = (rating - 1500) / glicko2.GLICKO2_SCALE
+    out_phi[idx] = deviation / glicko2.GLICKO2_SCALE
+    out_sigma[idx] = np.clip(new_volatility, 0.01, 0.15)
+
+    return out_mu, out_phi, out_sigma, out_timestamps
+
+
+def _age(
+    phi: np.ndarray,
+    sigma: np.ndarray,
+    timestamps: np.ndarray,
+    timestamp: Optional[int],
+    minus_one_period: bool,
+    config: Glicko2Config,
+) -> np.ndarray:
+    # Vectorized `Glicko2Entry.after_aging_to_timestamp`, returning only the
+    # new phi.
+    if not timestamp:
+        return phi.copy()
+
+    aging_period = config.aging_period_seconds
+    target = np.full(len(phi), timestamp, dtype=np.int64)
+    if aging_period and minus_one_period:
+        target = np.maximum(timestamps, timestamp - aging_period)
+
+    expand = (timestamps != 0) & (target > timestamps)
+    if not expand.any():
+        return phi.copy()
+
+    age = (target - timestamps).astype(np.float64)
+    aging_factor = age / aging_period if aging_period else np.ones(len(phi))
+    phi_prime = np.sqrt(phi ** 2 + aging_factor * sigma ** 2)
+    deviation = np.clip(glicko2.GLICKO2_SCALE * phi_prime, config.min_rd, config.max_rd)
+    return np.where(expand, deviation / glicko2.GLICKO2_SCALE, phi)
+
+
+def _illinois_volatility(
+    phi: np.ndarray, sigma: np.ndarray, v: np.ndarray, delta: np.ndarray, tao: float
+) -> np.ndarray:
+    # Step 5 of glicko2_update, run in lock step over all players. Players drop
+    # out of the iteration once their own bracket has converged, so the result
+    # for each player is identical to the scalar iteration.
+    a = np.log(sigma ** 2)
+    phi2 = phi ** 2
+    delta2 = delta ** 2
+
+    def f(x: np.ndarray, sel: np.ndarray) -> np.ndarray:
+        ex = np.exp(x)
+        d = phi2[sel] + v[sel] + ex
+        return (ex * (delta2[sel] - d) / (2 * d ** 2)) - ((x - a[sel]) / (tao ** 2))
+
+    A = a.copy()
+    B = np.empty_like(a)
+    big = delta2 > phi2 + v
+    B[big] = np.log(np.where(big, delta2 - phi2 - v, 1.0)[big])
+
+    small = np.nonzero(~big)[0]
+    k = np.ones(len(small))
+    safety = 100
+    searching = np.ones(len(small), dtype=bool)
+    while len(small) and safety > 0:  # pragma: no cover
+        searching &= f(a[small] - k * tao, small) < 0
+        if not searching.any():
+            break
+        k += searching
+        safety -= 1
+    B[small] = a[small] - k * tao
+
+    all_idx = np.arange(len(a))
+    fA = f(A, all_idx)
+    fB = f(B, all_idx)
+    safety = 100
+
+    active = np.nonzero(np.abs(B - A) > glicko2.EPSILON)[0]
+    while len(active) and safety > 0:
+        Aa = A[active]
+        Ba = B[active]
+        fAa = fA[active]
+        fBa = fB[active]
+
+        C = Aa + (Aa - Ba) * fAa / (fBa - fAa)
+        fC = f(C, active)
+        flip = fC * fBa <= 0
+        A[active] = np.where(flip, Ba, Aa)
+        fA[active] = np.where(flip, fBa, fAa / 2)
+        B[active] = C
+        fB[active] = fC
+
+        active = active[np.abs(B[active] - A[active]) > glicko2.EPSILON]
+        safety -= 1
+
+    return np.exp(A / 2)
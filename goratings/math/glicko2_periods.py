@@ -0,0 +1,151 @@
+from math import exp, pi, sqrt
+from typing import Tuple
+
+from . import glicko2
+from .glicko2 import GLICKO2_SCALE, MAX_RATING, MIN_RATING, Glicko2Config, Glicko2Entry, glicko2_volatility
+
+__all__ = ["Glicko2PeriodEntry", "glicko2_period_update"]
+
+
+class Glicko2PeriodEntry:
+    """
+    A player's rating under per-player, fixed length rating periods, as
+    described in RatingsV6.md.  Holds the rating at the start of the current
+    period (`mu`, `phi`, `sigma`), the estimated rating at the end of it
+    (`mu_prime`, `phi_prime`, `sigma_prime`), the timestamp the period ends
+    at, and the running sums `v_inv` and `gamma` of the period's games, so
+    each game is folded in without revisiting the earlier ones.
+
+    `period_end` is None until the player's first game.
+    """
+
+    __slots__ = ("mu", "phi", "sigma", "mu_prime", "phi_prime", "sigma_prime", "period_end", "v_inv", "gamma")
+
+    mu: float
+    phi: float
+    sigma: float
+    mu_prime: float
+    phi_prime: float
+    sigma_prime: float
+    period_end: int | None
+    v_inv: float
+    gamma: float
+
+    def __init__(self, rating: float = 1500, deviation: float = 350, volatility: float = 0.06) -> None:
+        self.mu = self.mu_prime = (rating - 1500) / GLICKO2_SCALE
+        self.phi = self.phi_prime = deviation / GLICKO2_SCALE
+        self.sigma = self.sigma_prime = volatility
+        self.period_end = None
+        self.v_inv = 0.0
+        self.gamma = 0.0
+
+    @staticmethod
+    def from_entry(entry: Glicko2Entry) -> "Glicko2PeriodEntry":
+        return Glicko2PeriodEntry(entry.rating, entry.deviation, entry.volatility)
+
+    # The estimated end of period rating, which is what the player is
+    # currently rated as.
+    @property
+    def rating(self) -> float:
+        return GLICKO2_SCALE * self.mu_prime + 1500
+
+    @property
+    def deviation(self) -> float:
+        return GLICKO2_SCALE * self.phi_prime
+
+    @property
+    def volatility(self) -> float:
+        return self.sigma_prime
+
+    def __str__(self) -> str:
+        return "%7.2f +- %6.2f (%.6f [%.4f]) until %10d" % (
+            self.rating,
+            self.deviation,
+            self.volatility,
+            self.volatility * GLICKO2_SCALE,
+            0 if self.period_end is None else self.period_end,
+        )
+
+    def copy(self) -> "Glicko2PeriodEntry":
+        ret = Glicko2PeriodEntry.__new__(Glicko2PeriodEntry)
+        for name in Glicko2PeriodEntry.__slots__:
+            setattr(ret, name, getattr(self, name))
+        return ret
+
+    def observed(self, timestamp: int, period: int, config: Glicko2Config | None = None) -> Tuple[float, float]:
+        """
+        The (mu, phi) opponents see at `timestamp`: the rating the current
+        period started with while it lasts, after that the end of period
+        estimate with its deviation aged for the time since the period ended.
+        """
+        if self.period_end is None or timestamp <= self.period_end:
+            return self.mu, self.phi
+        if config is None:
+            config = glicko2.CONFIG
+        return self.mu_prime, _aged_phi(self.phi_prime, self.sigma_prime, timestamp - self.period_end, period, config)
+
+    def to_entry(self, timestamp: int | None = None) -> Glicko2Entry:
+        return Glicko2Entry(self.rating, self.deviation, self.volatility, timestamp)
+
+
+def _aged_phi(phi: float, sigma: float, age: float, period: int, config: Glicko2Config) -> float:
+    phi = sqrt(phi ** 2 + (age / period) * sigma ** 2)
+    return min(config.max_rd, max(config.min_rd, GLICKO2_SCALE * phi)) / GLICKO2_SCALE
+
+
+def glicko2_period_update(
+    player: Glicko2PeriodEntry,
+    opponent: Glicko2PeriodEntry,
+    outcome: float,
+    timestamp: int,
+    period: int,
+    rating_adjustment: float = 0.0,
+    config: Glicko2Config | None = None,
+) -> Glicko2PeriodEntry:
+    """
+    Returns `player` updated with one game against `opponent` ended at
+    `timestamp`, in O(1) regardless of how many games the player already
+    played in the period.  `period` is the period length in seconds, and
+    `rating_adjustment` is added to the opponent's rating (as in
+    `Glicko2Entry.copy`) to account for handicap.
+
+    A game after the end of the player's period starts a new `period` long
+    one from the previous period's estimate.  The estimate is computed as
+    `glicko2_update` would over all of the period's games at once, so at the
+    end of a period it matches running `glicko2_update` over the window.
+    """
+    if config is None:
+        config = glicko2.CONFIG
+
+    mu_j, phi_j = opponent.observed(timestamp, period, config)
+    mu_j += rating_adjustment / GLICKO2_SCALE
+
+    ret = player.copy()
+    if player.period_end is None:
+        ret.period_end = timestamp + period
+        ret.v_inv = 0.0
+        ret.gamma = 0.0
+    elif timestamp > player.period_end:
+        ret.mu = player.mu_prime
+        ret.phi = _aged_phi(player.phi_prime, player.sigma_prime, timestamp - player.period_end, period, config)
+        ret.sigma = player.sigma_prime
+        ret.period_end = timestamp + period
+        ret.v_inv = 0.0
+        ret.gamma = 0.0
+
+    g_phi_j = 1 / sqrt(1 + (3 * phi_j ** 2) / (pi ** 2))
+    E = 1 / (1 + exp(-g_phi_j * (ret.mu - mu_j)))
+    ret.v_inv += g_phi_j ** 2 * E * (1 - E)
+    ret.gamma += g_phi_j * (outcome - E)
+
+    v = 1.0 / ret.v_inv if ret.v_inv else 9999
+    delta = v * ret.gamma
+    new_volatility, _ = glicko2_volatility(ret.phi, ret.sigma, v, delta, config=config)
+    phi_star = sqrt(ret.phi ** 2 + new_volatility ** 2)
+    phi_prime = 1 / sqrt(1 / phi_star ** 2 + 1 / v)
+    mu_prime = ret.mu + (phi_prime ** 2) * ret.gamma
+
+    ret.mu_prime = (min(MAX_RATING, max(MIN_RATING, GLICKO2_SCALE * mu_prime + 1500)) - 1500) / GLICKO2_SCALE
+    ret.phi_prime = min(config.max_rd, max(config.min_rd, GLICKO2_SCALE * phi_prime)) / GLICKO2_SCALE
+    ret.sigma_prime = min(0.15, max(0.01, new_volatility))
+    return ret
@@ -1,10 +1,29 @@
 from math import exp
-from typing import Callable
+from typing import Callable, NamedTuple, Optional
+
+__all__ = ["GorConfig", "GorEntry", "gor_update", "gor_configure"]
+
+
+def _gor_rating_to_rank(rating: float) -> float:
+    return rating / 100 + 9
 
-__all__ = ["GorEntry", "gor_update", "gor_configure"]
 
 EPSILON: float = 0.016
-RATING_TO_RANK: Callable[[float], float] = lambda rating: rating / 100 + 9
+RATING_TO_RANK: Callable[[float], float] = _gor_rating_to_rank
+
+
+class GorConfig(NamedTuple):
+    """
+    The tunable GoR parameters.  Functions and methods that take an optional
+    `config` use the module wide configuration, set with `gor_configure`,
+    when none is given.
+    """
+
+    epsilon: float = 0.016
+    rating_to_rank: Callable[[float], float] = _gor_rating_to_rank
+
+
+CONFIG = GorConfig(EPSILON, RATING_TO_RANK)
 
 
 class GorEntry:
@@ -15,11 +34,13 @@ class GorEntry:
         self.rating = rating
         self.handicap = handicap
 
-    def expected_win_probability(self, opponent: "GorEntry") -> float:
+    def expected_win_probability(self, opponent: "GorEntry", config: Optional[GorConfig] = None) -> float:
+        if config is None:
+            config = CONFIG
         D = (opponent.rating + opponent.handicap) - (self.rating + self.handicap)
-        a = compute_a(min(self.rating + self.handicap, opponent.rating + opponent.handicap))  # self.rating)
+        a = compute_a(min(self.rating + self.handicap, opponent.rating + opponent.handicap), config)  # self.rating)
         # print("D = %f  a = %f" % (D, a))
-        return 1 / (exp(D / a) + 1) - (EPSILON / 2)
+        return 1 / (exp(D / a) + 1) - (config.epsilon / 2)
 
     def with_handicap(self, handicap: float = 0.0) -> "GorEntry":
         ret = GorEntry(self.rating, handicap)
@@ -29,9 +50,10 @@ class GorEntry:
         return "%6.2f" % self.rating
 
 
-def compute_a(gor: float) -> float:
-    global RATING_TO_RANK
-    ret: float = max(70, 205 - (RATING_TO_RANK(gor) - 9) * 5)
+def compute_a(gor: float, config: Optional[GorConfig] = None) -> float:
+    if config is None:
+        config = CONFIG
+    ret: float = max(70, 205 - (config.rating_to_rank(gor) - 9) * 5)
     return ret
 
 
@@ -76,21 +98,27 @@ def compute_con(rank: float) -> float:
     return 10
 
 
-def gor_update(player: GorEntry, opponent: GorEntry, outcome: float) -> GorEntry:
-    K = compute_con(RATING_TO_RANK(player.rating))
+def gor_update(player: GorEntry, opponent: GorEntry, outcome: float, config: Optional[GorConfig] = None) -> GorEntry:
+    if config is None:
+        config = CONFIG
+    K = compute_con(config.rating_to_rank(player.rating))
     # print("K = %f  " % K)
-    expected = player.expected_win_probability(opponent)
+    expected = player.expected_win_probability(opponent, config)
     return GorEntry(player.rating + K * (outcome - expected))
 
 
 def gor_configure(
-    epsilon: float = 0.016, rating_to_rank: Callable[[float], float] = lambda rating: rating / 100 + 9,
-) -> None:
+    epsilon: float = 0.016, rating_to_rank: Callable[[float], float] = _gor_rating_to_rank,
+) -> GorConfig:
+    """ Sets the module wide configuration used when no config is passed, and returns it. """
+    global CONFIG
     global EPSILON
     global RATING_TO_RANK
 
+    CONFIG = GorConfig(epsilon, rating_to_rank)
     EPSILON = epsilon
     RATING_TO_RANK = rating_to_rank
+    return CONFIG
 
 
 gor_configure()
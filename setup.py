@@ -10,7 +10,9 @@ setup(
     url="https://github.com/online-go/goratings",
     description="Official rating and rank calculator used by Online-Go.com.",
     long_description=__doc__,
-    packages=find_packages(exclude=("analysis", "analysis.*", "unit_tests", "unit_tests.*")),
+    packages=find_packages(
+        exclude=("analysis", "analysis.*", "benchmarks", "benchmarks.*", "unit_tests", "unit_tests.*")
+    ),
     zip_safe=True,
     license="MIT",
 )
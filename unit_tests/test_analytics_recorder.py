@@ -0,0 +1,53 @@
+import pytest
+
+from analysis.util.AnalyticsRecorder import AnalyticsRecorder, load_analytics
+from analysis.util.CLI import cli
+from analysis.util.Config import config
+from analysis.util.Glicko2Analytics import Glicko2Analytics
+from analysis.util.InMemoryStorage import InMemoryStorage
+from analysis.util.RatingMath import make_rank_system
+from analysis.util.TallyGameAnalytics import TallyGameAnalytics
+from goratings.interfaces import GameRecord
+from goratings.math.glicko2 import Glicko2Entry
+from goratings.math.gor import GorEntry
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "args", cli.parse_args([]), raising=False)
+    monkeypatch.setattr(config, "name", "test", raising=False)
+    monkeypatch.chdir(tmp_path)
+    with open("players_to_inspect.ini", "w") as f:
+        f.write("[ogs]\nalice = 1\nbob = 2\ncarol = 3\n")
+    return str(tmp_path / "run.npz")
+
+
+def _inspected_players(storage, capsys):
+    TallyGameAnalytics(storage, rank_system=make_rank_system("log")).print_inspected_players()
+    return capsys.readouterr().out
+
+
+def test_round_trip_keeps_inspected_players(recording, capsys):
+    storage = InMemoryStorage(Glicko2Entry)
+    storage.set(1, Glicko2Entry(1650.5, 80.25, 0.061, 1600000000))
+    storage.set(2, Glicko2Entry(1400, 120, 0.059, 1600086400.5))
+    storage.set(3, Glicko2Entry(1500, 350, 0.06))
+    game = GameRecord(10, 19, 0, 6.5, 1, 2, 30, False, 1, 1600086400, "japanese")
+    recorder = AnalyticsRecorder(recording)
+    recorder.add_glicko2_analytics(Glicko2Analytics(False, game, 0.7, 1640, 1410, 85, 125, 18.2, 12.6, 1650.5, 1400))
+    recorder.save(storage.all_players())
+
+    restored = load_analytics(recording).restore_storage()
+    assert "@ 1600000000" in _inspected_players(storage, capsys)
+    assert _inspected_players(restored, capsys) == _inspected_players(storage, capsys)
+    assert restored.get(3).timestamp is None
+
+
+def test_round_trip_gor_ratings(recording):
+    storage = InMemoryStorage(GorEntry)
+    storage.set(1, GorEntry(2100.5))
+    AnalyticsRecorder(recording).save(storage.all_players())
+
+    restored = load_analytics(recording).restore_storage()
+    assert restored.all_players().keys() == {1}
+    assert restored.get(1).rating == 2100.5
@@ -0,0 +1,14 @@
+from analysis.util.CLI import cli
+from analysis.util.Config import glicko2_config_from_args
+from goratings.math.glicko2 import Glicko2Config, glicko2_config
+
+
+def test_glicko2_config_from_default_args():
+    assert glicko2_config_from_args(cli.parse_args([])) == glicko2_config(tao=0.5, min_rd=10, max_rd=500)
+
+
+def test_glicko2_config_from_args():
+    args = cli.parse_args(["--tao", "0.3", "--min-rd", "40", "--aging-period", "7"])
+    assert glicko2_config_from_args(args) == Glicko2Config(
+        tao=0.3, min_rd=40, max_rd=500, aging_period_seconds=7 * 24 * 60 * 60, volatility_solver="illinois",
+    )
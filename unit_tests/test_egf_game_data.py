@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+from analysis.util.CLI import cli
+from analysis.util.Config import config
+from analysis.util.EGFGameData import EGFGameData
+from analysis.util.RatingMath import get_handicap_rank_difference
+
+
+@pytest.fixture
+def egf_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "args", cli.parse_args([]), raising=False)
+    filename = str(tmp_path / "egf-data.db")
+    conn = sqlite3.connect(filename)
+    conn.execute(
+        """
+        CREATE TABLE game_records (
+            id INTEGER PRIMARY KEY,
+            handicap INTEGER,
+            black_id INTEGER,
+            white_id INTEGER,
+            winner_id INTEGER,
+            ended INTEGER,
+            black_manual_rank_update INTEGER,
+            white_manual_rank_update INTEGER
+        )
+        """
+    )
+    conn.executemany(
+        "INSERT INTO game_records VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(1, 0, 10, 11, 10, 1000, None, None), (2, 3, 11, 10, 10, 2000, None, None)],
+    )
+    conn.commit()
+    conn.close()
+    return EGFGameData(filename, quiet=True)
+
+
+def test_games_use_territory_scoring(egf_data):
+    even, handicap = list(egf_data)
+    assert (even.rules, even.komi) == ("japanese", 6.5)
+    assert (handicap.rules, handicap.komi) == ("japanese", 0.5)
+
+    # EGF games used to have the rules ("japanese",), which was rated as area
+    # scoring with a 13 point stone instead of territory scoring.
+    assert get_handicap_rank_difference(even.handicap, even.size, even.komi, even.rules) == -0.5 / 12
+    assert get_handicap_rank_difference(handicap.handicap, handicap.size, handicap.komi, handicap.rules) == 29.5 / 12
+    assert get_handicap_rank_difference(3, 19, 0.5, ("japanese",)) == 32.5 / 12
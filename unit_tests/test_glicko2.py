@@ -1,4 +1,14 @@
-from goratings.math.glicko2 import Glicko2Entry, glicko2_configure, glicko2_update
+import pytest
+
+from goratings.math.glicko2 import (
+    NEWTON_MAX_ITERATIONS,
+    Glicko2Entry,
+    glicko2_config,
+    glicko2_configure,
+    glicko2_update,
+    glicko2_update_one,
+    glicko2_volatility,
+)
 
 
 def test_glicko2():
@@ -59,3 +69,65 @@ def test_exercise():
             (Glicko2Entry(1500, 100), 0),
         ],
     )
+
+
+def test_newton_volatility_solver():
+    glicko2_configure(tao=0.5, min_rd=10, max_rd=500)
+    for phi, volatility, v, delta in [
+        (1.1513, 0.06, 1.7785, -0.4834),
+        (0.2, 0.01, 9999, 0.0),
+        (2.5, 0.15, 0.5, 8.0),
+        (0.5, 0.06, 2.0, 30.0),
+    ]:
+        illinois, illinois_evaluations = glicko2_volatility(phi, volatility, v, delta, "illinois")
+        newton, newton_evaluations = glicko2_volatility(phi, volatility, v, delta, "newton")
+        assert abs(illinois - newton) < 1e-6
+        assert newton_evaluations <= NEWTON_MAX_ITERATIONS
+
+    glicko2_configure(tao=0.5, min_rd=10, max_rd=500, volatility_solver="newton")
+    player = Glicko2Entry(1500, 200, 0.06)
+    a = Glicko2Entry(1400, 30, 0.06)
+    b = Glicko2Entry(1550, 100, 0.06)
+    c = Glicko2Entry(1700, 300, 0.06)
+    player = glicko2_update(player, [(a, 1), (b, 0), (c, 0)])
+    glicko2_configure(tao=0.5, min_rd=10, max_rd=500)
+
+    assert round(player.rating, 1) == 1464.1
+    assert round(player.deviation, 1) == 151.5
+
+
+def test_unknown_volatility_solver():
+    with pytest.raises(ValueError, match="unknown volatility solver 'secant'"):
+        glicko2_volatility(1.1513, 0.06, 1.7785, -0.4834, "secant", glicko2_config(tao=0.5, min_rd=10, max_rd=500))
+
+
+def test_explicit_config():
+    weekly = glicko2_config(tao=0.3, min_rd=40, max_rd=400, aging_period_days=7)
+    glicko2_configure(tao=0.3, min_rd=40, max_rd=400, aging_period_days=7)
+    player = Glicko2Entry(1500, 200, 0.06, 1000)
+    matches = [(Glicko2Entry(1400, 30, 0.06, 2000), 1), (Glicko2Entry(1700, 300, 0.06), 0)]
+    expected = glicko2_update(player, matches, timestamp=5000000)
+
+    glicko2_configure(tao=0.5, min_rd=10, max_rd=500)
+    updated = glicko2_update(player, matches, timestamp=5000000, config=weekly)
+    assert updated.rating == expected.rating
+    assert updated.deviation == expected.deviation
+    assert updated.volatility == expected.volatility
+    assert glicko2_update(player, matches, timestamp=5000000).rating != expected.rating
+
+
+def test_update_one():
+    config = glicko2_config(tao=0.5, min_rd=10, max_rd=500)
+    for rating, deviation, volatility, opponent_rating, opponent_deviation, outcome in [
+        (1500, 200, 0.06, 1400, 30, 1),
+        (1500, 350, 0.06, 1700, 300, 0),
+        (100, 100, 0.15, 30000, 10000, True),
+    ]:
+        expected = glicko2_update(
+            Glicko2Entry(rating, deviation, volatility),
+            [(Glicko2Entry(opponent_rating, opponent_deviation), outcome)],
+            config=config,
+        )
+        assert glicko2_update_one(
+            rating, deviation, volatility, opponent_rating, opponent_deviation, outcome, config=config
+        ) == (expected.rating, expected.deviation, expected.volatility)
@@ -0,0 +1,87 @@
+import pickle
+import random
+
+from analysis.util.Glicko2ArrayStorage import Glicko2ArrayStorage
+from analysis.util.InMemoryStorage import InMemoryStorage
+from goratings.math.glicko2 import Glicko2Entry
+
+
+def _fields(entry):
+    return (entry.rating, entry.deviation, entry.volatility, entry.timestamp)
+
+
+def _play(storages, seed):
+    rng = random.Random(seed)
+    timestamp = 0
+    for _ in range(2000):
+        player_id = rng.randint(1, 300)
+        timestamp += rng.randint(0, 100)
+        op = rng.random()
+        if op < 0.4:
+            entry = Glicko2Entry(rng.uniform(100, 2900), rng.uniform(30, 350), rng.uniform(0.01, 0.1), timestamp)
+            for storage in storages:
+                storage.set(player_id, entry.copy())
+                storage.add_rating_history(player_id, timestamp, entry)
+                storage.add_match_history(player_id, timestamp, (player_id, timestamp))
+        elif op < 0.7:
+            for storage in storages:
+                storage.get(player_id)
+        elif op < 0.85 and player_id in storages[0].all_players():
+            tf = rng.random() < 0.5
+            for storage in storages:
+                storage.set_timeout_flag(player_id, tf)
+        elif player_id in storages[0].all_players():
+            for storage in storages:
+                storage.clear_set_count(player_id)
+    return timestamp
+
+
+def _assert_same(expected, actual, until):
+    assert list(expected.all_players()) == list(actual.all_players())
+    for player_id, entry in expected.all_players().items():
+        assert _fields(actual.all_players()[player_id]) == _fields(entry)
+        assert _fields(actual.get(player_id)) == _fields(entry)
+    for player_id in range(0, 302):
+        assert actual.get_set_count(player_id) == expected.get_set_count(player_id)
+        assert actual.get_timeout_flag(player_id) == expected.get_timeout_flag(player_id)
+        if expected.get_first_timestamp_older_than(player_id, until + 1) is not None:
+            assert actual.get_last_game_timestamp(player_id) == expected.get_last_game_timestamp(player_id)
+        for timestamp in (0, until // 2, until + 1):
+            assert _fields(actual.get_first_rating_older_than(player_id, timestamp)) == _fields(
+                expected.get_first_rating_older_than(player_id, timestamp)
+            )
+            assert list(actual.get_matches_newer_or_equal_to(player_id, timestamp)) == list(
+                expected.get_matches_newer_or_equal_to(player_id, timestamp)
+            )
+
+
+def test_matches_in_memory_storage():
+    expected = InMemoryStorage(Glicko2Entry)
+    actual = Glicko2ArrayStorage()
+    until = _play([expected, actual], 1)
+    _assert_same(expected, actual, until)
+
+
+def test_pickle():
+    expected = InMemoryStorage(Glicko2Entry)
+    actual = Glicko2ArrayStorage()
+    until = _play([expected, actual], 2)
+    _assert_same(expected, pickle.loads(pickle.dumps(actual, pickle.HIGHEST_PROTOCOL)), until)
+
+    restored = Glicko2ArrayStorage()
+    restored.__setstate__(actual.__getstate__())
+    _assert_same(expected, restored, until)
+
+
+def test_players_state():
+    expected = InMemoryStorage(Glicko2Entry)
+    actual = Glicko2ArrayStorage()
+    until = _play([expected, actual], 3)
+    player_ids = list(expected.all_players())
+
+    copied = InMemoryStorage(Glicko2Entry)
+    copied.update_players_state(actual.get_players_state(player_ids))
+    copied_back = Glicko2ArrayStorage()
+    copied_back.update_players_state(expected.get_players_state(player_ids))
+    _assert_same(expected, copied, until)
+    _assert_same(expected, copied_back, until)
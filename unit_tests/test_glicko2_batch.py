@@ -0,0 +1,73 @@
+import random
+
+import numpy as np
+
+from goratings.math.glicko2 import Glicko2Entry, glicko2_config, glicko2_update
+from goratings.math.glicko2_batch import glicko2_update_batch
+
+
+def _random_period(seed, aging_period_days):
+    config = glicko2_config(tao=0.5, min_rd=10, max_rd=500, aging_period_days=aging_period_days)
+
+    rng = random.Random(seed)
+    players = [
+        Glicko2Entry(
+            rng.uniform(200, 2800),
+            rng.uniform(30, 350),
+            rng.uniform(0.01, 0.15),
+            rng.choice([None, rng.randint(1, 10_000_000)]),
+        )
+        for _ in range(200)
+    ]
+    matches = []
+    for i in range(len(players)):
+        matches.append(
+            [
+                (rng.randrange(len(players)), rng.choice([0, 0.5, 1]), rng.uniform(-300, 300))
+                for _ in range(rng.choice([0, 1, 1, 2, 5, 20]))
+            ]
+        )
+    return config, players, matches
+
+
+def _compare(config, players, matches, timestamp):
+    offsets = np.cumsum([0] + [len(m) for m in matches])
+    mu, phi, sigma, ts = glicko2_update_batch(
+        np.array([p.mu for p in players]),
+        np.array([p.phi for p in players]),
+        np.array([p.volatility for p in players]),
+        np.array([p.timestamp or 0 for p in players]),
+        offsets,
+        np.array([o for m in matches for o, _, _ in m], dtype=np.int64),
+        np.array([s for m in matches for _, s, _ in m]),
+        timestamp=timestamp,
+        config=config,
+        match_rating_adjustments=np.array([adj for m in matches for _, _, adj in m]),
+    )
+
+    for i, player in enumerate(players):
+        expected = glicko2_update(
+            player, [(players[o].copy(adj), s) for o, s, adj in matches[i]], timestamp=timestamp, config=config,
+        )
+        assert abs(expected.mu - mu[i]) < 1e-9
+        assert abs(expected.phi - phi[i]) < 1e-9
+        assert abs(expected.volatility - sigma[i]) < 1e-9
+        assert (expected.timestamp or 0) == ts[i]
+
+
+def test_batch_matches_scalar():
+    config, players, matches = _random_period(1, aging_period_days=None)
+    _compare(config, players, matches, None)
+
+
+def test_batch_matches_scalar_with_aging():
+    config, players, matches = _random_period(2, aging_period_days=7)
+    _compare(config, players, matches, 12_000_000)
+
+
+def test_batch_no_matches():
+    mu, phi, sigma, ts = glicko2_update_batch(
+        np.array([0.0]), np.array([1.0]), np.array([0.06]), np.array([0]), np.array([0, 0]), [], [],
+    )
+    assert mu[0] == 0.0
+    assert phi[0] == 1.0
@@ -0,0 +1,58 @@
+from math import sqrt
+
+from goratings.math.glicko2 import GLICKO2_SCALE, Glicko2Entry, glicko2_config, glicko2_update
+from goratings.math.glicko2_periods import Glicko2PeriodEntry, glicko2_period_update
+
+WEEK = 7 * 24 * 60 * 60
+CONFIG = glicko2_config(tao=0.5, min_rd=10, max_rd=500)
+
+
+def test_matches_glicko2_update_over_period():
+    start = Glicko2Entry(1500, 200, 0.06)
+    opponents = [Glicko2Entry(1400, 30, 0.06), Glicko2Entry(1550, 100, 0.06), Glicko2Entry(1700, 300, 0.06)]
+    outcomes = [1, 0, 0]
+
+    player = Glicko2PeriodEntry.from_entry(start)
+    for i, (opponent, outcome) in enumerate(zip(opponents, outcomes)):
+        player = glicko2_period_update(
+            player, Glicko2PeriodEntry.from_entry(opponent), outcome, 1000 + i * 3600, WEEK, config=CONFIG
+        )
+        expected = glicko2_update(start, list(zip(opponents[: i + 1], outcomes)), config=CONFIG)
+        assert abs(player.rating - expected.rating) < 1e-9
+        assert abs(player.deviation - expected.deviation) < 1e-9
+        assert abs(player.volatility - expected.volatility) < 1e-12
+
+    assert round(player.rating, 1) == 1464.1
+    assert round(player.deviation, 1) == 151.5
+    assert player.period_end == 1000 + WEEK
+    # The period's starting rating is kept for opponents to observe.
+    assert player.observed(1000 + WEEK, WEEK) == (start.mu, start.phi)
+
+
+def test_new_period():
+    player = Glicko2PeriodEntry(1500, 200, 0.06)
+    opponent = Glicko2PeriodEntry(1500, 200, 0.06)
+    player = glicko2_period_update(player, opponent, 1, 1000, WEEK, config=CONFIG)
+    first = player.copy()
+
+    later = 1000 + WEEK + 2 * WEEK
+    player = glicko2_period_update(player, opponent, 0, later, WEEK, config=CONFIG)
+    assert player.period_end == later + WEEK
+    assert player.mu == first.mu_prime
+    assert player.sigma == first.sigma_prime
+    assert abs(player.phi - sqrt(first.phi_prime ** 2 + 2 * first.sigma_prime ** 2)) < 1e-12
+
+    mu, phi = first.observed(later, WEEK, CONFIG)
+    assert mu == first.mu_prime
+    assert phi == player.phi
+
+
+def test_rating_adjustment():
+    player = Glicko2PeriodEntry(1500, 200, 0.06)
+    opponent = Glicko2PeriodEntry(1400, 100, 0.06)
+    updated = glicko2_period_update(player, opponent, 1, 1000, WEEK, rating_adjustment=100, config=CONFIG)
+    expected = glicko2_update(Glicko2Entry(1500, 200, 0.06), [(Glicko2Entry(1500, 100, 0.06), 1)], config=CONFIG)
+    assert abs(updated.rating - expected.rating) < 1e-9
+    assert abs(updated.mu_prime * GLICKO2_SCALE + 1500 - updated.rating) < 1e-9
+    assert isinstance(str(updated), str)
+    assert updated.to_entry(1000).timestamp == 1000
@@ -1,4 +1,4 @@
-from goratings.math.gor import GorEntry, gor_configure, gor_update
+from goratings.math.gor import GorConfig, GorEntry, gor_configure, gor_update
 
 
 def test_table_1():
@@ -46,3 +46,14 @@ def test_example_5():
 
     na = gor_update(ra, rb, 1)
     assert round(na.rating, 0) == 1875
+
+
+def test_explicit_config():
+    gor_configure()
+
+    ra = GorEntry(2400)
+    rb = GorEntry(2400)
+
+    na = gor_update(ra, rb, 1, GorConfig(epsilon=0))
+    assert round(na.rating, 1) == 2407.5
+    assert round(gor_update(ra, rb, 1).rating, 1) != 2407.5
@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+from analysis.util.CLI import cli
+from analysis.util.Config import config
+from analysis.util.OGSGameData import OGSGameData
+
+# id, rules, size, handicap, komi, black_id, white_id, time_per_move, timeout, winner_id, ended
+GAMES = [
+    (1, "japanese", 19, 0, 6.5, 60001, 60002, 30, 0, 60001, 1000),
+    (2, "chinese", 9, 0, 7.5, 60002, 60003, 86400, 0, 60003, 1000),
+    (3, "Japanese", 19, 2, 0.5, 60001, 60003, 10, 1, 60003, 1500),
+    # Old bot, filtered out.
+    (4, "aga", 13, 0, 7.5, 60001, 100, 20, 0, 60001, 1700),
+    (5, "ogs", 13, 0, 6.5, 60003, 60002, 20, 0, 60002, 2000.5),
+    (6, "korean", 19, 0, 6.5, 60004, 60001, 0, 0, 60004, 2500),
+    (7, "aga", 19, 3, 0.5, 60002, 60004, 12.5, 0, 60002, 2600),
+    (8, "japanese", 9, 0, 6.5, 60004, 60003, 60, 0, 60003, 3000),
+]
+
+
+@pytest.fixture
+def ogs_db(tmp_path):
+    filename = str(tmp_path / "ogs-data.db")
+    conn = sqlite3.connect(filename)
+    conn.execute(
+        """
+        CREATE TABLE game_records (
+            id INTEGER PRIMARY KEY,
+            rules TEXT,
+            size INTEGER,
+            handicap INTEGER,
+            komi REAL,
+            black_id INTEGER,
+            white_id INTEGER,
+            time_per_move INTEGER,
+            timeout INTEGER,
+            winner_id INTEGER,
+            ended INTEGER
+        )
+        """
+    )
+    conn.execute("CREATE TABLE players (id INTEGER PRIMARY KEY, date_joined INTEGER, is_bot BOOLEAN)")
+    conn.executemany("INSERT INTO game_records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", GAMES)
+    conn.executemany(
+        "INSERT INTO players VALUES (?, 0, ?)", [(100, 1), (60001, 0), (60002, 0), (60003, 0), (60004, 0)]
+    )
+    conn.commit()
+    conn.close()
+    return filename
+
+
+def _configure(monkeypatch, *args):
+    monkeypatch.setattr(config, "args", cli.parse_args(list(args)), raising=False)
+
+
+def _games(games):
+    return [vars(game) for game in games]
+
+
+def _batched_games(data, batch_size):
+    return _games(game for batch in data.iter_batches(batch_size) for game in batch)
+
+
+@pytest.mark.parametrize("args", [[], ["--games", "4"], ["--games-offset", "3"], ["--game-cache"]])
+@pytest.mark.parametrize("batch_size", [1, 3, 100])
+def test_batches_match_iteration(ogs_db, monkeypatch, args, batch_size):
+    _configure(monkeypatch, *args)
+    data = OGSGameData(ogs_db, quiet=True)
+    expected = _games(data)
+    assert len(expected) == {"--games": 4, "--games-offset": 4}.get(args[0] if args else "", 7)
+    assert _batched_games(data, batch_size) == expected
+
+    data = OGSGameData(ogs_db, quiet=True, size=19)
+    assert _batched_games(data, batch_size) == _games(data)
+
+
+def test_batch_columns(ogs_db, monkeypatch):
+    _configure(monkeypatch)
+    first, second, _ = OGSGameData(ogs_db, quiet=True).iter_batches(3)
+    assert (first.ended.typecode, first.time_per_move.typecode) == ("q", "q")
+    # The second batch has a fraction of a second and of a move time.
+    assert (second.ended.typecode, second.time_per_move.typecode) == ("d", "d")
+
+
+@pytest.mark.parametrize("args", [[], ["--game-cache"]])
+def test_batches_update_resume_token(ogs_db, tmp_path, monkeypatch, args):
+    _configure(monkeypatch, "--resume-token", str(tmp_path / "token.json"), *args)
+    expected = _games(OGSGameData(ogs_db, quiet=True).all_games())
+
+    # Stopped while the second batch is being processed, so the next run
+    # starts again with the second batch.
+    batches = OGSGameData(ogs_db, quiet=True).iter_batches(3)
+    assert _games(next(batches)) == expected[:3]
+    next(batches)
+    batches.close()
+    assert _games(OGSGameData(ogs_db, quiet=True)) == expected[3:]
+    assert _batched_games(OGSGameData(ogs_db, quiet=True), 3) == []
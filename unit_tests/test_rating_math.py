@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from analysis.util import RatingMath
+from analysis.util.CLI import cli
+from analysis.util.RatingMath import configure_rating_to_rank, lerp, make_rank_system
+
+
+def _linear_scan_rating_to_rank(points, rating):
+    # How the optimizer system converted ratings before it binary searched.
+    if rating < points[0]:
+        return 0
+    for rank in range(1, 38):
+        if rating < points[rank]:
+            return lerp(rank - 1, rank, (rating - points[rank - 1]) / (points[rank] - points[rank - 1]))
+    return 39
+
+
+def _increasing_points(rng):
+    points = [rng.uniform(50, 150)]
+    for _ in range(38):
+        # Some repeated points, which the lookup must step over.
+        points.append(points[-1] + rng.choice([0, rng.uniform(1, 200)]))
+    return points
+
+
+def test_optimizer_rating_to_rank_matches_linear_scan():
+    rng = random.Random(1)
+    for _ in range(20):
+        points = _increasing_points(rng)
+        system = make_rank_system("optimizer", optimizer_points=points)
+        ratings = points + [rng.uniform(points[0] - 100, points[-1] + 100) for _ in range(500)]
+        for rating in ratings:
+            assert system.rating_to_rank(rating) == _linear_scan_rating_to_rank(points, rating)
+
+
+def test_optimizer_points_must_increase():
+    points = list(range(100, 3900, 100))
+    points[10], points[11] = points[11], points[10]
+    with pytest.raises(ValueError):
+        make_rank_system("optimizer", optimizer_points=points)
+
+
+@pytest.mark.parametrize("system", ["log", "logp", "linear", "gor", "sig", "auto"])
+@pytest.mark.parametrize("table_size", [10, 100, 1000, 10000])
+def test_configure_with_rank_tables(monkeypatch, system, table_size):
+    monkeypatch.setattr(RatingMath, "_rank_system", None, raising=False)
+    monkeypatch.setattr(RatingMath, "rating_config", {})
+    args = cli.parse_args(["--ranks", system, "--rank-table-size", str(table_size)])
+    rank_system = configure_rating_to_rank(args)
+    assert rank_system.table_size == table_size
+
+    exact = make_rank_system(rank_system.name, a=args.a, c=args.c, d=args.d, m=args.m, b=args.b, p=args.p)
+    rank_error, rating_error = rank_system.table_error
+    for rating in [800.0, 1000.0, 2000.0]:
+        rank = exact.rating_to_rank(rating)
+        assert abs(rank_system.rating_to_rank(rating) - rank) <= 2 * rank_error + 1e-9
+        assert abs(rank_system.rank_to_rating(rank) - rating) <= 2 * rating_error + 1e-9
+
+
+@pytest.mark.parametrize("table_size", [10, 1000])
+def test_optimizer_ignores_rank_tables(table_size):
+    points = list(range(100, 3900, 100))
+    system = make_rank_system("optimizer", optimizer_points=points, table_size=table_size)
+    assert (system.table_size, system.rating_to_rank(1000)) == (0, 9)